@@ -0,0 +1,65 @@
+"""Compare the memory held by a parsed hierarchy as dicts and as ``OrgNode`` records.
+
+Usage::
+
+    python benchmarks/employee_model_benchmark.py [--employees 100000]
+
+Builds a synthetic tenant, parses it the way workers load
+``employee_data.json`` and reports the traced allocations of the dict tree
+against the ``__slots__`` tree from ``simple_org_chart.models``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from json_codec_benchmark import build_snapshot
+
+# Run from a checkout without installing: make the repository root importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_org_chart import models  # noqa: E402 - needs the path set up above
+
+
+def traced(build):
+    """Return ``(result, bytes still allocated, seconds)`` for ``build()``."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=100000)
+    args = parser.parse_args()
+
+    encoded = json.dumps(build_snapshot(args.employees))
+
+    tree, dict_bytes, dict_seconds = traced(lambda: json.loads(encoded))
+    del tree
+    nodes, node_bytes, node_seconds = traced(lambda: models.OrgNode.from_hierarchy(json.loads(encoded)))
+    assert json.dumps(nodes.to_dict()) == encoded, "OrgNode round trip changed the JSON"
+
+    print(f"{args.employees} employees ({len(encoded) / 1024 / 1024:.1f} MiB JSON)")
+    for label, size, seconds in (
+        ("dict tree", dict_bytes, dict_seconds),
+        ("OrgNode tree", node_bytes, node_seconds),
+    ):
+        print(f"  {label:<14} {size / 1024 / 1024:8.1f} MiB  {size / args.employees:7.0f} B/employee  load {seconds * 1000:7.1f} ms")
+    print(f"  reduction      {100 * (1 - node_bytes / dict_bytes):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
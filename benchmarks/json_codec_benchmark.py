@@ -0,0 +1,99 @@
+"""Compare JSON load/dump times for a synthetic org chart snapshot.
+
+Usage::
+
+    python benchmarks/json_codec_benchmark.py [--employees 50000] [--repeat 5]
+
+Times the previous pretty-printed stdlib format against the compact output of
+``simple_org_chart.json_codec`` with whichever backend is installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Run from a checkout without installing: make the repository root importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simple_org_chart.json_codec as json_codec  # noqa: E402 - needs the path set up above
+
+DEPARTMENTS = ["Engineering", "Sales", "Finance", "HR", "Legal", "Marketing", "Support", "Operations"]
+TITLES = ["Engineer", "Senior Engineer", "Manager", "Director", "Analyst", "Specialist", "Coordinator"]
+CITIES = ["London", "Seattle", "Berlin", "Sydney", "Toronto", "Tel Aviv"]
+
+
+def build_snapshot(count: int, fanout: int = 8, seed: int = 7) -> dict:
+    """Return a nested hierarchy shaped like ``employee_data.json``."""
+    rng = random.Random(seed)
+    nodes = []
+    for index in range(count):
+        department = rng.choice(DEPARTMENTS)
+        city = rng.choice(CITIES)
+        nodes.append({
+            "id": f"{index:08x}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            "name": f"Person {index}",
+            "title": rng.choice(TITLES),
+            "department": department,
+            "email": f"person{index}@example.com",
+            "phone": "+1 555 0100",
+            "businessPhone": "+1 555 0100",
+            "location": city,
+            "officeLocation": f"{city} HQ",
+            "city": city,
+            "state": "",
+            "country": "US",
+            "fullAddress": f"1 Main St, {city}",
+            "managerId": None,
+            "hireDate": f"20{rng.randint(10, 25)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "isNewEmployee": rng.random() < 0.05,
+            "accountEnabled": True,
+            "userType": "Member",
+            "licenseCount": rng.randint(0, 3),
+            "licenseSkus": ["ENTERPRISEPACK"],
+            "children": [],
+        })
+    for index in range(1, count):
+        manager = nodes[(index - 1) // fanout]
+        nodes[index]["managerId"] = manager["id"]
+        manager["children"].append(nodes[index])
+    return nodes[0]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(args.employees)
+    pretty = json.dumps(snapshot, indent=2).encode("utf-8")
+    compact = json_codec.dumps(snapshot)
+
+    rows = [
+        ("dump stdlib indent=2", best_of(args.repeat, lambda: json.dumps(snapshot, indent=2)), len(pretty)),
+        (f"dump {json_codec.BACKEND} compact", best_of(args.repeat, lambda: json_codec.dumps(snapshot)), len(compact)),
+        ("load stdlib (indent=2 file)", best_of(args.repeat, lambda: json.loads(pretty)), len(pretty)),
+        (f"load {json_codec.BACKEND} (compact file)", best_of(args.repeat, lambda: json_codec.loads(compact)), len(compact)),
+    ]
+
+    print(f"{args.employees} employees, best of {args.repeat} runs, backend={json_codec.BACKEND}")
+    for label, seconds, size in rows:
+        print(f"  {label:<34} {seconds * 1000:9.1f} ms  {size / 1024 / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import gc
 import multiprocessing
 import os
 
@@ -16,7 +17,9 @@ keepalive = 2
 max_requests = 1000
 max_requests_jitter = 50
 
-# Preload the application before forking worker processes
+# Preload the application before forking worker processes. The master also
+# loads the current data snapshot (see the fork hooks below) so every worker,
+# including ones recycled by max_requests, starts with it already parsed.
 preload_app = True
 
 # Logging - Option to filter access logs
@@ -46,6 +49,31 @@ class AccessLogFilter(logging.Filter):
 def when_ready(server):
     access_logger = logging.getLogger('gunicorn.access')
     access_logger.addFilter(AccessLogFilter())
+    _warm_caches(server)
+
+
+def _warm_caches(server):
+    try:
+        from simple_org_chart import app_main
+        return app_main.warm_caches()
+    except Exception as error:
+        server.log.warning("Unable to warm data caches: %s", error)
+        return None
+
+
+def pre_fork(server, worker):
+    # Runs in the master: reload if a sync published new data since the last
+    # fork, then move everything allocated so far into the permanent GC
+    # generation. Collections in the workers then never touch (and copy) the
+    # pages holding the shared snapshot.
+    _warm_caches(server)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Normally a no-op: the worker inherited the master's snapshot. Loads it
+    # here if the master could not, so the first request is not the one to pay.
+    _warm_caches(server)
 
 accesslog = '-'  # Enable access logging with filtering
 errorlog = '-'
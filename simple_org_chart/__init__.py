@@ -1,5 +1,13 @@
 """SimpleOrgChart application package."""
 
-from .app_main import app
-
 __all__ = ["app"]
+
+
+def __getattr__(name):
+    # Imported on first use so ``python -m simple_org_chart.sync --help`` does
+    # not build the web app.
+    if name == "app":
+        from .app_main import app
+
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
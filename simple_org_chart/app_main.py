@@ -1,4 +1,4 @@
-from flask import Flask, render_template, render_template_string, jsonify, request, send_from_directory, send_file, session, redirect, url_for
+from flask import Flask, Response, render_template, render_template_string, jsonify, request, send_from_directory, send_file, session, redirect, stream_with_context, url_for
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -6,7 +6,7 @@ from flask_session import Session
 import atexit
 import json
 import os
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import threading
 import time
 from io import BytesIO
@@ -29,52 +29,96 @@ except ImportError:
     Workbook = None
 
 import simple_org_chart.config as app_config
+import simple_org_chart.json_codec as json_codec
 from simple_org_chart.auth import login_required, require_auth, sanitize_next_path
 from simple_org_chart.settings import (
     DEFAULT_SETTINGS,
+    DIRECTORY_SETTING_KEYS,
     TOP_LEVEL_USER_EMAIL,
-    TOP_LEVEL_USER_ID,
     department_is_ignored,
-    employee_is_ignored,
     load_settings,
-    normalize_filter_value,
     parse_ignored_departments,
-    parse_ignored_employees,
     parse_ignored_titles,
     save_settings,
     translate_placeholder,
 )
 from simple_org_chart.msgraph import (
-    calculate_days_since,
-    collect_disabled_users,
-    collect_last_login_records,
-    datetime_to_iso,
     fetch_all_employees,
     fetch_employee_photo,
     get_access_token,
     parse_graph_datetime,
-    _enrich_mailbox_metadata,
 )
 from simple_org_chart.reports import (
     ReportCacheManager,
     apply_disabled_filters,
-    apply_filtered_user_filters,
-    apply_last_login_filters,
-    apply_missing_manager_filters,
     load_disabled_users_data,
     load_filtered_license_data,
-    load_filtered_user_data,
-    load_last_login_data,
-    load_missing_manager_data,
     load_recently_hired_data,
+    query_disabled_users_data,
+    query_filtered_user_data,
+    query_last_login_data,
+    query_missing_manager_data,
+)
+from simple_org_chart.binary_snapshot import load_binary_snapshot
+from simple_org_chart.directory_sync import (
+    DATA_DIR,
+    DATA_FILE,
+    DISABLED_LICENSE_FILE,
+    DISABLED_USERS_FILE,
+    EMPLOYEE_SNAPSHOT_FILE,
+    FILTERED_LICENSE_FILE,
+    FILTERED_USERS_FILE,
+    LAST_LOGIN_FILE,
+    METADATA_OPTIONS_FILE,
+    MISSING_MANAGER_FILE,
+    ORG_INDEX_FILE,
+    RECENTLY_DISABLED_FILE,
+    RECENTLY_HIRED_FILE,
+    SEARCH_INDEX_FILE,
+    _load_fetch_all_employees_fallback,
+    build_metadata_options,
+    build_org_hierarchy,
+    collect_missing_manager_records,
+    datastore,
+    history_store,
+    load_cached_employees,
+    mark_new_employees,
+    sync_jobs,
+    write_hierarchy_cache,
+    write_org_index_cache,
+    write_search_index_cache,
+)
+from simple_org_chart.history import parse_history_time
+from simple_org_chart.models import OrgNode, is_record
+from simple_org_chart.org_index import OrgIntervalIndex, load_org_index
+from simple_org_chart.query_cache import cached_query, query_cache
+from simple_org_chart.snapshots import (
+    active_generation,
+    atomic_write,
+    begin_generation,
+    current_generation,
+    dataset_etag,
+    dataset_generation,
+    dataset_path,
+    generation_manifest,
+    pin_generation,
+    publish_generation,
+    release_generation,
+    write_dataset,
 )
 from simple_org_chart.scheduler import (
-    configure_scheduler,
     is_scheduler_running,
     restart_scheduler,
     start_scheduler,
     stop_scheduler,
+    validate_scheduled_jobs,
 )
+from simple_org_chart.sync_jobs import (
+    FINISHED_STATES,
+    progress_stream_seconds,
+    sync_wait_seconds,
+)
+from simple_org_chart.sync_metrics import load_history, stage_trends
 from simple_org_chart.utils.files import validate_image_file
 
 load_dotenv()
@@ -87,6 +131,7 @@ app = Flask(
     static_folder=str(app_config.STATIC_DIR),
     template_folder=str(app_config.TEMPLATE_DIR),
 )
+app.json = json_codec.CodecJSONProvider(app)
 
 _allowed_origins = [origin.strip() for origin in os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',') if origin.strip()]
 if _allowed_origins:
@@ -122,22 +167,30 @@ def add_security_headers(response):
     response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
     response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self'; style-src 'self' 'unsafe-inline'; img-src 'self' data:;"
     return response
-app_config.ensure_directories()
 
-DATA_DIR = str(app_config.DATA_DIR)
+
+# Each request reads from the generation that was live when it started, even if
+# a sync publishes a new one halfway through.
+@app.before_request
+def _pin_data_generation():
+    pin_generation()
+
+
+@app.teardown_request
+def _release_data_generation(_error=None):
+    release_generation()
+
+
 SETTINGS_FILE = str(app_config.SETTINGS_FILE)
-DATA_FILE = str(app_config.DATA_FILE)
-MISSING_MANAGER_FILE = str(app_config.MISSING_MANAGER_FILE)
-EMPLOYEE_LIST_FILE = str(app_config.EMPLOYEE_LIST_FILE)
-DISABLED_LICENSE_FILE = str(app_config.DISABLED_LICENSE_FILE)
-FILTERED_LICENSE_FILE = str(app_config.FILTERED_LICENSE_FILE)
-FILTERED_USERS_FILE = str(app_config.FILTERED_USERS_FILE)
-DISABLED_USERS_FILE = str(app_config.DISABLED_USERS_FILE)
-LAST_LOGIN_FILE = str(app_config.LAST_LOGIN_FILE)
-RECENTLY_DISABLED_FILE = str(app_config.RECENTLY_DISABLED_FILE)
-RECENTLY_HIRED_FILE = str(app_config.RECENTLY_HIRED_FILE)
-
-logger.info(f"DATA_DIR set to: {DATA_DIR}")
+
+DEFAULT_LAZY_LOAD_THRESHOLD = 5000
+MAX_SUBTREE_DEPTH = 50
+DEFAULT_DATA_EVENTS_HOLD_SECONDS = 0
+DEFAULT_DATA_EVENTS_RETRY_SECONDS = 30
+DATA_RETRY_AFTER_SECONDS = 5
+
+_hierarchy_snapshot_lock = threading.Lock()
+_hierarchy_snapshot = {'key': None, 'data': None, 'nodes': {}}
 
 # Configuration for file uploads (removed SVG for security)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -154,549 +207,264 @@ if not all([TENANT_ID, CLIENT_ID, CLIENT_SECRET]):
     logger.warning("AZURE_CLIENT_SECRET: " + ("Set" if CLIENT_SECRET else "Not set"))
     logger.warning("Please check your .env file exists and contains the correct values")
 
-def collect_recently_disabled_employees(records, days=365):
-    if not records:
-        return []
 
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    recent = []
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-    for record in records:
-        observed_value = (
-            record.get('firstSeenDisabledAt')
-            or record.get('disabledDate')
-        )
-        disabled_at = parse_graph_datetime(observed_value)
-        if not disabled_at or disabled_at < cutoff:
-            continue
-
-        updated = record.copy()
-        updated['disabledDate'] = datetime_to_iso(disabled_at)
-        updated['disabledDays'] = calculate_days_since(disabled_at)
-        if not updated.get('firstSeenDisabledAt'):
-            updated['firstSeenDisabledAt'] = updated['disabledDate']
-        recent.append(updated)
-
-    recent.sort(key=lambda item: item.get('disabledDate') or '')
-    return recent
-
-
-def collect_recently_hired_employees(employees, days=365):
-    if not employees:
-        return []
-
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    manager_lookup = {emp.get('id'): emp for emp in employees if emp.get('id')}
-    recent = []
-
-    for employee in employees:
-        hire_date = parse_graph_datetime(employee.get('hireDate') or employee.get('employeeHireDate'))
-        if not hire_date or hire_date < cutoff:
-            continue
-
-        record = {
-            'id': employee.get('id'),
-            'name': employee.get('name'),
-            'title': employee.get('title'),
-            'department': employee.get('department'),
-            'email': employee.get('email'),
-            'userPrincipalName': employee.get('userPrincipalName'),
-            'phone': employee.get('phone') or '',
-            'businessPhone': employee.get('businessPhone') or '',
-            'location': employee.get('location') or employee.get('officeLocation') or '',
-            'hireDate': datetime_to_iso(hire_date),
-            'daysSinceHire': calculate_days_since(hire_date),
-            'managerName': '',
-        }
 
-        manager_id = employee.get('managerId')
-        if manager_id and manager_id in manager_lookup:
-            record['managerName'] = manager_lookup[manager_id].get('name') or ''
+def run_sync_job(reason, *, fresh=True, scopes=None):
+    """Request a sync and wait up to ``SYNC_WAIT_SECONDS`` for it; returns the job.
 
-        recent.append(record)
+    The job may still be running (``job.done`` is false) when this returns.
+    """
+    return sync_jobs.run(reason, fresh=fresh, scopes=scopes, timeout=sync_wait_seconds())
 
-    recent.sort(key=lambda item: item.get('hireDate') or '')
-    return recent
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def _load_fetch_all_employees_fallback():
-    cached_employees = load_cached_employees() or []
+def sync_pending_response(job):
+    """Answer a request whose data a sync has not produced (yet).
 
-    def _load_cached_list(path, description):
-        if not os.path.exists(path):
-            logger.debug(f"No cached {description} found at {path}")
-            return []
-        try:
-            with open(path, 'r') as cache_file:
-                data = json.load(cache_file)
-        except Exception as error:
-            logger.error(f"Failed to load cached {description} from {path}: {error}")
-            return []
+    202 while ``job`` is still running, so the client retries after
+    ``Retry-After``; 503 when it finished without producing the data.
+    """
+    if not job.done:
+        response = jsonify({
+            'error': 'Employee data is being synced. Try again shortly.',
+            'jobId': job.id,
+            'state': job.state,
+        })
+        response.status_code = 202
+    else:
+        response = jsonify({
+            'error': 'No employee data available. Please check configuration.',
+            'jobId': job.id,
+            'state': job.state,
+        })
+        response.status_code = 503
+    response.headers['Retry-After'] = str(DATA_RETRY_AFTER_SECONDS)
+    return response
 
-        if not isinstance(data, list):
-            logger.warning(f"Cached {description} at {path} is not a list; ignoring contents")
-            return []
 
-        return data
+report_cache = ReportCacheManager(
+    refresh_callback=lambda fresh: run_sync_job('report refresh' if fresh else 'missing report cache', fresh=fresh),
+    store=datastore,
+)
 
-    cached_filtered_with_license = _load_cached_list(FILTERED_LICENSE_FILE, 'filtered licensed users')
-    cached_filtered_users = _load_cached_list(FILTERED_USERS_FILE, 'filtered users')
 
-    return cached_employees, cached_filtered_with_license, cached_filtered_users
+_hierarchy_json_lock = threading.Lock()
 
-def build_org_hierarchy(employees, *, top_user_email_override=None, settings=None):
-    if not employees:
-        return None
-    
-    if settings is None:
-        settings = load_settings()
 
-    settings_top_user = (settings.get('topUserEmail') or '').strip()
-    env_top_user = (TOP_LEVEL_USER_EMAIL or '').strip()
+def hierarchy_data_path():
+    """Path of ``employee_data.json`` in the active generation.
 
-    if top_user_email_override is not None:
-        chosen_top_user = (top_user_email_override or '').strip()
-    elif env_top_user:
-        chosen_top_user = env_top_user
-    else:
-        chosen_top_user = settings_top_user
+    Binary-snapshot generations have no JSON tree until something asks for it;
+    it is then written once from the snapshot and shared by every worker. Only
+    code that needs the nested file itself should call this; use
+    ``hierarchy_available`` to test for data and ``load_live_hierarchy`` to read it.
+    """
+    path = dataset_path(DATA_FILE)
+    if os.path.exists(path):
+        return path
+    snapshot = load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE))
+    if snapshot is None:
+        return path
+    with _hierarchy_json_lock:
+        if not os.path.exists(path):
+            with atomic_write(path, 'wb') as data_file:
+                json_codec.dump(snapshot.to_hierarchy(), data_file)
+            logger.info(f"Materialized {path} from binary snapshot ({len(snapshot)} employees)")
+    return path
 
-    top_user_email = (chosen_top_user or '').strip() or None
 
-    # Debug logging
-    logger.info(f"Settings topUserEmail: '{settings_top_user}'")
-    logger.info(f"Environment TOP_LEVEL_USER_EMAIL: '{env_top_user}'")
-    if top_user_email_override is not None:
-        logger.info(f"Session override topUserEmail: '{top_user_email_override}'")
-    logger.info(f"Final top_user_email: '{top_user_email}'")
-    logger.info(f"TOP_LEVEL_USER_ID: '{TOP_LEVEL_USER_ID}'")
-    
-    emp_dict = {emp['id']: emp.copy() for emp in employees}
-    
-    for emp_id in emp_dict:
-        if 'children' not in emp_dict[emp_id]:
-            emp_dict[emp_id]['children'] = []
-    
-    # First, check if a specific top-level user is configured
-    # Prioritize settings file email over environment variables
-    root = None
-    if top_user_email:
-        logger.info(f"Searching for user with email: '{top_user_email}' among {len(employees)} employees")
-        for emp in employees:
-            if emp.get('email') == top_user_email:
-                root = emp_dict[emp['id']]
-                logger.info(f"Found and using configured top-level user by email: {root['name']} ({root.get('email')})")
-                break
-        else:
-            logger.warning(f"Could not find user with email '{top_user_email}' in employee list")
-    
-    # Fallback to environment variable ID if no email-based selection was made
-    if not root and TOP_LEVEL_USER_ID and TOP_LEVEL_USER_ID in emp_dict:
-        root = emp_dict[TOP_LEVEL_USER_ID]
-        logger.info(f"Using fallback environment top-level user by ID: {root['name']}")
-    
-    if root:
-        # If a specific root is configured, build hierarchy with that person at the top
-        # Clear any existing manager relationship for the root user
-        root['managerId'] = None
-        
-        # Build the hierarchy normally but ensure the selected root has no manager
-        for emp in employees:
-            emp_copy = emp_dict[emp['id']]
-            if emp_copy['id'] == root['id']:
-                continue  # Skip the root user in hierarchy building
-                
-            if emp['managerId'] and emp['managerId'] in emp_dict:
-                manager = emp_dict[emp['managerId']]
-                if emp_copy not in manager['children']:
-                    manager['children'].append(emp_copy)
-        
-        # Remove the selected root from anyone's children list (in case they were someone's subordinate)
-        for emp_id, emp in emp_dict.items():
-            emp['children'] = [child for child in emp['children'] if child['id'] != root['id']]
+def hierarchy_available():
+    """Whether the active generation has a hierarchy, without materializing its JSON tree."""
+    if os.path.exists(dataset_path(DATA_FILE)):
+        return True
+    return load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE)) is not None
 
-        
-        return root
-    else:
-        # Auto-detect root using existing logic
-        root_candidates = []
-        
-        # Build normal manager-employee relationships
-        for emp in employees:
-            emp_copy = emp_dict[emp['id']]
-            if emp['managerId'] and emp['managerId'] in emp_dict:
-                manager = emp_dict[emp['managerId']]
-                if emp_copy not in manager['children']:
-                    manager['children'].append(emp_copy)
-            else:
-                if not emp['managerId'] and emp_copy not in root_candidates:
-                    root_candidates.append(emp_copy)
-        
-        # Auto-detect root
-        if root_candidates:
-            ceo_keywords = ['chief executive', 'ceo', 'president', 'chair', 'director', 'head']
-            for candidate in root_candidates:
-                title_lower = (candidate.get('title') or '').lower()
-                if any(keyword in title_lower for keyword in ceo_keywords):
-                    root = candidate
-                    logger.info(f"Auto-detected top-level user: {root['name']} - {root.get('title')}")
-                    break
-            
-            if not root and root_candidates:
-                root = root_candidates[0]
-                logger.info(f"Using first root candidate as top-level: {root['name']}")
-        else:
-            max_reports = 0
-            for emp_id, emp in emp_dict.items():
-                if len(emp['children']) > max_reports:
-                    max_reports = len(emp['children'])
-                    root = emp
-            
-            if root:
-                logger.info(f"Using person with most reports as top-level: {root['name']} ({max_reports} reports)")
-        
-        if not root and employees:
-            root = emp_dict[employees[0]['id']]
-            logger.info(f"Using first employee as root: {root['name']}")
-        
-        return root
 
+def lazy_load_threshold():
+    """Org size above which ``/api/employees?depth=N`` ships a paged tree."""
+    raw_value = os.environ.get('LAZY_LOAD_THRESHOLD', '')
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else DEFAULT_LAZY_LOAD_THRESHOLD
+    except ValueError:
+        logger.warning(f"Invalid LAZY_LOAD_THRESHOLD '{raw_value}'; using {DEFAULT_LAZY_LOAD_THRESHOLD}")
+        return DEFAULT_LAZY_LOAD_THRESHOLD
 
-def collect_missing_manager_records(employees, hierarchy_root=None, settings=None, top_user_email_override=None):
-    if not employees:
-        return []
 
-    employee_index = {emp['id']: emp for emp in employees if emp.get('id')}
-    visited = set()
+def data_events_hold_seconds():
+    """How long ``/api/data/events`` waits for a new generation before closing."""
+    raw_value = os.environ.get('DATA_EVENTS_HOLD_SECONDS', '')
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else DEFAULT_DATA_EVENTS_HOLD_SECONDS
+    except ValueError:
+        logger.warning(f"Invalid DATA_EVENTS_HOLD_SECONDS '{raw_value}'; using {DEFAULT_DATA_EVENTS_HOLD_SECONDS}")
+        return DEFAULT_DATA_EVENTS_HOLD_SECONDS
 
-    def traverse(node):
-        node_id = node.get('id')
-        if not node_id or node_id in visited:
-            return
-        visited.add(node_id)
-        for child in node.get('children', []):
-            traverse(child)
 
-    if hierarchy_root:
-        traverse(hierarchy_root)
+def data_events_retry_seconds():
+    """How long browsers wait before reconnecting to ``/api/data/events``."""
+    raw_value = os.environ.get('DATA_EVENTS_RETRY_SECONDS', '')
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_DATA_EVENTS_RETRY_SECONDS
+    except ValueError:
+        logger.warning(f"Invalid DATA_EVENTS_RETRY_SECONDS '{raw_value}'; using {DEFAULT_DATA_EVENTS_RETRY_SECONDS}")
+        return DEFAULT_DATA_EVENTS_RETRY_SECONDS
 
-    root_ids = set()
-    top_user_email = None
 
-    if hierarchy_root and hierarchy_root.get('id'):
-        root_ids.add(hierarchy_root['id'])
+def _parse_depth_arg(value, default=None):
+    if value is None or not value.strip():
+        return default
+    try:
+        return min(max(int(value), 0), MAX_SUBTREE_DEPTH)
+    except ValueError:
+        logger.warning(f"Invalid depth value provided: {value}")
+        return default
 
-    if settings is None:
-        settings = load_settings()
 
-    if top_user_email_override is not None:
-        top_user_email = (top_user_email_override or '').strip().lower() or None
-    elif settings:
-        top_user_email = (settings.get('topUserEmail') or '').strip().lower() or None
-    elif TOP_LEVEL_USER_EMAIL:
-        top_user_email = (TOP_LEVEL_USER_EMAIL or '').strip().lower() or None
-
-    missing_records = []
-
-    for emp in employees:
-        emp_id = emp.get('id')
-        manager_id = emp.get('managerId')
-        manager_name = ''
-        reason = None
-
-        if emp_id and emp_id in root_ids:
-            continue
-
-        if top_user_email:
-            email = (emp.get('email') or '').strip().lower()
-            if email and email == top_user_email:
-                continue
-
-        if manager_id and manager_id in employee_index:
-            manager_name = employee_index[manager_id].get('name') or ''
-
-        if not manager_id:
-            reason = 'no_manager'
-        elif manager_id not in employee_index:
-            reason = 'manager_not_found'
-        elif emp_id not in visited:
-            reason = 'detached'
-
-        if reason:
-            filter_reasons = list(emp.get('filterReasons') or [])
-            effective_reason = reason
-            if filter_reasons:
-                effective_reason = 'filtered'
-
-            missing_records.append({
-                'id': emp_id,
-                'name': emp.get('name'),
-                'title': emp.get('title'),
-                'department': emp.get('department'),
-                'email': emp.get('email'),
-                'phone': emp.get('phone'),
-                'businessPhone': emp.get('businessPhone'),
-                'location': emp.get('location') or emp.get('officeLocation') or '',
-                'managerName': manager_name,
-                'reason': effective_reason,
-                'missingReason': reason,
-                'filterReasons': filter_reasons,
-                'accountEnabled': emp.get('accountEnabled', True),
-                'userType': (emp.get('userType') or '').lower(),
-                'licenseCount': emp.get('licenseCount') or 0,
-                'licenseSkus': list(emp.get('licenseSkus') or []),
-                'licenseSkuIds': list(emp.get('licenseSkuIds') or []),
-                'mailboxType': emp.get('mailboxType'),
-                'isSharedMailbox': emp.get('isSharedMailbox'),
-            })
+def page_hierarchy(node, depth, org_index, expand_ids=frozenset()):
+    """Copy ``node`` down to ``depth`` levels, summarising deeper reports as counts.
 
-    missing_records.sort(key=lambda item: (item.get('department') or '', item.get('name') or ''))
-    return missing_records
+    Every returned node carries ``directReportCount``, ``descendantCount`` and
+    ``childrenLoaded``; nodes whose reports were cut off have an empty
+    ``children`` list. Ids in ``expand_ids`` are always expanded one more level
+    so a path to a specific employee can be loaded in one request.
+    """
+    node_id = node.get('id')
+    children = [child for child in node.get('children') or [] if is_record(child)]
+    paged = {key: value for key, value in node.items() if key != 'children'}
+    paged['directReportCount'] = len(children)
+    paged['descendantCount'] = org_index.descendant_count(node_id)
 
+    if children and (depth > 0 or node_id in expand_ids):
+        paged['children'] = [page_hierarchy(child, depth - 1, org_index, expand_ids) for child in children]
+        paged['childrenLoaded'] = True
+    else:
+        paged['children'] = []
+        paged['childrenLoaded'] = not children
+    return paged
 
-def update_employee_data():
-    try:
-        # Ensure data directory exists and is writable
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR, exist_ok=True)
-            logger.info(f"Created data directory: {DATA_DIR}")
 
-        # Test if we can write to the data directory
-        test_file = os.path.join(DATA_DIR, 'test_write.tmp')
-        try:
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
-        except Exception as e:
-            logger.error(f"Cannot write to data directory {DATA_DIR}: {e}")
-            return
+_rebuilt_org_index = {'generation': None, 'index': None}
 
-        logger.info(f"[{datetime.now()}] Starting employee data update...")
 
-        token = get_access_token()
-        if not token:
-            logger.error("Unable to refresh employee data because access token retrieval failed")
-            return
+def get_org_index():
+    """Return the interval index for the cached hierarchy, rebuilding it if missing.
 
-        settings = load_settings()
-        months_threshold = settings.get('newEmployeeMonths', 3)
+    A published generation is never modified, so a rebuilt index is kept in
+    this process for the generation it was built from rather than written back.
+    """
+    org_index = load_org_index(dataset_path(ORG_INDEX_FILE))
+    generation = dataset_generation(ORG_INDEX_FILE)
+    if org_index is not None and (generation is None or org_index.generation == generation):
+        return org_index
 
-        employees, filtered_with_license, filtered_users = fetch_all_employees(
-            token=token,
-            settings=settings,
-            fallback_loader=_load_fetch_all_employees_fallback,
-        )
+    live = active_generation()
+    if live is not None and _rebuilt_org_index['generation'] == live:
+        return _rebuilt_org_index['index']
 
-        if employees:
-            ignored_employee_set = parse_ignored_employees(settings)
-            ignored_department_set = parse_ignored_departments(settings)
-
-            if ignored_employee_set:
-                before = len(employees)
-                employees = [
-                    emp for emp in employees
-                    if not employee_is_ignored(
-                        emp.get('name'),
-                        emp.get('email'),
-                        emp.get('userPrincipalName'),
-                        ignored_employee_set
-                    )
-                ]
-                if before != len(employees):
-                    logger.info(f"Filtered ignored employees; {before}->{len(employees)} remaining")
-
-            if ignored_department_set:
-                before = len(employees)
-                employees = [
-                    emp for emp in employees
-                    if not department_is_ignored(emp.get('department'), ignored_department_set)
-                ]
-                logger.info(
-                    f"Filtered ignored departments {sorted(list(ignored_department_set))}; {before}->{len(employees)} employees"
-                )
+    hierarchy = load_live_hierarchy()
+    if not hierarchy:
+        return org_index
 
-            try:
-                with open(EMPLOYEE_LIST_FILE, 'w') as employee_cache:
-                    json.dump(employees, employee_cache, indent=2)
-                logger.info(f"Cached {len(employees)} employees for session-specific hierarchy builds")
-            except Exception as cache_error:
-                logger.error(f"Failed to write employee cache: {cache_error}")
-
-            hierarchy = build_org_hierarchy(employees, settings=settings)
-
-            if filtered_users:
-                combined_by_id: dict[str, dict] = {}
-                for record in employees:
-                    record_id = record.get('id')
-                    if record_id:
-                        combined_by_id[str(record_id)] = record
-                    else:
-                        combined_by_id[f'anon-emp-{id(record)}'] = record
-                for record in filtered_users:
-                    candidate = dict(record)
-                    candidate.setdefault('children', [])
-                    record_id = candidate.get('id')
-                    if record_id:
-                        combined_by_id[str(record_id)] = candidate
-                    else:
-                        combined_by_id[f'anon-filtered-{id(record)}'] = candidate
-                missing_source_records = list(combined_by_id.values())
-            else:
-                missing_source_records = employees
+    org_index = OrgIntervalIndex.from_hierarchy(hierarchy)
+    _rebuilt_org_index.update({'generation': live, 'index': org_index})
+    return org_index
 
-            missing_records = collect_missing_manager_records(missing_source_records, hierarchy, settings)
 
-            if missing_records:
-                enrichment_headers = {
-                    "Authorization": f"Bearer {token}",
-                    "Content-Type": "application/json",
-                }
-                _enrich_mailbox_metadata(enrichment_headers, missing_records, max_lookups=0)
+def load_hierarchy_snapshot():
+    """Return the cached hierarchy and an id -> node map, parsed once per file version.
 
-            if hierarchy:
-                def update_new_status(node):
-                    if node.get('hireDate'):
-                        try:
-                            hire_date = datetime.fromisoformat(node['hireDate'])
-                            if hire_date.tzinfo:
-                                cutoff_date = datetime.now(hire_date.tzinfo) - timedelta(days=months_threshold * 30)
-                            else:
-                                cutoff_date = datetime.now() - timedelta(days=months_threshold * 30)
-                            node['isNewEmployee'] = hire_date > cutoff_date
-                        except Exception:
-                            node['isNewEmployee'] = False
-                    else:
-                        node['isNewEmployee'] = False
+    The tree is held as compact ``OrgNode`` records for as long as the file
+    is current; use ``to_dict()`` before handing a node to code that mutates it.
+    """
+    path = hierarchy_data_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, {}
 
-                    for child in node.get('children', []) or []:
-                        update_new_status(child)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _hierarchy_snapshot_lock:
+        if _hierarchy_snapshot['key'] == key:
+            return _hierarchy_snapshot['data'], _hierarchy_snapshot['nodes']
 
-                update_new_status(hierarchy)
+    with open(path, 'r') as f:
+        data = OrgNode.from_hierarchy(json_codec.load(f))
 
-                with open(DATA_FILE, 'w') as f:
-                    json.dump(hierarchy, f, indent=2)
-                logger.info(f"[{datetime.now()}] Successfully updated employee data. Total employees: {len(employees)}")
+    nodes = {}
+    for node in data.walk() if data is not None else ():
+        nodes.setdefault(node.get('id'), node)
 
-                try:
-                    with open(MISSING_MANAGER_FILE, 'w') as report_file:
-                        json.dump(missing_records, report_file, indent=2)
-                    logger.info(f"Updated missing manager report cache with {len(missing_records)} records")
-                except Exception as report_error:
-                    logger.error(f"Failed to write missing manager report cache: {report_error}")
-            else:
-                logger.error(f"[{datetime.now()}] Could not build hierarchy from employee data")
+    with _hierarchy_snapshot_lock:
+        _hierarchy_snapshot.update({'key': key, 'data': data, 'nodes': nodes})
+    return data, nodes
 
-            try:
-                recently_hired_records = collect_recently_hired_employees(employees, days=365)
-                with open(RECENTLY_HIRED_FILE, 'w') as report_file:
-                    json.dump(recently_hired_records, report_file, indent=2)
-                logger.info(
-                    f"Updated recently hired employees report cache with {len(recently_hired_records)} records"
-                )
-            except Exception as report_error:
-                logger.error(f"Failed to write recently hired employees report cache: {report_error}")
-        else:
-            logger.error(f"[{datetime.now()}] No employees fetched from Graph API")
 
-        try:
-            filtered_user_records = filtered_users or []
-            with open(FILTERED_USERS_FILE, 'w') as report_file:
-                json.dump(filtered_user_records, report_file, indent=2)
-            logger.info(
-                f"Updated filtered users report cache with {len(filtered_user_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write filtered users report cache: {report_error}")
+def load_live_hierarchy():
+    """The active generation's hierarchy from the caches ``warm_caches`` loads; None without one.
 
-        try:
-            filtered_license_records = filtered_with_license or []
-            with open(FILTERED_LICENSE_FILE, 'w') as report_file:
-                json.dump(filtered_license_records, report_file, indent=2)
-            logger.info(
-                f"Updated filtered licensed users report cache with {len(filtered_license_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write filtered licensed users report cache: {report_error}")
+    A mapped binary snapshot yields a fresh dict tree. Otherwise this is the
+    shared ``OrgNode`` tree of ``load_hierarchy_snapshot``, which callers must
+    copy with ``to_dict()`` before modifying.
+    """
+    snapshot = load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE))
+    if snapshot is not None:
+        return snapshot.to_hierarchy()
+    hierarchy, _ = load_hierarchy_snapshot()
+    return hierarchy
 
-        try:
-            last_login_records = collect_last_login_records(token=token)
-            with open(LAST_LOGIN_FILE, 'w') as report_file:
-                json.dump(last_login_records, report_file, indent=2)
-            logger.info(
-                f"Updated last sign-in report cache with {len(last_login_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write last sign-in report cache: {report_error}")
 
+def hierarchy_store():
+    """Return the SQLite store or mapped binary snapshot holding the hierarchy, else None."""
+    if datastore is not None:
         try:
-            existing_disabled_records = []
-            if os.path.exists(DISABLED_USERS_FILE):
-                try:
-                    with open(DISABLED_USERS_FILE, 'r') as previous_file:
-                        data = json.load(previous_file)
-                        if isinstance(data, list):
-                            existing_disabled_records = data
-                except Exception as previous_error:
-                    logger.warning(f"Unable to load existing disabled users cache: {previous_error}")
-
-            disabled_user_records = collect_disabled_users(
-                token=token,
-                previous_records=existing_disabled_records
-            ) or []
-            with open(DISABLED_USERS_FILE, 'w') as report_file:
-                json.dump(disabled_user_records, report_file, indent=2)
-            logger.info(
-                f"Updated disabled users report cache with {len(disabled_user_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write disabled users report cache: {report_error}")
+            if datastore.has_dataset('hierarchy'):
+                return datastore
+        except Exception as e:
+            logger.error(f"SQLite data store unavailable: {e}")
+    return load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE))
 
-        try:
-            disabled_license_records = [
-                record for record in disabled_user_records if (record.get('licenseCount') or 0) > 0
-            ]
-
-            with open(DISABLED_LICENSE_FILE, 'w') as report_file:
-                json.dump(disabled_license_records, report_file, indent=2)
-            logger.info(
-                f"Updated disabled licensed users report cache with {len(disabled_license_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write disabled licensed users report cache: {report_error}")
 
-        try:
-            recently_disabled_records = collect_recently_disabled_employees(disabled_user_records, days=365)
-            with open(RECENTLY_DISABLED_FILE, 'w') as report_file:
-                json.dump(recently_disabled_records, report_file, indent=2)
-            logger.info(
-                f"Updated recently disabled employees report cache with {len(recently_disabled_records)} records"
-            )
-        except Exception as report_error:
-            logger.error(f"Failed to write recently disabled employees report cache: {report_error}")
-    except Exception as e:
-        logger.error(f"[{datetime.now()}] Error updating employee data: {e}")
+_warm_state = {'generation': None}
 
 
-configure_scheduler(update_employee_data)
-report_cache = ReportCacheManager(refresh_callback=update_employee_data)
+def warm_caches():
+    """Load the live generation's hierarchy and org index into this process.
 
+    The gunicorn master calls this before forking (see
+    ``deploy/gunicorn.conf.py``) so workers inherit the parsed data
+    copy-on-write instead of each parsing the caches again. Only file-backed
+    caches are touched; SQLite connections must not cross a fork. Returns the
+    generation that is loaded.
+    """
+    generation = current_generation()
+    if generation is not None and generation == _warm_state['generation']:
+        return generation
 
-def load_cached_employees():
-    if os.path.exists(EMPLOYEE_LIST_FILE):
-        try:
-            with open(EMPLOYEE_LIST_FILE, 'r') as cache_file:
-                return json.load(cache_file)
-        except Exception as e:
-            logger.error(f"Failed to read employee cache {EMPLOYEE_LIST_FILE}: {e}")
-    return None
+    started = time.monotonic()
+    try:
+        snapshot = load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE))
+        if snapshot is None and datastore is None:
+            load_hierarchy_snapshot()
+        org_index = load_org_index(dataset_path(ORG_INDEX_FILE))
+    except Exception as e:
+        logger.error(f"Failed to warm data caches: {e}")
+        return None
+
+    _warm_state['generation'] = generation
+    logger.info(
+        f"Warmed data caches for generation {generation} in {time.monotonic() - started:.2f}s "
+        f"({len(org_index) if org_index is not None else 0} employees, pid {os.getpid()})"
+    )
+    return generation
 
 
 def flatten_hierarchy_to_employee_list(root_node):
     employees = []
 
     def _walk(node):
-        if not isinstance(node, dict):
+        if not is_record(node):
             return
 
         entry = {k: v for k, v in node.items() if k != 'children'}
@@ -717,62 +485,22 @@ def get_employee_list_for_metadata():
     if employees:
         return employees
 
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as data_file:
-                hierarchy = json.load(data_file)
-            if hierarchy:
-                return flatten_hierarchy_to_employee_list(hierarchy)
-        except Exception as error:
-            logger.error(f"Failed to read hierarchy for metadata: {error}")
+    try:
+        hierarchy = load_live_hierarchy()
+        if hierarchy:
+            return flatten_hierarchy_to_employee_list(hierarchy)
+    except Exception as error:
+        logger.error(f"Failed to read hierarchy for metadata: {error}")
 
     return []
 
 
-def collect_unique_field_values(employees, field_name):
-    unique = {}
-    for employee in employees or []:
-        value = (employee.get(field_name) or '').strip()
-        if not value:
-            continue
-        key = value.lower()
-        if key not in unique:
-            unique[key] = value
-
-    return sorted(unique.values(), key=lambda item: item.lower())
-
-
-def collect_employee_option_labels(employees):
-    options = {}
-    for employee in employees or []:
-        name = (employee.get('name') or '').strip()
-        email = (employee.get('email') or '').strip()
-        user_principal_name = (employee.get('userPrincipalName') or '').strip()
-
-        contact = email or user_principal_name
-
-        if not name and not contact:
-            continue
-
-        if name and contact:
-            label = f"{name} <{contact}>"
-        else:
-            label = name or contact
-
-        primary_key = normalize_filter_value(contact) or normalize_filter_value(name) or normalize_filter_value(label)
-        if not primary_key:
-            continue
-
-        if primary_key not in options:
-            options[primary_key] = label
-
-    return sorted(options.values(), key=lambda item: item.lower())
-
 if hasattr(app, 'before_serving'):
 
     @app.before_serving
     def _start_scheduler_when_ready():
-        start_scheduler()
+        if not sync_jobs.delegate:
+            start_scheduler()
 
 
     @app.after_serving
@@ -783,7 +511,7 @@ elif hasattr(app, 'before_request'):
 
     @app.before_request
     def _ensure_scheduler_started():
-        if not is_scheduler_running():
+        if not sync_jobs.delegate and not is_scheduler_running():
             start_scheduler()
 
 
@@ -1007,21 +735,86 @@ def get_employee_photo(user_id):
         logger.error(f"Error serving photo for user {user_id}: {e}")
         return send_from_directory(app.static_folder, 'usericon.png')
 
+# Datasets the org chart page refetches when their content changes.
+CLIENT_DATASETS = {'hierarchy': DATA_FILE, 'searchIndex': SEARCH_INDEX_FILE}
+
+
+def data_generation_state():
+    """The live generation and a content fingerprint of each dataset in ``CLIENT_DATASETS``.
+
+    Reads the live generation rather than the request's pinned one, so a held
+    event stream notices publishes.
+    """
+    generation = current_generation()
+    manifest = generation_manifest(generation) if generation else {}
+    versions = {}
+    for name, path in CLIENT_DATASETS.items():
+        entry = manifest.get(os.path.basename(path))
+        # Generations without a manifest fall back to the generation id, which changes on every publish.
+        versions[name] = entry.get('sha256') if entry else generation
+    return {'generation': generation, 'versions': versions}
+
+
+@app.route('/api/data/events')
+def stream_data_generation():
+    """Announce published data generations as Server-Sent Events.
+
+    Each ``generation`` event carries the live generation (also used as the
+    event id) and the fingerprints from ``data_generation_state``. A browser
+    reconnecting with ``Last-Event-ID`` only gets an event when the generation
+    changed. The response is held for ``DATA_EVENTS_HOLD_SECONDS``; with
+    gunicorn's sync workers every held stream occupies a worker, so the
+    default answers at once and EventSource reconnects every
+    ``DATA_EVENTS_RETRY_SECONDS``.
+    """
+    last_seen = request.headers.get('Last-Event-ID') or request.args.get('since') or None
+    hold_seconds = data_events_hold_seconds()
+    retry_ms = data_events_retry_seconds() * 1000
+
+    def events():
+        deadline = time.monotonic() + hold_seconds
+        next_ping = time.monotonic() + 15
+        seen = last_seen
+        yield f'retry: {retry_ms}\n\n'
+        while True:
+            state = data_generation_state()
+            if state['generation'] and state['generation'] != seen:
+                seen = state['generation']
+                yield f"id: {seen}\nevent: generation\ndata: {json.dumps(state)}\n\n"
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now >= next_ping:
+                # Keeps proxies from closing an idle held stream.
+                yield ': ping\n\n'
+                next_ping = now + 15
+            time.sleep(1)
+
+    try:
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    except Exception as e:
+        logger.error(f"Error streaming data generation events: {e}")
+        return jsonify({'error': 'Failed to stream data events'}), 500
+
+
 @app.route('/api/employees')
 def get_employees():
     try:
         logger.info("API request for /api/employees received")
-        if not os.path.exists(DATA_FILE):
+        if not hierarchy_available():
             logger.info("Data file does not exist, attempting to create it...")
-            update_employee_data()
-            
-        # Double check the file exists after update attempt
-        if not os.path.exists(DATA_FILE):
-            logger.error(f"Could not create data file {DATA_FILE}")
-            return jsonify({'error': 'No employee data available. Please check configuration.'}), 500
+            job = run_sync_job('missing employee data', fresh=False)
+
+            # Double check the file exists after update attempt
+            if not hierarchy_available():
+                logger.error(f"Could not create data file {DATA_FILE}")
+                return sync_pending_response(job)
         
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
+        data = load_live_hierarchy()
 
         settings = load_settings()
         months_threshold = settings.get('newEmployeeMonths', 3)
@@ -1047,38 +840,45 @@ def get_employees():
             if not employees and data:
                 employees = flatten_hierarchy_to_employee_list(data)
             if not employees:
-                logger.info("Employee cache unavailable; fetching employees from Graph API for top user override")
-                employees, _, _ = fetch_all_employees(
-                    fallback_loader=_load_fetch_all_employees_fallback,
-                )
-                if employees:
-                    try:
-                        with open(EMPLOYEE_LIST_FILE, 'w') as cache_file:
-                            json.dump(employees, cache_file, indent=2)
-                    except Exception as cache_error:
-                        logger.error(f"Failed to refresh employee cache: {cache_error}")
+                logger.info("Employee cache unavailable; requesting a sync for top user override")
+                job = run_sync_job('missing employee data', fresh=False)
+                if not job.done:
+                    return sync_pending_response(job)
+                employees = load_cached_employees()
 
             if employees:
-                override_hierarchy = build_org_hierarchy(
+                override_hierarchy, override_index = build_org_hierarchy(
                     employees,
                     top_user_email_override=requested_top_user,
-                    settings=settings
+                    settings=settings,
+                    with_index=True
                 )
                 if override_hierarchy:
                     data = override_hierarchy
 
-                    if override_reason == 'environment default enforcement':
+                    # With a sync worker only it publishes; serve the override unpersisted.
+                    if override_reason == 'environment default enforcement' and not sync_jobs.delegate:
                         try:
-                            with open(DATA_FILE, 'w') as data_file:
-                                json.dump(data, data_file, indent=2)
+                            generation = begin_generation()
+                            write_hierarchy_cache(data, override_index, generation)
+                            write_search_index_cache(data, generation)
+                            write_org_index_cache(override_index, generation)
                             missing_records = collect_missing_manager_records(
                                 employees,
                                 data,
                                 settings,
                                 top_user_email_override=requested_top_user
                             )
-                            with open(MISSING_MANAGER_FILE, 'w') as report_file:
-                                json.dump(missing_records, report_file, indent=2)
+                            write_dataset(dataset_path(MISSING_MANAGER_FILE, generation), json_codec.dumps(missing_records))
+                            if datastore is not None:
+                                datastore.write_sync(
+                                    generation,
+                                    hierarchy=data,
+                                    org_index=override_index,
+                                    reports={'missing_manager': missing_records},
+                                )
+                            publish_generation(generation)
+                            query_cache.clear()
                             logger.info("Refreshed global hierarchy cache to align with environment top user")
                         except Exception as cache_error:
                             logger.error(f"Failed to persist environment-aligned hierarchy: {cache_error}")
@@ -1087,26 +887,20 @@ def get_employees():
             else:
                 logger.warning("Unable to locate employee data while applying top user override; returning cached hierarchy")
         
+        depth = _parse_depth_arg(request.args.get('depth'))
+        if data and depth is not None and not session_override_present:
+            org_index = get_org_index()
+            if org_index is None or org_index.row(data.get('id')) != 0:
+                org_index = OrgIntervalIndex.from_hierarchy(data)
+            if len(org_index) > lazy_load_threshold():
+                logger.info(f"Paging org chart to depth {depth} for {len(org_index)} employees")
+                data = page_hierarchy(data, depth, org_index)
+
+        if isinstance(data, OrgNode):
+            # The warmed tree is shared by every request; flag a copy.
+            data = data.to_dict()
         if data:
-            def update_new_status(node):
-                if node.get('hireDate'):
-                    try:
-                        hire_date = datetime.fromisoformat(node['hireDate'])
-                        if hire_date.tzinfo:
-                            cutoff_date = datetime.now(hire_date.tzinfo) - timedelta(days=months_threshold * 30)
-                        else:
-                            cutoff_date = datetime.now() - timedelta(days=months_threshold * 30)
-                        node['isNewEmployee'] = hire_date > cutoff_date
-                    except:
-                        node['isNewEmployee'] = False
-                else:
-                    node['isNewEmployee'] = False
-                
-                if node.get('children'):
-                    for child in node['children']:
-                        update_new_status(child)
-            
-            update_new_status(data)
+            mark_new_employees(data, months_threshold)
         
         # Debug logging for root user
         if data and data.get('name'):
@@ -1114,9 +908,12 @@ def get_employees():
         
         if not data:
             logger.warning("No hierarchical data available")
-            employees, _, _ = fetch_all_employees(
-                fallback_loader=_load_fetch_all_employees_fallback,
-            )
+            employees = load_cached_employees()
+            if not employees:
+                job = run_sync_job('missing employee data', fresh=False)
+                if not job.done:
+                    return sync_pending_response(job)
+                employees = load_cached_employees()
             if employees:
                 data = {
                     'id': 'root',
@@ -1148,6 +945,43 @@ def get_employees():
         logger.error(f"Error in get_employees: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/employees/subtree/<employee_id>')
+def get_employee_subtree(employee_id):
+    """Return one employee's reports down to ``depth`` levels (default 1)."""
+    try:
+        depth = _parse_depth_arg(request.args.get('depth'), default=1)
+        expand_to = request.args.get('expandTo', '').strip()
+        months_threshold = load_settings().get('newEmployeeMonths', 3)
+
+        store = hierarchy_store()
+        if store is not None and not expand_to:
+            paged = store.load_subtree(employee_id, depth=depth)
+            if paged is None:
+                return jsonify({'error': 'Employee not found'}), 404
+            mark_new_employees(paged, months_threshold)
+            return jsonify(paged)
+
+        snapshot = load_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE))
+        if snapshot is not None:
+            node = snapshot.load_subtree(employee_id)
+        else:
+            _, nodes = load_hierarchy_snapshot()
+            node = nodes.get(employee_id)
+        org_index = get_org_index()
+        if node is None or org_index is None:
+            return jsonify({'error': 'Employee not found'}), 404
+
+        expand_ids = frozenset()
+        if expand_to and org_index.is_descendant(expand_to, employee_id):
+            expand_ids = frozenset(org_index.chain(expand_to)[:-1])
+
+        paged = page_hierarchy(node, depth, org_index, expand_ids)
+        mark_new_employees(paged, months_threshold)
+        return jsonify(paged)
+    except Exception as e:
+        logger.error(f"Error loading subtree for {employee_id}: {e}")
+        return jsonify({'error': 'Failed to load subtree'}), 500
+
 @app.route('/api/settings', methods=['GET', 'POST'])
 def handle_settings():
     if request.method == 'GET':
@@ -1165,14 +999,26 @@ def handle_settings():
         try:
             # Simply update settings without validation
             new_settings = request.json
+            schedule_errors = validate_scheduled_jobs(new_settings.get('scheduledJobs'))
+            if schedule_errors:
+                return jsonify({'error': '; '.join(schedule_errors)}), 400
             current_settings = load_settings()
+            directory_changed = any(
+                key in new_settings and new_settings[key] != current_settings.get(key)
+                for key in DIRECTORY_SETTING_KEYS
+            )
             current_settings.update(new_settings)
             
             if save_settings(current_settings):
-                if ('updateTime' in new_settings or 'autoUpdateEnabled' in new_settings or 'updateTimezone' in new_settings):
+                # A separate sync worker notices saved settings on its own.
+                if not sync_jobs.delegate and any(key in new_settings for key in ('updateTime', 'autoUpdateEnabled', 'updateTimezone', 'scheduledJobs')):
                     threading.Thread(target=restart_scheduler).start()
+
+                if directory_changed:
+                    # Apply new filters to the archived crawl instead of waiting for the next sync.
+                    sync_jobs.request('settings changed', kind='rederive')
                 
-                return jsonify({'success': True})
+                return jsonify({'success': True, 'rederiving': directory_changed})
             else:
                 return jsonify({'error': 'Failed to save settings'}), 500
         except Exception as e:
@@ -1183,16 +1029,20 @@ def handle_settings():
 @app.route('/api/metadata/options')
 @require_auth
 def get_metadata_options():
-    employees = get_employee_list_for_metadata()
-    job_titles = collect_unique_field_values(employees, 'title')
-    departments = collect_unique_field_values(employees, 'department')
-    employee_options = collect_employee_option_labels(employees)
-
-    return jsonify({
-        'jobTitles': job_titles,
-        'departments': departments,
-        'employees': employee_options
-    })
+    if not os.path.exists(dataset_path(METADATA_OPTIONS_FILE)):
+        # Caches written before option lists were precomputed; the published
+        # generation stays as it is, so derive them for this response only.
+        return jsonify(build_metadata_options(get_employee_list_for_metadata()))
+
+    response = send_file(
+        dataset_path(METADATA_OPTIONS_FILE),
+        mimetype='application/json',
+        conditional=True,
+        etag=dataset_etag(METADATA_OPTIONS_FILE) or True,
+        max_age=0
+    )
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @app.route('/api/set-top-user', methods=['POST'])
 @limiter.limit("20 per minute")
@@ -1495,7 +1345,8 @@ def reset_all_settings():
         
         save_settings(DEFAULT_SETTINGS)
         
-        threading.Thread(target=restart_scheduler).start()
+        if not sync_jobs.delegate:
+            threading.Thread(target=restart_scheduler).start()
         
         return jsonify({'success': True})
     except Exception as e:
@@ -1528,11 +1379,14 @@ def export_xlsx():
     
     try:
         # Load employee data
-        if not os.path.exists(DATA_FILE):
-            update_employee_data()
+        if not hierarchy_available():
+            job = run_sync_job('missing employee data', fresh=False)
+            if not hierarchy_available():
+                return sync_pending_response(job)
         
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
+        data = load_live_hierarchy()
+        if isinstance(data, OrgNode):
+            data = data.to_dict()
         
         if not data:
             return jsonify({'error': 'No employee data available'}), 404
@@ -1656,17 +1510,17 @@ def _get_disabled_records_from_request(*, force_refresh=False, apply_filters=Tru
         except ValueError:
             logger.warning(f"Invalid recentDays value provided: {recent_days_raw}")
 
-    records = load_disabled_users_data(report_cache, force_refresh=force_refresh)
-    filtered_records = (
-        apply_disabled_filters(
-            records,
+    if apply_filters:
+        filtered_records = query_disabled_users_data(
+            report_cache,
+            force_refresh=force_refresh,
             licensed_only=licensed_only,
             recent_days=recent_days,
             include_guests=include_guests,
             include_members=include_members
         )
-        if apply_filters else records
-    )
+    else:
+        filtered_records = load_disabled_users_data(report_cache, force_refresh=force_refresh)
 
     filter_payload = {
         'licensedOnly': licensed_only,
@@ -1680,6 +1534,7 @@ def _get_disabled_records_from_request(*, force_refresh=False, apply_filters=Tru
 
 @app.route('/api/reports/missing-manager')
 @require_auth
+@cached_query
 def get_missing_manager_report():
     try:
         refresh = _parse_bool_arg(request.args.get('refresh'), default=False)
@@ -1693,9 +1548,9 @@ def get_missing_manager_report():
         include_members = _parse_bool_arg(request.args.get('includeMembers'), default=True)
         include_guests = _parse_bool_arg(request.args.get('includeGuests'), default=False)
 
-        records = load_missing_manager_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_missing_manager_filters(
-            records,
+        filtered_records = query_missing_manager_data(
+            report_cache,
+            force_refresh=refresh,
             include_user_mailboxes=include_user_mailboxes,
             include_shared_mailboxes=include_shared_mailboxes,
             include_room_equipment_mailboxes=include_room_equipment_mailboxes,
@@ -1707,8 +1562,8 @@ def get_missing_manager_report():
             include_guests=include_guests,
         )
         generated_at = None
-        if os.path.exists(MISSING_MANAGER_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(MISSING_MANAGER_FILE)).isoformat()
+        if os.path.exists(dataset_path(MISSING_MANAGER_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(MISSING_MANAGER_FILE))).isoformat()
 
         return jsonify({
             'records': filtered_records,
@@ -1749,9 +1604,9 @@ def export_missing_manager_report():
         include_members = _parse_bool_arg(request.args.get('includeMembers'), default=True)
         include_guests = _parse_bool_arg(request.args.get('includeGuests'), default=False)
 
-        records = load_missing_manager_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_missing_manager_filters(
-            records,
+        filtered_records = query_missing_manager_data(
+            report_cache,
+            force_refresh=refresh,
             include_user_mailboxes=include_user_mailboxes,
             include_shared_mailboxes=include_shared_mailboxes,
             include_room_equipment_mailboxes=include_room_equipment_mailboxes,
@@ -1821,6 +1676,7 @@ def export_missing_manager_report():
 
 @app.route('/api/reports/disabled-users')
 @require_auth
+@cached_query
 def get_disabled_users_report():
     try:
         refresh = request.args.get('refresh', 'false').lower() == 'true'
@@ -1830,8 +1686,8 @@ def get_disabled_users_report():
         )
 
         generated_at = None
-        if os.path.exists(DISABLED_USERS_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(DISABLED_USERS_FILE)).isoformat()
+        if os.path.exists(dataset_path(DISABLED_USERS_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(DISABLED_USERS_FILE))).isoformat()
 
         return jsonify({
             'records': filtered_records,
@@ -1911,6 +1767,7 @@ def export_disabled_users_report():
 
 @app.route('/api/reports/disabled-this-year')
 @require_auth
+@cached_query
 def get_recently_disabled_report():
     try:
         refresh = request.args.get('refresh', 'false').lower() == 'true'
@@ -1939,8 +1796,8 @@ def get_recently_disabled_report():
             include_guests=include_guests
         )
         generated_at = None
-        if os.path.exists(RECENTLY_DISABLED_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(RECENTLY_DISABLED_FILE)).isoformat()
+        if os.path.exists(dataset_path(RECENTLY_DISABLED_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(RECENTLY_DISABLED_FILE))).isoformat()
 
         return jsonify({
             'records': records,
@@ -2044,13 +1901,14 @@ def export_recently_disabled_report():
 
 @app.route('/api/reports/hired-this-year')
 @require_auth
+@cached_query
 def get_recently_hired_report():
     try:
         refresh = request.args.get('refresh', 'false').lower() == 'true'
         records = load_recently_hired_data(report_cache, force_refresh=refresh)
         generated_at = None
-        if os.path.exists(RECENTLY_HIRED_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(RECENTLY_HIRED_FILE)).isoformat()
+        if os.path.exists(dataset_path(RECENTLY_HIRED_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(RECENTLY_HIRED_FILE))).isoformat()
 
         return jsonify({
             'records': records,
@@ -2136,6 +1994,7 @@ def _parse_bool_arg(value, default=True):
 
 @app.route('/api/reports/last-logins')
 @require_auth
+@cached_query
 def get_last_logins_report():
     try:
         refresh = _parse_bool_arg(request.args.get('refresh'), default=False)
@@ -2161,9 +2020,9 @@ def get_last_logins_report():
         if inactive_days_max_raw not in (None, '', 'null', 'None'):
             inactive_days_max = inactive_days_max_raw
 
-        records = load_last_login_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_last_login_filters(
-            records,
+        filtered_records = query_last_login_data(
+            report_cache,
+            force_refresh=refresh,
             include_enabled=include_enabled,
             include_disabled=include_disabled,
             include_licensed=include_licensed,
@@ -2179,8 +2038,8 @@ def get_last_logins_report():
         )
 
         generated_at = None
-        if os.path.exists(LAST_LOGIN_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(LAST_LOGIN_FILE)).isoformat()
+        if os.path.exists(dataset_path(LAST_LOGIN_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(LAST_LOGIN_FILE))).isoformat()
 
         return jsonify({
             'records': filtered_records,
@@ -2236,9 +2095,9 @@ def export_last_logins_report():
         if inactive_days_max_raw not in (None, '', 'null', 'None'):
             inactive_days_max = inactive_days_max_raw
 
-        records = load_last_login_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_last_login_filters(
-            records,
+        filtered_records = query_last_login_data(
+            report_cache,
+            force_refresh=refresh,
             include_enabled=include_enabled,
             include_disabled=include_disabled,
             include_licensed=include_licensed,
@@ -2318,6 +2177,7 @@ def export_last_logins_report():
 
 @app.route('/api/reports/disabled-licensed')
 @require_auth
+@cached_query
 def get_disabled_licensed_report():
     try:
         refresh = request.args.get('refresh', 'false').lower() == 'true'
@@ -2335,8 +2195,8 @@ def get_disabled_licensed_report():
             include_guests=include_guests
         )
         generated_at = None
-        if os.path.exists(DISABLED_LICENSE_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(DISABLED_LICENSE_FILE)).isoformat()
+        if os.path.exists(dataset_path(DISABLED_LICENSE_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(DISABLED_LICENSE_FILE))).isoformat()
 
         return jsonify({
             'records': filtered_records,
@@ -2423,6 +2283,7 @@ def export_disabled_licensed_report():
 
 @app.route('/api/reports/filtered-users')
 @require_auth
+@cached_query
 def get_filtered_users_report():
     try:
         refresh = _parse_bool_arg(request.args.get('refresh'), default=False)
@@ -2444,9 +2305,9 @@ def get_filtered_users_report():
             if 'includeUnlicensed' not in request.args:
                 include_unlicensed = not legacy_licensed_only
 
-        records = load_filtered_user_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_filtered_user_filters(
-            records,
+        filtered_records = query_filtered_user_data(
+            report_cache,
+            force_refresh=refresh,
             include_user_mailboxes=include_user_mailboxes,
             include_shared_mailboxes=include_shared_mailboxes,
             include_room_equipment_mailboxes=include_room_equipment_mailboxes,
@@ -2459,8 +2320,8 @@ def get_filtered_users_report():
         )
 
         generated_at = None
-        if os.path.exists(FILTERED_USERS_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(FILTERED_USERS_FILE)).isoformat()
+        if os.path.exists(dataset_path(FILTERED_USERS_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(FILTERED_USERS_FILE))).isoformat()
 
         return jsonify({
             'records': filtered_records,
@@ -2509,9 +2370,9 @@ def export_filtered_users_report():
             if 'includeUnlicensed' not in request.args:
                 include_unlicensed = not legacy_licensed_only
 
-        records = load_filtered_user_data(report_cache, force_refresh=refresh)
-        filtered_records = apply_filtered_user_filters(
-            records,
+        filtered_records = query_filtered_user_data(
+            report_cache,
+            force_refresh=refresh,
             include_user_mailboxes=include_user_mailboxes,
             include_shared_mailboxes=include_shared_mailboxes,
             include_room_equipment_mailboxes=include_room_equipment_mailboxes,
@@ -2592,13 +2453,14 @@ def export_filtered_users_report():
 
 @app.route('/api/reports/filtered-licensed')
 @require_auth
+@cached_query
 def get_filtered_licensed_report():
     try:
         refresh = request.args.get('refresh', 'false').lower() == 'true'
         records = load_filtered_license_data(report_cache, force_refresh=refresh)
         generated_at = None
-        if os.path.exists(FILTERED_LICENSE_FILE):
-            generated_at = datetime.fromtimestamp(os.path.getmtime(FILTERED_LICENSE_FILE)).isoformat()
+        if os.path.exists(dataset_path(FILTERED_LICENSE_FILE)):
+            generated_at = datetime.fromtimestamp(os.path.getmtime(dataset_path(FILTERED_LICENSE_FILE))).isoformat()
 
         return jsonify({
             'records': records,
@@ -2688,6 +2550,7 @@ def auth_check():
         return jsonify({'authenticated': False}), 401
 
 @app.route('/api/search')
+@cached_query
 def search_employees():
     query = request.args.get('q', '').lower()
     
@@ -2695,13 +2558,17 @@ def search_employees():
         return jsonify([])
     
     try:
-        if not os.path.exists(DATA_FILE):
+        store = hierarchy_store()
+        if store is not None:
+            return jsonify(store.search_hierarchy(query, limit=10))
+
+        if not hierarchy_available():
             logger.warning(f"Data file {DATA_FILE} not found, attempting to fetch data")
-            update_employee_data()
+            run_sync_job('missing employee data', fresh=False)
         
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
+        if os.path.exists(hierarchy_data_path()):
+            with open(hierarchy_data_path(), 'r') as f:
+                data = json_codec.load(f)
         else:
             logger.error("Could not create or find employee data file")
             return jsonify([])
@@ -2757,22 +2624,224 @@ def search_employees():
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def _history_range_args():
+    since = parse_history_time(request.args.get('since'))
+    until = parse_history_time(request.args.get('until'), end_of_day=True)
+    return since, until
+
+
+@app.route('/api/history')
+@require_auth
+def get_history_index():
+    """List recorded syncs with their headcount and change counts."""
+    if history_store is None:
+        return jsonify({'error': 'Org history is disabled'}), 404
+    return jsonify({'entries': history_store.entries()})
+
+
+@app.route('/api/history/hierarchy')
+@require_auth
+def get_history_hierarchy():
+    """Rebuild the org chart as it was at ``?at=<ISO date or timestamp>`` (latest if omitted)."""
+    if history_store is None:
+        return jsonify({'error': 'Org history is disabled'}), 404
+    try:
+        at = parse_history_time(request.args.get('at'), end_of_day=True)
+    except ValueError:
+        return jsonify({'error': 'Invalid at parameter'}), 400
+    try:
+        entry, records = history_store.state_at(at)
+        if entry is None:
+            return jsonify({'error': 'No history recorded for that time'}), 404
+        employees = [dict(record) for record in records.values()]
+        hierarchy = build_org_hierarchy(employees, settings=load_settings())
+        return jsonify({
+            'sequence': entry['sequence'],
+            'syncedAt': entry['syncedAt'],
+            'headcount': len(employees),
+            'hierarchy': hierarchy,
+        })
+    except Exception as e:
+        logger.error(f"Error rebuilding historical hierarchy: {e}")
+        return jsonify({'error': 'Failed to load org history'}), 500
+
+
+@app.route('/api/history/changes')
+@require_auth
+def get_history_changes():
+    """Change feed (added, removed, changed fields) for syncs in ``(since, until]``."""
+    if history_store is None:
+        return jsonify({'error': 'Org history is disabled'}), 404
+    try:
+        since, until = _history_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid since/until parameter'}), 400
+    try:
+        return jsonify({'changes': history_store.changes(since, until)})
+    except Exception as e:
+        logger.error(f"Error loading org history changes: {e}")
+        return jsonify({'error': 'Failed to load org history'}), 500
+
+
+@app.route('/api/history/headcount')
+@require_auth
+def get_history_headcount():
+    """Total and per-department headcount after each sync in ``(since, until]``."""
+    if history_store is None:
+        return jsonify({'error': 'Org history is disabled'}), 404
+    try:
+        since, until = _history_range_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid since/until parameter'}), 400
+    try:
+        return jsonify({'series': history_store.headcount(since, until)})
+    except Exception as e:
+        logger.error(f"Error loading org headcount history: {e}")
+        return jsonify({'error': 'Failed to load org history'}), 500
+
+@app.route('/api/cache/stats')
+@require_auth
+def get_query_cache_stats():
+    """Report hit/miss counters for the per-worker query result cache."""
+    return jsonify({'pid': os.getpid(), 'queryCache': query_cache.stats()})
+
+@app.route('/api/sync/status')
+@require_auth
+def get_sync_status():
+    """Report the running, queued and last directory sync job."""
+    try:
+        return jsonify(sync_jobs.status())
+    except Exception as e:
+        logger.error(f"Error reading sync status: {e}")
+        return jsonify({'error': 'Failed to read sync status'}), 500
+
+def sync_job_links(job):
+    """Where a client can poll or stream the progress of ``job``."""
+    return {
+        'jobId': job.id,
+        'statusUrl': url_for('get_sync_job', job_id=job.id),
+        'streamUrl': url_for('stream_sync_job', jobId=job.id),
+    }
+
+@app.route('/api/sync/jobs/<job_id>')
+@require_auth
+def get_sync_job(job_id):
+    """Report one sync job: state, stages, Graph pages fetched and records processed."""
+    try:
+        status = sync_jobs.job_status(job_id)
+        if status is None:
+            return jsonify({'error': 'Unknown sync job'}), 404
+        return jsonify(status)
+    except Exception as e:
+        logger.error(f"Error reading sync job {job_id}: {e}")
+        return jsonify({'error': 'Failed to read sync job'}), 500
+
+@app.route('/api/sync/stream')
+@require_auth
+def stream_sync_job():
+    """Stream the progress of ``jobId`` as Server-Sent Events.
+
+    Sends a ``progress`` event whenever the job changes and ``done`` once it
+    has finished. Gunicorn's sync workers cannot hold a response past their
+    timeout, so each stream closes after ``SYNC_STREAM_SECONDS`` and the
+    browser's EventSource reconnects.
+    """
+    job_id = request.args.get('jobId')
+    if not job_id:
+        return jsonify({'error': 'jobId is required'}), 400
+
+    def events():
+        deadline = time.monotonic() + progress_stream_seconds()
+        last_payload = None
+        yield 'retry: 1000\n\n'
+        while True:
+            status = sync_jobs.job_status(job_id) or {'id': job_id, 'state': 'unknown'}
+            payload = json.dumps(status)
+            if payload != last_payload:
+                yield f'event: progress\ndata: {payload}\n\n'
+                last_payload = payload
+            if status['state'] in FINISHED_STATES or status['state'] == 'unknown':
+                yield f'event: done\ndata: {payload}\n\n'
+                return
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(0.5)
+
+    try:
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+    except Exception as e:
+        logger.error(f"Error streaming sync job {job_id}: {e}")
+        return jsonify({'error': 'Failed to stream sync job'}), 500
+
+@app.route('/api/sync/metrics')
+@require_auth
+def get_sync_metrics():
+    """Per-stage timings and resource use of recent syncs, newest first."""
+    try:
+        history = load_history()
+        limit = request.args.get('limit', type=int) or len(history)
+        return jsonify({
+            'syncs': list(reversed(history[-limit:])),
+            'trends': stage_trends(history),
+        })
+    except Exception as e:
+        logger.error(f"Error reading sync metrics: {e}")
+        return jsonify({'error': 'Failed to read sync metrics'}), 500
+
+@app.route('/api/sync/cancel', methods=['POST'])
+@require_auth
+def cancel_sync():
+    """Cancel the queued and running sync, or only the job given as ``jobId``."""
+    try:
+        payload = request.get_json(silent=True) or {}
+        job_id = payload.get('jobId') or None
+        cancelled = sync_jobs.cancel(job_id)
+        logger.info(f"Sync cancellation requested by user: {session.get('username')} (job {job_id or 'all'})")
+        return jsonify({'cancelled': cancelled, 'status': sync_jobs.status()}), 200 if cancelled else 409
+    except Exception as e:
+        logger.error(f"Error cancelling sync: {e}")
+        return jsonify({'error': 'Failed to cancel sync'}), 500
+
+@app.route('/api/search-index')
+def get_search_index():
+    """Serve the compact search payload so browsers can search locally."""
+    index_path = dataset_path(SEARCH_INDEX_FILE)
+    if not os.path.exists(index_path):
+        return jsonify({'version': 1, 'generation': active_generation(), 'count': 0, 'clientSearch': False})
+
+    # The index keeps the generation it was built for while its content is unchanged.
+    generation = dataset_generation(SEARCH_INDEX_FILE) or 'initial'
+    etag = f"search-{generation}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        accepts_gzip = 'gzip' in request.accept_encodings and os.path.exists(f"{index_path}.gz")
+        payload_path = f"{index_path}.gz" if accepts_gzip else index_path
+        with open(payload_path, 'rb') as payload_file:
+            response = app.response_class(payload_file.read(), mimetype='application/json')
+        if accepts_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/employee/<employee_id>')
 def get_employee(employee_id):
     try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-        
-        def find_employee(node, target_id):
-            if node.get('id') == target_id:
-                return node
-            for child in node.get('children', []):
-                result = find_employee(child, target_id)
-                if result:
-                    return result
-            return None
-        
-        employee = find_employee(data, employee_id)
+        store = hierarchy_store()
+        if store is not None:
+            employee = store.load_subtree(employee_id)
+        else:
+            _, nodes = load_hierarchy_snapshot()
+            employee = nodes.get(employee_id)
+            if employee is not None:
+                employee = employee.to_dict()
 
         if employee:
             return jsonify(employee)
@@ -2780,14 +2849,55 @@ def get_employee(employee_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/employee/<employee_id>/chain')
+def get_employee_chain(employee_id):
+    """Return the management chain above an employee plus the size of their org."""
+    try:
+        org_index = get_org_index()
+        if org_index is None or employee_id not in org_index:
+            return jsonify({'error': 'Employee not found'}), 404
+
+        store = hierarchy_store()
+        if store is not None:
+            nodes = {node.get('id'): node for node in store.get_chain(employee_id)}
+        else:
+            _, nodes = load_hierarchy_snapshot()
+
+        def summarize(node_id):
+            node = nodes.get(node_id) or {}
+            return {
+                'id': node_id,
+                'name': node.get('name'),
+                'title': node.get('title'),
+                'department': node.get('department'),
+            }
+
+        payload = {
+            'employeeId': employee_id,
+            'depth': org_index.depth(employee_id),
+            'directReports': org_index.direct_report_count(employee_id),
+            'orgSize': org_index.subtree_size(employee_id),
+            'chain': [summarize(node_id) for node_id in org_index.chain(employee_id)],
+        }
+
+        within = request.args.get('within', '').strip()
+        if within:
+            payload['within'] = within
+            payload['withinOrg'] = org_index.is_descendant(employee_id, within)
+
+        return jsonify(payload)
+    except Exception as e:
+        logger.error(f"Error building management chain for {employee_id}: {e}")
+        return jsonify({'error': 'Failed to load management chain'}), 500
+
 @app.route('/api/update-now', methods=['POST'])
 @require_auth
 @limiter.limit("1 per minute")
 def trigger_update():
     try:
-        threading.Thread(target=update_employee_data).start()
-        logger.info(f"Manual update triggered by user: {session.get('username')}")
-        return jsonify({'message': 'Update started'}), 200
+        job = sync_jobs.request('manual update')
+        logger.info(f"Manual update triggered by user: {session.get('username')} (job {job.id})")
+        return jsonify({'message': 'Update started', **sync_job_links(job)}), 200
     except Exception as e:
         logger.error(f"Error triggering update: {e}")
         return jsonify({'error': 'Update failed'}), 500
@@ -2801,14 +2911,14 @@ def debug_search():
     """Debug endpoint to check search functionality"""
     try:
         info = {
-            'data_file_exists': os.path.exists(DATA_FILE),
-            'data_file_path': os.path.abspath(DATA_FILE) if os.path.exists(DATA_FILE) else 'Not found',
-            'data_file_size': os.path.getsize(DATA_FILE) if os.path.exists(DATA_FILE) else 0,
+            'data_file_exists': os.path.exists(hierarchy_data_path()),
+            'data_file_path': os.path.abspath(hierarchy_data_path()) if os.path.exists(hierarchy_data_path()) else 'Not found',
+            'data_file_size': os.path.getsize(hierarchy_data_path()) if os.path.exists(hierarchy_data_path()) else 0,
         }
         
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
+        if os.path.exists(hierarchy_data_path()):
+            with open(hierarchy_data_path(), 'r') as f:
+                data = json_codec.load(f)
                 
                 def count_employees(node):
                     count = 1
@@ -2854,44 +2964,23 @@ def debug_search():
 @require_auth
 @limiter.limit("1 per minute")
 def force_update():
-    """Force an immediate update and wait for completion"""
+    """Queue an immediate update and return its job id without waiting.
+
+    Follow the job through ``statusUrl`` or ``streamUrl``; a sync usually
+    outlasts gunicorn's request timeout.
+    """
     try:
-        logger.info("Force update requested")
-        update_employee_data()
-        
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                
-            def count_employees(node):
-                if not node:
-                    return 0
-                count = 1
-                for child in node.get('children', []):
-                    count += count_employees(child)
-                return count
-                
-            total = count_employees(data)
-            return jsonify({
-                'success': True,
-                'message': f'Data updated successfully. {total} employees in hierarchy.',
-                'file_created': True
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': 'Update completed but no data file created. Check Azure AD credentials.',
-                'file_created': False
-            })
+        job = sync_jobs.request('forced update')
+        logger.info(f"Force update requested by user: {session.get('username')} (job {job.id})")
+        return jsonify({
+            'success': True,
+            'message': 'Update queued',
+            'state': job.state,
+            **sync_job_links(job),
+        }), 202
     except Exception as e:
         logger.error(f"Force update error: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return jsonify({
-            'success': False,
-            'error': str(e),
-            'traceback': traceback.format_exc()
-        }), 500
+        return jsonify({'success': False, 'error': 'Failed to queue update'}), 500
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""Compact, memory-mapped binary encoding of the org hierarchy.
+
+The file holds one fixed-width record per employee in pre-order: a ``uint32``
+per field pointing into a shared value table (each distinct value is stored
+once), plus ``parents``/``exits``/``depths`` arrays and a permutation of rows
+sorted by id for binary search. Workers map the file read-only, so the OS
+page cache holds a single copy however many gunicorn workers serve it; nested
+JSON is only built for the nodes a request actually returns.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.snapshots import write_dataset
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SOCBIN01"
+BINARY_SNAPSHOT_VERSION = 1
+# magic, version, rows, columns, values, then section offsets:
+# columns, value offsets, value blob, parents, exits, depths, cells, id order.
+_HEADER = struct.Struct("<8sIIII8Q")
+MISSING = 0xFFFFFFFF
+_TEXT_TAG = b"s"
+_JSON_TAG = b"j"
+
+_load_lock = threading.Lock()
+_loaded: dict = {"key": None, "snapshot": None}
+
+
+def binary_snapshot_enabled() -> bool:
+    """Whether syncs store the hierarchy as ``employee_data.bin`` instead of JSON."""
+    return os.environ.get("BINARY_SNAPSHOT", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _encode_value(value: Any) -> bytes:
+    if isinstance(value, str):
+        return _TEXT_TAG + value.encode("utf-8")
+    return _JSON_TAG + json_codec.dumps(value)
+
+
+def _pad(handle, position: int) -> int:
+    padding = (-position) % 8
+    if padding:
+        handle.write(b"\0" * padding)
+    return position + padding
+
+
+def write_binary_snapshot(
+    path: str,
+    hierarchy: Optional[dict],
+    org_index,
+    *,
+    node_at: Optional[Callable[[int], dict]] = None,
+) -> bool:
+    """Encode ``hierarchy`` using the row order of its ``OrgIntervalIndex``.
+
+    ``node_at`` returns the node at a row instead, for trees not held as
+    nested dicts; it is called twice per row. Returns False when an identical
+    snapshot was reused instead of written.
+    """
+    if sys.byteorder != "little":  # pragma: no cover - arrays are written natively
+        raise RuntimeError("Binary snapshots require a little-endian platform")
+
+    if node_at is None:
+        nodes: Dict[str, dict] = {}
+        stack = [hierarchy] if isinstance(hierarchy, dict) else []
+        while stack:
+            node = stack.pop()
+            nodes.setdefault(str(node.get("id") or ""), node)
+            stack.extend(child for child in node.get("children") or [] if isinstance(child, dict))
+
+        def node_at(row: int) -> dict:
+            return nodes.get(org_index.ids[row]) or {}
+
+    columns: List[str] = []
+    column_ids: Dict[str, int] = {}
+    for row in range(len(org_index.ids)):
+        for key in node_at(row):
+            if key != "children" and key not in column_ids:
+                column_ids[key] = len(columns)
+                columns.append(key)
+
+    values: List[bytes] = []
+    value_ids: Dict[bytes, int] = {}
+    cells = array("I", [MISSING]) * (len(org_index.ids) * len(columns))
+    for row in range(len(org_index.ids)):
+        base = row * len(columns)
+        for key, value in node_at(row).items():
+            if key == "children":
+                continue
+            encoded = _encode_value(value)
+            value_id = value_ids.get(encoded)
+            if value_id is None:
+                value_id = value_ids[encoded] = len(values)
+                values.append(encoded)
+            cells[base + column_ids[key]] = value_id
+
+    value_offsets = array("Q", [0])
+    for encoded in values:
+        value_offsets.append(value_offsets[-1] + len(encoded))
+    id_order = array("I", sorted(range(len(org_index.ids)), key=lambda row: org_index.ids[row].encode("utf-8")))
+
+    sections = [
+        json.dumps(columns).encode("utf-8"),
+        value_offsets.tobytes(),
+        b"".join(values),
+        array("i", org_index.parents).tobytes(),
+        array("I", org_index.exits).tobytes(),
+        array("I", org_index.depths).tobytes(),
+        cells.tobytes(),
+        id_order.tobytes(),
+    ]
+    handle = io.BytesIO()
+    position = _pad(handle, handle.write(b"\0" * _HEADER.size))
+    offsets = []
+    for section in sections:
+        offsets.append(position)
+        position = _pad(handle, position + handle.write(section))
+    handle.seek(0)
+    handle.write(_HEADER.pack(
+        MAGIC, BINARY_SNAPSHOT_VERSION, len(org_index.ids), len(columns), len(values), *offsets
+    ))
+    return write_dataset(path, handle.getvalue())
+
+
+class BinarySnapshot:
+    """Read-only view over a mapped snapshot file.
+
+    Offers the same hierarchy queries as the SQLite data store so routes can
+    use either through ``hierarchy_store()``.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, version, rows, column_count, value_count, *offsets = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != BINARY_SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported binary snapshot {path}")
+        columns_at, value_offsets_at, blob_at, parents_at, exits_at, depths_at, cells_at, order_at = offsets
+
+        self.path = path
+        self.rows = rows
+        self.columns: List[str] = json.loads(bytes(view[columns_at:value_offsets_at]).rstrip(b"\0"))
+        self._column_count = column_count
+        self._value_offsets = view[value_offsets_at:value_offsets_at + 8 * (value_count + 1)].cast("Q")
+        self._blob = view[blob_at:parents_at]
+        self.parents = view[parents_at:parents_at + 4 * rows].cast("i")
+        self.exits = view[exits_at:exits_at + 4 * rows].cast("I")
+        self.depths = view[depths_at:depths_at + 4 * rows].cast("I")
+        self._cells = view[cells_at:cells_at + 4 * rows * column_count].cast("I")
+        self._id_order = view[order_at:order_at + 4 * rows].cast("I")
+        self._id_column = self.columns.index("id") if "id" in self.columns else None
+
+    def __len__(self) -> int:
+        return self.rows
+
+    # ---------------------------------------------------------------- values
+
+    def _value(self, value_id: int) -> Any:
+        encoded = self._blob[self._value_offsets[value_id]:self._value_offsets[value_id + 1]]
+        if encoded[:1] == _TEXT_TAG:
+            return bytes(encoded[1:]).decode("utf-8")
+        return json_codec.loads(encoded[1:])
+
+    def _cell(self, row: int, column: int) -> Any:
+        value_id = self._cells[row * self._column_count + column]
+        return None if value_id == MISSING else self._value(value_id)
+
+    def employee_id(self, row: int) -> str:
+        return self._cell(row, self._id_column) if self._id_column is not None else ""
+
+    def record(self, row: int) -> dict:
+        """The employee at ``row`` without ``children``."""
+        base = row * self._column_count
+        record = {}
+        for column, key in enumerate(self.columns):
+            value_id = self._cells[base + column]
+            if value_id != MISSING:
+                record[key] = self._value(value_id)
+        return record
+
+    # ------------------------------------------------------------- structure
+
+    def row(self, employee_id: str) -> Optional[int]:
+        """Binary search the id-sorted permutation; no per-worker id map is built."""
+        needle = (employee_id or "").encode("utf-8")
+        low, high = 0, self.rows
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self.employee_id(self._id_order[middle]).encode("utf-8")
+            if candidate < needle:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.rows:
+            row = self._id_order[low]
+            if self.employee_id(row) == employee_id:
+                return row
+        return None
+
+    def child_rows(self, row: int) -> Iterable[int]:
+        child = row + 1
+        while child <= self.exits[row]:
+            yield child
+            child = self.exits[child] + 1
+
+    def to_hierarchy(self, row: int = 0, depth: Optional[int] = None) -> Optional[dict]:
+        """Materialize the nested tree rooted at ``row`` (optionally cut at ``depth``).
+
+        Cut trees carry ``directReportCount``, ``descendantCount`` and
+        ``childrenLoaded`` like the paged ``/api/employees`` payload.
+        """
+        if not 0 <= row < self.rows:
+            return None
+        max_depth = None if depth is None else self.depths[row] + depth
+        nodes: Dict[int, dict] = {}
+        child = row
+        while child <= self.exits[row]:
+            node = self.record(child)
+            node["children"] = []
+            if depth is not None:
+                direct_reports = sum(1 for _ in self.child_rows(child))
+                node["directReportCount"] = direct_reports
+                node["descendantCount"] = self.exits[child] - child
+                node["childrenLoaded"] = direct_reports == 0
+            nodes[child] = node
+            parent = nodes.get(self.parents[child]) if child != row else None
+            if parent is not None:
+                parent["children"].append(node)
+                if depth is not None:
+                    parent["childrenLoaded"] = True
+            if max_depth is not None and self.depths[child] >= max_depth:
+                child = self.exits[child] + 1
+            else:
+                child += 1
+        return nodes[row]
+
+    # --------------------------------------------- data store compatible API
+
+    def get_node(self, employee_id: str) -> Optional[dict]:
+        row = self.row(employee_id)
+        return self.record(row) if row is not None else None
+
+    def get_chain(self, employee_id: str) -> List[dict]:
+        row = self.row(employee_id)
+        chain: List[dict] = []
+        while row is not None and row >= 0:
+            chain.append(self.record(row))
+            row = self.parents[row]
+        chain.reverse()
+        return chain
+
+    def load_subtree(self, employee_id: str, depth: Optional[int] = None) -> Optional[dict]:
+        row = self.row(employee_id)
+        return self.to_hierarchy(row, depth) if row is not None else None
+
+    def search_hierarchy(self, query: str, limit: int = 10) -> List[dict]:
+        """Case-insensitive substring search over name, title and department."""
+        needle = (query or "").lower()
+        search_columns = [self.columns.index(key) for key in ("name", "title", "department") if key in self.columns]
+        matches: Dict[int, bool] = {}
+        results: List[dict] = []
+        for row in range(self.rows):
+            base = row * self._column_count
+            for column in search_columns:
+                value_id = self._cells[base + column]
+                if value_id == MISSING:
+                    continue
+                matched = matches.get(value_id)
+                if matched is None:
+                    value = self._value(value_id)
+                    matched = matches[value_id] = isinstance(value, str) and needle in value.lower()
+                if matched:
+                    results.append(self.record(row))
+                    break
+            if len(results) >= limit:
+                break
+        return results
+
+
+def load_binary_snapshot(path: str) -> Optional[BinarySnapshot]:
+    """Map the snapshot at ``path``, reusing the mapping until the file changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        if _loaded["key"] == key:
+            return _loaded["snapshot"]
+
+    try:
+        snapshot = BinarySnapshot(path)
+    except Exception as error:  # noqa: BLE001 - treat unreadable snapshots as missing
+        logger.error("Failed to map binary snapshot %s: %s", path, error)
+        return None
+
+    with _load_lock:
+        _loaded["key"] = key
+        _loaded["snapshot"] = snapshot
+    return snapshot
+
+
+__all__ = [
+    "BINARY_SNAPSHOT_VERSION",
+    "BinarySnapshot",
+    "binary_snapshot_enabled",
+    "load_binary_snapshot",
+    "write_binary_snapshot",
+]
@@ -16,6 +16,7 @@ TEMPLATE_DIR = BASE_DIR / "templates"
 
 SETTINGS_FILE = DATA_DIR / "app_settings.json"
 DATA_FILE = DATA_DIR / "employee_data.json"
+EMPLOYEE_SNAPSHOT_FILE = DATA_DIR / "employee_data.bin"
 MISSING_MANAGER_FILE = DATA_DIR / "missing_manager_records.json"
 EMPLOYEE_LIST_FILE = DATA_DIR / "employee_list.json"
 DISABLED_LICENSE_FILE = DATA_DIR / "disabled_with_license_records.json"
@@ -25,6 +26,50 @@ DISABLED_USERS_FILE = DATA_DIR / "disabled_user_records.json"
 LAST_LOGIN_FILE = DATA_DIR / "last_login_records.json"
 RECENTLY_DISABLED_FILE = DATA_DIR / "recently_disabled_employees.json"
 RECENTLY_HIRED_FILE = DATA_DIR / "recently_hired_employees.json"
+METADATA_OPTIONS_FILE = DATA_DIR / "metadata_options.json"
+SEARCH_INDEX_FILE = DATA_DIR / "search_index.json"
+ORG_INDEX_FILE = DATA_DIR / "org_index.json"
+DATA_GENERATION_FILE = DATA_DIR / "data_generation.json"
+DATASTORE_FILE = DATA_DIR / "orgchart.sqlite3"
+CRAWL_ARCHIVE_FILE = DATA_DIR / "graph_users.ndjson.gz"
+CRAWL_CHECKPOINT_FILE = DATA_DIR / "graph_users.checkpoint.ndjson.gz"
+CRAWL_STATE_FILE = DATA_DIR / "graph_users.state.json"
+GENERATIONS_DIR = DATA_DIR / "generations"
+HISTORY_DIR = DATA_DIR / "history"
+SCHEDULER_LEASE_FILE = DATA_DIR / "scheduler_lease.json"
+SYNC_STATUS_FILE = DATA_DIR / "sync_status.json"
+SYNC_METRICS_FILE = DATA_DIR / "sync_metrics.json"
+
+# Files written by a sync. They live in ``GENERATIONS_DIR/<generation>/`` and are
+# addressed by these names; ``DATA_GENERATION_FILE`` points at the live directory.
+GENERATION_DATASETS = (
+    DATA_FILE,
+    EMPLOYEE_SNAPSHOT_FILE,
+    MISSING_MANAGER_FILE,
+    EMPLOYEE_LIST_FILE,
+    DISABLED_LICENSE_FILE,
+    FILTERED_LICENSE_FILE,
+    FILTERED_USERS_FILE,
+    DISABLED_USERS_FILE,
+    LAST_LOGIN_FILE,
+    RECENTLY_DISABLED_FILE,
+    RECENTLY_HIRED_FILE,
+    METADATA_OPTIONS_FILE,
+    SEARCH_INDEX_FILE,
+    SEARCH_INDEX_FILE.with_name(f"{SEARCH_INDEX_FILE.name}.gz"),
+    ORG_INDEX_FILE,
+    CRAWL_ARCHIVE_FILE,
+)
+
+# Files derived from one hierarchy build. A generation either gets all of them
+# from its own sync or inherits them together from the previous generation.
+HIERARCHY_DATASETS = (
+    DATA_FILE,
+    EMPLOYEE_SNAPSHOT_FILE,
+    SEARCH_INDEX_FILE,
+    SEARCH_INDEX_FILE.with_name(f"{SEARCH_INDEX_FILE.name}.gz"),
+    ORG_INDEX_FILE,
+)
 
 
 def ensure_directories() -> None:
@@ -48,6 +93,7 @@ __all__ = [
     "TEMPLATE_DIR",
     "SETTINGS_FILE",
     "DATA_FILE",
+    "EMPLOYEE_SNAPSHOT_FILE",
     "MISSING_MANAGER_FILE",
     "EMPLOYEE_LIST_FILE",
     "DISABLED_LICENSE_FILE",
@@ -57,6 +103,21 @@ __all__ = [
     "LAST_LOGIN_FILE",
     "RECENTLY_DISABLED_FILE",
     "RECENTLY_HIRED_FILE",
+    "METADATA_OPTIONS_FILE",
+    "SEARCH_INDEX_FILE",
+    "ORG_INDEX_FILE",
+    "DATA_GENERATION_FILE",
+    "DATASTORE_FILE",
+    "CRAWL_ARCHIVE_FILE",
+    "CRAWL_CHECKPOINT_FILE",
+    "CRAWL_STATE_FILE",
+    "GENERATIONS_DIR",
+    "HISTORY_DIR",
+    "SCHEDULER_LEASE_FILE",
+    "SYNC_STATUS_FILE",
+    "SYNC_METRICS_FILE",
+    "GENERATION_DATASETS",
+    "HIERARCHY_DATASETS",
     "ensure_directories",
     "as_posix_env",
 ]
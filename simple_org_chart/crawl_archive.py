@@ -0,0 +1,124 @@
+"""Compressed archive of the raw Graph ``/users`` pages fetched by a sync.
+
+Keeping the unfiltered payload lets settings changes (ignored titles,
+departments, hidden guests, ...) be re-applied without crawling Graph again.
+The archive is gzip-compressed NDJSON: a header line with the SKU map, one
+line per page of users, and a trailer with mailbox purposes looked up during
+the sync. Only crawls that finished without errors are committed, and a crawl
+whose content matches the live archive reuses that file.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.snapshots import reuse_dataset
+
+logger = logging.getLogger(__name__)
+
+CRAWL_ARCHIVE_VERSION = 1
+
+
+class CrawlArchiveWriter:
+    """Stream raw pages into ``path`` and publish the file only on :meth:`commit`."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._temp_path = f"{path}.{os.getpid()}.tmp"
+        self._handle = None
+        self._complete = False
+        # Covers everything but ``crawledAt`` so identical crawls fingerprint alike.
+        self._digest = hashlib.sha256()
+        self.pages = 0
+        self.users = 0
+
+    def _write(self, payload: dict, *, fingerprint: bool = True) -> None:
+        line = json_codec.dumps(payload) + b"\n"
+        self._handle.write(line)
+        if fingerprint:
+            self._digest.update(line)
+
+    def begin(self, sku_map: dict) -> None:
+        self._handle = gzip.open(self._temp_path, "wb", compresslevel=6)
+        self._write({
+            "version": CRAWL_ARCHIVE_VERSION,
+            "crawledAt": datetime.now(timezone.utc).isoformat(),
+            "skuMap": sku_map,
+        }, fingerprint=False)
+        self._digest.update(json_codec.dumps([CRAWL_ARCHIVE_VERSION, sku_map]))
+
+    def write_page(self, users: list) -> None:
+        if self._handle is None:
+            return
+        self._write({"users": users})
+        self.pages += 1
+        self.users += len(users)
+
+    def mark_complete(self) -> None:
+        self._complete = self._handle is not None
+
+    def commit(self, *, mailbox_types: Optional[dict] = None) -> bool:
+        """Finish the archive; incomplete crawls are discarded instead."""
+        if not self._complete:
+            self.discard()
+            return False
+        try:
+            self._write({"complete": True, "pages": self.pages, "mailboxTypes": mailbox_types or {}})
+            self._handle.close()
+            self._handle = None
+            if reuse_dataset(self.path, self._digest.hexdigest()):
+                self.discard()
+                logger.info("Crawl matched the archived one; reusing %s", self.path)
+                return True
+            os.replace(self._temp_path, self.path)
+        except Exception as error:
+            logger.error("Failed to write crawl archive %s: %s", self.path, error)
+            self.discard()
+            return False
+        logger.info("Archived %s raw users in %s pages to %s", self.users, self.pages, self.path)
+        return True
+
+    def discard(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+
+def load_crawl_archive(path: str) -> Optional[dict]:
+    """Return ``{"crawledAt", "skuMap", "pages", "mailboxTypes"}`` or None if unusable."""
+    try:
+        with gzip.open(path, "rb") as handle:
+            lines = [json_codec.loads(line) for line in handle if line.strip()]
+    except FileNotFoundError:
+        return None
+    except Exception as error:  # noqa: BLE001 - a damaged archive just means re-crawling
+        logger.error("Failed to read crawl archive %s: %s", path, error)
+        return None
+
+    if len(lines) < 2 or lines[0].get("version") != CRAWL_ARCHIVE_VERSION or not lines[-1].get("complete"):
+        logger.warning("Crawl archive %s is incomplete or from an unsupported version", path)
+        return None
+
+    return {
+        "crawledAt": lines[0].get("crawledAt"),
+        "skuMap": lines[0].get("skuMap") or {},
+        "pages": [line.get("users") or [] for line in lines[1:-1]],
+        "mailboxTypes": lines[-1].get("mailboxTypes") or {},
+    }
+
+
+__all__ = [
+    "CRAWL_ARCHIVE_VERSION",
+    "CrawlArchiveWriter",
+    "load_crawl_archive",
+]
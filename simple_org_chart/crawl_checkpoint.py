@@ -0,0 +1,175 @@
+"""Page-level checkpoint of the Graph ``/users`` crawl.
+
+Each fetched page is appended to ``data/graph_users.checkpoint.ndjson.gz``
+together with the ``@odata.nextLink`` that follows it, as a gzip member of its
+own, so a write cut short loses at most that page. A crawl that fails leaves
+the file behind, and the next crawl replays the saved pages and continues
+from the saved link instead of from page one. Graph skip tokens expire, so a
+checkpoint older than ``CRAWL_CHECKPOINT_MINUTES`` (counted from its last
+page), or one made for a different query, is discarded. A crawl that reaches
+the last page removes the checkpoint and records when it started (its
+oldest page) in ``data/graph_users.state.json``; that dates the cached
+records a later failed crawl merges in.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.snapshots import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CRAWL_CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_MINUTES = 60
+
+
+def checkpoint_max_age_minutes() -> int:
+    """How long a crawl checkpoint stays resumable (``CRAWL_CHECKPOINT_MINUTES``); 0 disables checkpoints."""
+    raw_value = os.environ.get("CRAWL_CHECKPOINT_MINUTES", "")
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else DEFAULT_CHECKPOINT_MINUTES
+    except ValueError:
+        logger.warning("Invalid CRAWL_CHECKPOINT_MINUTES '%s'; using %s", raw_value, DEFAULT_CHECKPOINT_MINUTES)
+        return DEFAULT_CHECKPOINT_MINUTES
+
+
+class CrawlCheckpoint:
+    """Saved pages of one paged crawl and the link to the page after them."""
+
+    def __init__(self, path: str, state_path: Optional[str] = None, max_age_minutes: Optional[int] = None) -> None:
+        self.path = str(path)
+        self.state_path = str(state_path) if state_path else None
+        self.max_age_minutes = checkpoint_max_age_minutes() if max_age_minutes is None else max_age_minutes
+        self.pages = 0
+        self.users = 0
+        self.started_at: Optional[str] = None
+        self._enabled = self.max_age_minutes > 0
+
+    def _lines(self) -> Iterator[dict]:
+        # Stops quietly at a torn final member or line.
+        try:
+            with gzip.open(self.path, "rb") as handle:
+                for line in handle:
+                    if not line.endswith(b"\n"):
+                        return
+                    yield json_codec.loads(line)
+        except (EOFError, OSError, zlib.error, ValueError) as error:
+            if not isinstance(error, FileNotFoundError):
+                logger.warning("Crawl checkpoint %s ends early: %s", self.path, error)
+
+    def _append(self, payload: dict, mode: str = "ab") -> None:
+        if not self._enabled:
+            return
+        try:
+            with gzip.open(self.path, mode, compresslevel=6) as handle:
+                handle.write(json_codec.dumps(payload) + b"\n")
+        except OSError as error:
+            # The crawl goes on without a checkpoint rather than failing.
+            logger.warning("Unable to write crawl checkpoint %s: %s", self.path, error)
+            self._enabled = False
+            self.clear()
+
+    def resume(self, query: str) -> Optional[str]:
+        """Return the link to continue ``query`` from, or None to start at page one.
+
+        On success :meth:`replay` yields the saved pages; otherwise any stale
+        checkpoint is removed.
+        """
+        self.pages = self.users = 0
+        if not self._enabled:
+            return None
+        try:
+            age_minutes = (time.time() - os.path.getmtime(self.path)) / 60
+        except OSError:
+            return None
+        if age_minutes > self.max_age_minutes:
+            logger.info("Discarding crawl checkpoint from %.0f minutes ago", age_minutes)
+            self.clear()
+            return None
+
+        next_link = None
+        for index, line in enumerate(self._lines()):
+            if index == 0:
+                if line.get("version") != CRAWL_CHECKPOINT_VERSION or line.get("query") != query:
+                    logger.info("Discarding crawl checkpoint made for a different query")
+                    self.clear()
+                    return None
+                self.started_at = line.get("startedAt")
+                continue
+            self.pages += 1
+            self.users += len(line.get("users") or [])
+            next_link = line.get("next")
+        if not self.pages or not next_link:
+            self.pages = self.users = 0
+            self.clear()
+            return None
+        logger.info(
+            "Resuming Graph crawl started at %s after %s saved pages (%s users)",
+            self.started_at, self.pages, self.users,
+        )
+        return next_link
+
+    def replay(self) -> Iterator[list]:
+        """Yield the pages found by :meth:`resume`."""
+        for index, line in enumerate(self._lines()):
+            if index > self.pages:
+                return
+            if index:
+                yield line.get("users") or []
+
+    def start(self, query: str) -> None:
+        """Begin a new checkpoint for ``query``, replacing any old one."""
+        self.pages = self.users = 0
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._append({"version": CRAWL_CHECKPOINT_VERSION, "query": query, "startedAt": self.started_at}, mode="wb")
+
+    def write_page(self, users: list, next_link: Optional[str]) -> None:
+        self._append({"users": users, "next": next_link})
+        self.pages += 1
+        self.users += len(users)
+
+    def finish(self) -> None:
+        """The crawl reached its last page: drop the checkpoint and record the crawl."""
+        self.clear()
+        if self.state_path is None:
+            return
+        state = {"startedAt": self.started_at, "completedAt": datetime.now(timezone.utc).isoformat()}
+        try:
+            with atomic_write(self.state_path, "w") as handle:
+                json.dump(state, handle)
+        except OSError as error:
+            logger.warning("Unable to record crawl completion in %s: %s", self.state_path, error)
+
+    def last_crawled(self) -> Optional[str]:
+        """Start of the last crawl that reached its final page; none of its records are older."""
+        if self.state_path is None:
+            return None
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return state.get("startedAt") if isinstance(state, dict) else None
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+__all__ = [
+    "CRAWL_CHECKPOINT_VERSION",
+    "CrawlCheckpoint",
+    "DEFAULT_CHECKPOINT_MINUTES",
+    "checkpoint_max_age_minutes",
+]
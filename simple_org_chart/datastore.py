@@ -0,0 +1,486 @@
+"""Optional SQLite-backed store for the synced org chart and report datasets."""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import simple_org_chart.config as app_config
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.msgraph import parse_graph_datetime
+from simple_org_chart.reports import DATASET_BY_PATH, resolve_mailbox_categories
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+# Report datasets and the table each one is stored in. All report tables share
+# one layout: the record payload plus the columns the report filters use.
+REPORT_TABLES: Dict[str, str] = {
+    "missing_manager": "missing_manager_records",
+    "disabled_users": "disabled_users",
+    "disabled_license": "disabled_license_records",
+    "recently_disabled": "recently_disabled_records",
+    "recently_hired": "recently_hired_records",
+    "last_login": "sign_in_activity",
+    "filtered_users": "filtered_users",
+    "filtered_license": "filtered_license_records",
+}
+
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS datasets (
+        name TEXT PRIMARY KEY,
+        generation TEXT,
+        updated_at TEXT NOT NULL,
+        record_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS employees (
+        id TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        email TEXT,
+        payload TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_employees_position ON employees(position)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_email ON employees(email)",
+    """
+    CREATE TABLE IF NOT EXISTS org_edges (
+        employee_id TEXT PRIMARY KEY,
+        manager_id TEXT,
+        row INTEGER NOT NULL UNIQUE,
+        exit_row INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        child_count INTEGER NOT NULL,
+        name_lower TEXT NOT NULL,
+        title_lower TEXT NOT NULL,
+        department_lower TEXT NOT NULL,
+        payload TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_org_edges_manager ON org_edges(manager_id, row)",
+]
+
+_REPORT_TABLE_TEMPLATE = [
+    """
+    CREATE TABLE IF NOT EXISTS {table} (
+        position INTEGER PRIMARY KEY,
+        record_id TEXT,
+        user_type TEXT NOT NULL,
+        mailbox_category TEXT NOT NULL,
+        account_enabled INTEGER NOT NULL,
+        license_count INTEGER NOT NULL,
+        never_signed_in INTEGER NOT NULL,
+        days_since_activity INTEGER,
+        disabled_observed_at TEXT,
+        payload TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_{table}_record ON {table}(record_id)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_filters ON {table}(user_type, mailbox_category, account_enabled, license_count)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_activity ON {table}(days_since_activity)",
+    "CREATE INDEX IF NOT EXISTS idx_{table}_disabled_at ON {table}(disabled_observed_at)",
+]
+
+
+def datastore_enabled() -> bool:
+    """Return True when ``DATA_STORE_BACKEND=sqlite`` is configured."""
+    return os.environ.get("DATA_STORE_BACKEND", "json").strip().lower() == "sqlite"
+
+
+def _format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime(_TIMESTAMP_FORMAT)
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dumps(value: Any) -> str:
+    return json_codec.dumps(value).decode("utf-8")
+
+
+def _counted(records: Iterable[dict], counts: Dict[str, int], name: str) -> Iterator[dict]:
+    counts[name] = 0
+    for record in records:
+        counts[name] += 1
+        yield record
+
+
+def _report_row(position: int, record: dict) -> tuple:
+    is_user, is_shared, _ = resolve_mailbox_categories(record)
+    mailbox_category = "user" if is_user else ("shared" if is_shared else "room_equipment")
+    observed = parse_graph_datetime(record.get("firstSeenDisabledAt") or record.get("disabledDate"))
+    return (
+        position,
+        str(record.get("id")) if record.get("id") is not None else None,
+        (record.get("userType") or "").lower(),
+        mailbox_category,
+        1 if record.get("accountEnabled", True) else 0,
+        _as_int(record.get("licenseCount") or 0) or 0,
+        1 if record.get("neverSignedIn") else 0,
+        _as_int(record.get("daysSinceLastActivity")),
+        _format_timestamp(observed),
+        _dumps(record),
+    )
+
+
+class SqliteDataStore:
+    """WAL-mode SQLite database holding the latest synced datasets.
+
+    Each thread (and each forked worker) gets its own connection. Writers
+    replace datasets inside a single transaction, so readers in other workers
+    keep seeing the previous sync until the commit lands.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready_pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and getattr(self._local, "pid", None) == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=30000")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        self._ensure_schema(connection)
+        return connection
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready_pid == os.getpid():
+                return
+            statements = list(_SCHEMA)
+            for table in REPORT_TABLES.values():
+                statements.extend(template.format(table=table) for template in _REPORT_TABLE_TEMPLATE)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in statements:
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            self._schema_ready_pid = os.getpid()
+
+    # ------------------------------------------------------------------ writes
+
+    def write_sync(
+        self,
+        generation: Optional[str],
+        *,
+        hierarchy: Optional[dict] = None,
+        org_index=None,
+        node_at: Optional[Callable[[int], dict]] = None,
+        employees: Optional[Iterable[dict]] = None,
+        reports: Optional[Dict[str, Optional[Iterable[dict]]]] = None,
+    ) -> None:
+        """Replace every dataset produced by a sync in one transaction.
+
+        Datasets passed as ``None`` keep their previous contents. Records are
+        consumed once, so spooled iterables work as well as lists; ``node_at``
+        returns the node at a pre-order row for trees not held as nested dicts.
+        """
+        connection = self._connection()
+        updated_at = datetime.now(timezone.utc).isoformat()
+        counts: Dict[str, int] = {}
+
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if employees is not None:
+                connection.execute("DELETE FROM employees")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO employees (id, position, email, payload) VALUES (?, ?, ?, ?)",
+                    (
+                        (str(emp.get("id")), position, (emp.get("email") or "").lower() or None, _dumps(emp))
+                        for position, emp in enumerate(_counted(employees, counts, "employees"))
+                        if emp.get("id") is not None
+                    ),
+                )
+
+            if (hierarchy is not None or node_at is not None) and org_index is not None:
+                connection.execute("DELETE FROM org_edges")
+                connection.executemany(
+                    """
+                    INSERT INTO org_edges (
+                        employee_id, manager_id, row, exit_row, depth, child_count,
+                        name_lower, title_lower, department_lower, payload
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    self._hierarchy_rows(hierarchy, org_index, node_at),
+                )
+                counts["hierarchy"] = len(org_index)
+
+            for dataset, records in (reports or {}).items():
+                if records is None:
+                    continue
+                table = REPORT_TABLES[dataset]
+                connection.execute(f"DELETE FROM {table}")
+                connection.executemany(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        _report_row(position, record)
+                        for position, record in enumerate(_counted(records, counts, dataset))
+                    ),
+                )
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO datasets (name, generation, updated_at, record_count) VALUES (?, ?, ?, ?)",
+                ((name, generation, updated_at, count) for name, count in counts.items()),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        logger.info("Stored %s in SQLite data store (%s)", ", ".join(sorted(counts)) or "nothing", self.path)
+
+    @staticmethod
+    def _hierarchy_rows(hierarchy: Optional[dict], org_index, node_at=None) -> Iterable[tuple]:
+        if node_at is None:
+            nodes: Dict[str, dict] = {}
+            stack = [hierarchy]
+            while stack:
+                node = stack.pop()
+                nodes.setdefault(str(node.get("id") or ""), node)
+                stack.extend(child for child in node.get("children") or [] if isinstance(child, dict))
+
+            def node_at(row: int) -> dict:
+                return nodes.get(org_index.ids[row]) or {}
+
+        for row, employee_id in enumerate(org_index.ids):
+            node = node_at(row)
+            parent_row = org_index.parents[row]
+            payload = {key: value for key, value in node.items() if key != "children"}
+            yield (
+                employee_id,
+                org_index.ids[parent_row] if parent_row >= 0 else None,
+                row,
+                org_index.exits[row],
+                org_index.depths[row],
+                org_index.child_counts[row],
+                (node.get("name") or "").lower(),
+                (node.get("title") or "").lower(),
+                (node.get("department") or "").lower(),
+                _dumps(payload),
+            )
+
+    # ------------------------------------------------------------------- reads
+
+    def dataset_info(self, name: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT name, generation, updated_at, record_count FROM datasets WHERE name = ?", (name,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def has_dataset(self, name: str) -> bool:
+        return self.dataset_info(name) is not None
+
+    def load_employees(self) -> List[dict]:
+        rows = self._connection().execute("SELECT payload FROM employees ORDER BY position")
+        return [json_codec.loads(row["payload"]) for row in rows]
+
+    def load_report(self, dataset: str) -> List[dict]:
+        table = REPORT_TABLES[dataset]
+        rows = self._connection().execute(f"SELECT payload FROM {table} ORDER BY position")
+        return [json_codec.loads(row["payload"]) for row in rows]
+
+    def query_report(
+        self,
+        dataset: str,
+        *,
+        include_user_mailboxes: bool = True,
+        include_shared_mailboxes: bool = True,
+        include_room_equipment_mailboxes: bool = True,
+        include_enabled: bool = True,
+        include_disabled: bool = True,
+        include_licensed: bool = True,
+        include_unlicensed: bool = True,
+        include_members: bool = True,
+        include_guests: bool = True,
+        user_type_applies_to_user_mailboxes_only: bool = False,
+        include_never_signed_in: bool = True,
+        require_never_signed_in: bool = False,
+        min_days_inactive: Optional[int] = None,
+        max_days_inactive: Optional[int] = None,
+        disabled_since: Optional[datetime] = None,
+    ) -> List[dict]:
+        """Return report records matching the filters, in their stored order.
+
+        The flags mirror the ``apply_*_filters`` helpers in
+        :mod:`simple_org_chart.reports` so both paths return the same rows.
+        """
+        table = REPORT_TABLES[dataset]
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        for included, category in (
+            (include_user_mailboxes, "user"),
+            (include_shared_mailboxes, "shared"),
+            (include_room_equipment_mailboxes, "room_equipment"),
+        ):
+            if not included:
+                clauses.append("mailbox_category != ?")
+                params.append(category)
+
+        if not include_enabled:
+            clauses.append("account_enabled = 0")
+        if not include_disabled:
+            clauses.append("account_enabled = 1")
+        if not include_licensed:
+            clauses.append("license_count = 0")
+        if not include_unlicensed:
+            clauses.append("license_count > 0")
+
+        scope = "mailbox_category = 'user' AND " if user_type_applies_to_user_mailboxes_only else ""
+        if not include_members:
+            clauses.append(f"NOT ({scope}user_type = 'member')")
+        if not include_guests:
+            clauses.append(f"NOT ({scope}user_type = 'guest')")
+
+        if not include_never_signed_in:
+            clauses.append("never_signed_in = 0")
+        if require_never_signed_in:
+            clauses.append("never_signed_in = 1")
+        if min_days_inactive is not None:
+            clauses.append("days_since_activity >= ?")
+            params.append(min_days_inactive)
+        if max_days_inactive is not None:
+            clauses.append("days_since_activity <= ?")
+            params.append(max_days_inactive)
+        if disabled_since is not None:
+            clauses.append("disabled_observed_at >= ?")
+            params.append(_format_timestamp(disabled_since))
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(f"SELECT payload FROM {table}{where} ORDER BY position", params)
+        return [json_codec.loads(row["payload"]) for row in rows]
+
+    def search_hierarchy(self, query: str, limit: int = 10) -> List[dict]:
+        """Case-insensitive substring search over name, title and department."""
+        needle = (query or "").lower()
+        rows = self._connection().execute(
+            """
+            SELECT payload FROM org_edges
+            WHERE instr(name_lower, ?) > 0 OR instr(title_lower, ?) > 0 OR instr(department_lower, ?) > 0
+            ORDER BY row
+            LIMIT ?
+            """,
+            (needle, needle, needle, limit),
+        )
+        return [json_codec.loads(row["payload"]) for row in rows]
+
+    def get_node(self, employee_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT payload FROM org_edges WHERE employee_id = ?", (employee_id,)
+        ).fetchone()
+        return json_codec.loads(row["payload"]) if row else None
+
+    def get_chain(self, employee_id: str) -> List[dict]:
+        """Nodes from the top of the org down to ``employee_id``.
+
+        Ancestors are exactly the rows whose ``[row, exit_row]`` interval
+        contains the employee's row.
+        """
+        connection = self._connection()
+        target = connection.execute(
+            "SELECT row FROM org_edges WHERE employee_id = ?", (employee_id,)
+        ).fetchone()
+        if not target:
+            return []
+        rows = connection.execute(
+            "SELECT payload FROM org_edges WHERE row <= ? AND exit_row >= ? ORDER BY row",
+            (target["row"], target["row"]),
+        )
+        return [json_codec.loads(row["payload"]) for row in rows]
+
+    def load_subtree(self, employee_id: str, depth: Optional[int] = None) -> Optional[dict]:
+        """Rebuild the nested subtree under ``employee_id`` from one range scan.
+
+        Nodes get ``directReportCount``, ``descendantCount`` and
+        ``childrenLoaded`` when ``depth`` cuts the tree short.
+        """
+        connection = self._connection()
+        top = connection.execute(
+            "SELECT row, exit_row, depth FROM org_edges WHERE employee_id = ?", (employee_id,)
+        ).fetchone()
+        if not top:
+            return None
+
+        params: List[Any] = [top["row"], top["exit_row"]]
+        depth_clause = ""
+        if depth is not None:
+            depth_clause = " AND depth <= ?"
+            params.append(top["depth"] + depth)
+        rows = connection.execute(
+            "SELECT employee_id, manager_id, row, exit_row, child_count, payload FROM org_edges "
+            f"WHERE row BETWEEN ? AND ?{depth_clause} ORDER BY row",
+            params,
+        )
+
+        nodes: Dict[str, dict] = {}
+        root: Optional[dict] = None
+        for row in rows:
+            node = json_codec.loads(row["payload"])
+            node["children"] = []
+            if depth is not None:
+                node["directReportCount"] = row["child_count"]
+                node["descendantCount"] = row["exit_row"] - row["row"]
+                node["childrenLoaded"] = row["child_count"] == 0
+            nodes[row["employee_id"]] = node
+            parent = nodes.get(row["manager_id"]) if root is not None else None
+            if parent is not None:
+                parent["children"].append(node)
+                if depth is not None:
+                    parent["childrenLoaded"] = True
+            elif root is None:
+                root = node
+        return root
+
+
+_store_lock = threading.Lock()
+_store: Optional[SqliteDataStore] = None
+
+
+def get_datastore() -> Optional[SqliteDataStore]:
+    """Return the shared store when the SQLite backend is enabled."""
+    global _store
+    if not datastore_enabled():
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SqliteDataStore(str(app_config.DATASTORE_FILE))
+        return _store
+
+
+__all__ = [
+    "DATASET_BY_PATH",
+    "REPORT_TABLES",
+    "SqliteDataStore",
+    "datastore_enabled",
+    "get_datastore",
+]
@@ -0,0 +1,1222 @@
+"""Directory sync: crawl Microsoft Graph and publish the cached datasets.
+
+Everything a sync needs lives here rather than in ``app_main`` so the
+dedicated sync worker (``python -m simple_org_chart.sync``) can import it
+without the web application, its session store or its ``ADMIN_PASSWORD``
+check. Web workers share the same ``sync_jobs`` manager and helpers.
+"""
+
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import simple_org_chart.config as app_config
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.settings import (
+    TOP_LEVEL_USER_EMAIL,
+    TOP_LEVEL_USER_ID,
+    department_is_ignored,
+    employee_is_ignored,
+    load_settings,
+    normalize_filter_value,
+    parse_ignored_departments,
+    parse_ignored_employees,
+)
+from simple_org_chart.msgraph import (
+    apply_mailbox_types,
+    calculate_days_since,
+    collect_disabled_users,
+    collect_last_login_records,
+    collect_mailbox_types,
+    datetime_to_iso,
+    derive_employees,
+    fetch_all_employees,
+    get_access_token,
+    iter_enriched_mailbox_metadata,
+    parse_graph_datetime,
+    stream_all_employees,
+    _enrich_mailbox_metadata,
+)
+from simple_org_chart.reports import DATASET_BY_PATH as REPORT_DATASETS
+from simple_org_chart.binary_snapshot import binary_snapshot_enabled, write_binary_snapshot
+from simple_org_chart.crawl_archive import CrawlArchiveWriter, load_crawl_archive
+from simple_org_chart.crawl_checkpoint import CrawlCheckpoint
+from simple_org_chart.datastore import get_datastore
+from simple_org_chart.history import get_history_store
+from simple_org_chart.org_index import OrgIntervalIndex, write_org_index
+from simple_org_chart.query_cache import query_cache
+from simple_org_chart.search_index import build_search_index, write_search_index
+from simple_org_chart.snapshots import (
+    begin_generation,
+    changed_datasets,
+    dataset_path,
+    generation_dir,
+    migrate_legacy_layout,
+    new_generation_id,
+    publish_generation,
+    write_dataset,
+)
+from simple_org_chart.streaming_sync import (
+    CompactHierarchy,
+    EmployeeSpool,
+    RecordLookup,
+    RecordSpool,
+    SpoolOrder,
+    build_compact_hierarchy,
+    iter_json_array,
+    streaming_sync_enabled,
+    write_streamed_dataset,
+)
+from simple_org_chart.scheduler import configure_scheduler
+from simple_org_chart.sync_jobs import (
+    SyncCancelled,
+    SyncJobManager,
+    current_sync_job,
+    sync_stage,
+    web_sync_enabled,
+)
+from simple_org_chart.sync_metrics import add_records, measure, recording
+from simple_org_chart.sync_pipeline import Stage, crawl_timeout_seconds, run_pipeline
+
+logger = logging.getLogger(__name__)
+
+app_config.ensure_directories()
+
+DATA_DIR = str(app_config.DATA_DIR)
+DATA_FILE = str(app_config.DATA_FILE)
+EMPLOYEE_SNAPSHOT_FILE = str(app_config.EMPLOYEE_SNAPSHOT_FILE)
+MISSING_MANAGER_FILE = str(app_config.MISSING_MANAGER_FILE)
+EMPLOYEE_LIST_FILE = str(app_config.EMPLOYEE_LIST_FILE)
+DISABLED_LICENSE_FILE = str(app_config.DISABLED_LICENSE_FILE)
+FILTERED_LICENSE_FILE = str(app_config.FILTERED_LICENSE_FILE)
+FILTERED_USERS_FILE = str(app_config.FILTERED_USERS_FILE)
+DISABLED_USERS_FILE = str(app_config.DISABLED_USERS_FILE)
+LAST_LOGIN_FILE = str(app_config.LAST_LOGIN_FILE)
+RECENTLY_DISABLED_FILE = str(app_config.RECENTLY_DISABLED_FILE)
+RECENTLY_HIRED_FILE = str(app_config.RECENTLY_HIRED_FILE)
+METADATA_OPTIONS_FILE = str(app_config.METADATA_OPTIONS_FILE)
+SEARCH_INDEX_FILE = str(app_config.SEARCH_INDEX_FILE)
+ORG_INDEX_FILE = str(app_config.ORG_INDEX_FILE)
+CRAWL_ARCHIVE_FILE = str(app_config.CRAWL_ARCHIVE_FILE)
+
+logger.info(f"DATA_DIR set to: {DATA_DIR}")
+
+try:
+    migrate_legacy_layout()
+except Exception as migration_error:
+    logger.error(f"Failed to move legacy caches into a data generation: {migration_error}")
+
+
+def collect_recently_disabled_employees(records, days=365):
+    if not records:
+        return []
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    recent = []
+
+    for record in records:
+        observed_value = (
+            record.get('firstSeenDisabledAt')
+            or record.get('disabledDate')
+        )
+        disabled_at = parse_graph_datetime(observed_value)
+        if not disabled_at or disabled_at < cutoff:
+            continue
+
+        updated = record.copy()
+        updated['disabledDate'] = datetime_to_iso(disabled_at)
+        updated['disabledDays'] = calculate_days_since(disabled_at)
+        if not updated.get('firstSeenDisabledAt'):
+            updated['firstSeenDisabledAt'] = updated['disabledDate']
+        recent.append(updated)
+
+    recent.sort(key=lambda item: item.get('disabledDate') or '')
+    return recent
+
+
+def collect_recently_hired_employees(employees, days=365, manager_lookup=None):
+    if not employees:
+        return []
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    if manager_lookup is None:
+        manager_lookup = {emp.get('id'): emp for emp in employees if emp.get('id')}
+    recent = []
+
+    for employee in employees:
+        hire_date = parse_graph_datetime(employee.get('hireDate') or employee.get('employeeHireDate'))
+        if not hire_date or hire_date < cutoff:
+            continue
+
+        record = {
+            'id': employee.get('id'),
+            'name': employee.get('name'),
+            'title': employee.get('title'),
+            'department': employee.get('department'),
+            'email': employee.get('email'),
+            'userPrincipalName': employee.get('userPrincipalName'),
+            'phone': employee.get('phone') or '',
+            'businessPhone': employee.get('businessPhone') or '',
+            'location': employee.get('location') or employee.get('officeLocation') or '',
+            'hireDate': datetime_to_iso(hire_date),
+            'daysSinceHire': calculate_days_since(hire_date),
+            'managerName': '',
+        }
+
+        manager_id = employee.get('managerId')
+        if manager_id and manager_id in manager_lookup:
+            record['managerName'] = manager_lookup[manager_id].get('name') or ''
+        if 'syncedAt' in employee:
+            # Kept from an earlier sync after a partial crawl.
+            record['syncedAt'] = employee['syncedAt']
+
+        recent.append(record)
+
+    recent.sort(key=lambda item: item.get('hireDate') or '')
+    return recent
+
+
+def _load_fetch_all_employees_fallback():
+    cached_employees = load_cached_employees() or []
+
+    def _load_cached_list(path, description):
+        if not os.path.exists(path):
+            logger.debug(f"No cached {description} found at {path}")
+            return []
+        try:
+            with open(path, 'r') as cache_file:
+                data = json_codec.load(cache_file)
+        except Exception as error:
+            logger.error(f"Failed to load cached {description} from {path}: {error}")
+            return []
+
+        if not isinstance(data, list):
+            logger.warning(f"Cached {description} at {path} is not a list; ignoring contents")
+            return []
+
+        return data
+
+    cached_filtered_with_license = _load_cached_list(dataset_path(FILTERED_LICENSE_FILE), 'filtered licensed users')
+    cached_filtered_users = _load_cached_list(dataset_path(FILTERED_USERS_FILE), 'filtered users')
+
+    return cached_employees, cached_filtered_with_license, cached_filtered_users
+
+def resolve_top_user_email(settings, top_user_email_override=None):
+    """Email of the configured top-level user: session override, then env, then settings."""
+    settings_top_user = (settings.get('topUserEmail') or '').strip()
+    env_top_user = (TOP_LEVEL_USER_EMAIL or '').strip()
+
+    if top_user_email_override is not None:
+        chosen_top_user = (top_user_email_override or '').strip()
+    elif env_top_user:
+        chosen_top_user = env_top_user
+    else:
+        chosen_top_user = settings_top_user
+
+    top_user_email = (chosen_top_user or '').strip() or None
+
+    # Debug logging
+    logger.info(f"Settings topUserEmail: '{settings_top_user}'")
+    logger.info(f"Environment TOP_LEVEL_USER_EMAIL: '{env_top_user}'")
+    if top_user_email_override is not None:
+        logger.info(f"Session override topUserEmail: '{top_user_email_override}'")
+    logger.info(f"Final top_user_email: '{top_user_email}'")
+    logger.info(f"TOP_LEVEL_USER_ID: '{TOP_LEVEL_USER_ID}'")
+    return top_user_email
+
+
+def build_org_hierarchy(employees, *, top_user_email_override=None, settings=None, with_index=False):
+    """Build the reporting tree; with ``with_index`` also return its interval index."""
+    if not employees:
+        return (None, None) if with_index else None
+    
+    if settings is None:
+        settings = load_settings()
+
+    top_user_email = resolve_top_user_email(settings, top_user_email_override)
+    
+    emp_dict = {emp['id']: emp.copy() for emp in employees}
+    
+    for emp_id in emp_dict:
+        if 'children' not in emp_dict[emp_id]:
+            emp_dict[emp_id]['children'] = []
+    
+    # First, check if a specific top-level user is configured
+    # Prioritize settings file email over environment variables
+    root = None
+    if top_user_email:
+        logger.info(f"Searching for user with email: '{top_user_email}' among {len(employees)} employees")
+        for emp in employees:
+            if emp.get('email') == top_user_email:
+                root = emp_dict[emp['id']]
+                logger.info(f"Found and using configured top-level user by email: {root['name']} ({root.get('email')})")
+                break
+        else:
+            logger.warning(f"Could not find user with email '{top_user_email}' in employee list")
+    
+    # Fallback to environment variable ID if no email-based selection was made
+    if not root and TOP_LEVEL_USER_ID and TOP_LEVEL_USER_ID in emp_dict:
+        root = emp_dict[TOP_LEVEL_USER_ID]
+        logger.info(f"Using fallback environment top-level user by ID: {root['name']}")
+    
+    if root:
+        # If a specific root is configured, build hierarchy with that person at the top
+        # Clear any existing manager relationship for the root user
+        root['managerId'] = None
+        
+        # Build the hierarchy normally but ensure the selected root has no manager
+        for emp in employees:
+            emp_copy = emp_dict[emp['id']]
+            if emp_copy['id'] == root['id']:
+                continue  # Skip the root user in hierarchy building
+                
+            if emp['managerId'] and emp['managerId'] in emp_dict:
+                manager = emp_dict[emp['managerId']]
+                if emp_copy not in manager['children']:
+                    manager['children'].append(emp_copy)
+        
+        # Remove the selected root from anyone's children list (in case they were someone's subordinate)
+        for emp_id, emp in emp_dict.items():
+            emp['children'] = [child for child in emp['children'] if child['id'] != root['id']]
+
+        if with_index:
+            return root, OrgIntervalIndex.from_hierarchy(root)
+        return root
+    else:
+        # Auto-detect root using existing logic
+        root_candidates = []
+        
+        # Build normal manager-employee relationships
+        for emp in employees:
+            emp_copy = emp_dict[emp['id']]
+            if emp['managerId'] and emp['managerId'] in emp_dict:
+                manager = emp_dict[emp['managerId']]
+                if emp_copy not in manager['children']:
+                    manager['children'].append(emp_copy)
+            else:
+                if not emp['managerId'] and emp_copy not in root_candidates:
+                    root_candidates.append(emp_copy)
+        
+        # Auto-detect root
+        if root_candidates:
+            ceo_keywords = ['chief executive', 'ceo', 'president', 'chair', 'director', 'head']
+            for candidate in root_candidates:
+                title_lower = (candidate.get('title') or '').lower()
+                if any(keyword in title_lower for keyword in ceo_keywords):
+                    root = candidate
+                    logger.info(f"Auto-detected top-level user: {root['name']} - {root.get('title')}")
+                    break
+            
+            if not root and root_candidates:
+                root = root_candidates[0]
+                logger.info(f"Using first root candidate as top-level: {root['name']}")
+        else:
+            max_reports = 0
+            for emp_id, emp in emp_dict.items():
+                if len(emp['children']) > max_reports:
+                    max_reports = len(emp['children'])
+                    root = emp
+            
+            if root:
+                logger.info(f"Using person with most reports as top-level: {root['name']} ({max_reports} reports)")
+        
+        if not root and employees:
+            root = emp_dict[employees[0]['id']]
+            logger.info(f"Using first employee as root: {root['name']}")
+
+        if with_index:
+            return root, OrgIntervalIndex.from_hierarchy(root)
+        return root
+
+
+def missing_manager_sort_key(record):
+    return (record.get('department') or '', record.get('name') or '')
+
+
+def collect_missing_manager_records(employees, hierarchy_root=None, settings=None, top_user_email_override=None):
+    missing_records = list(iter_missing_manager_records(
+        employees, hierarchy_root, settings, top_user_email_override
+    ))
+    missing_records.sort(key=missing_manager_sort_key)
+    return missing_records
+
+
+def iter_missing_manager_records(employees, hierarchy_root=None, settings=None, top_user_email_override=None,
+                                 *, employee_index=None, visited=None):
+    """Yield a report record for each employee not placed under the hierarchy root.
+
+    Streamed syncs pass ``employee_index`` (id lookup) and ``visited`` (ids in
+    the tree) instead of having them built from ``employees``.
+    """
+    if not employees:
+        return
+
+    if employee_index is None:
+        employee_index = {emp['id']: emp for emp in employees if emp.get('id')}
+
+    def traverse(node):
+        node_id = node.get('id')
+        if not node_id or node_id in visited:
+            return
+        visited.add(node_id)
+        for child in node.get('children', []):
+            traverse(child)
+
+    if visited is None:
+        visited = set()
+        if hierarchy_root:
+            traverse(hierarchy_root)
+
+    root_ids = set()
+    top_user_email = None
+
+    if hierarchy_root and hierarchy_root.get('id'):
+        root_ids.add(hierarchy_root['id'])
+
+    if settings is None:
+        settings = load_settings()
+
+    if top_user_email_override is not None:
+        top_user_email = (top_user_email_override or '').strip().lower() or None
+    elif settings:
+        top_user_email = (settings.get('topUserEmail') or '').strip().lower() or None
+    elif TOP_LEVEL_USER_EMAIL:
+        top_user_email = (TOP_LEVEL_USER_EMAIL or '').strip().lower() or None
+
+    for emp in employees:
+        emp_id = emp.get('id')
+        manager_id = emp.get('managerId')
+        manager_name = ''
+        reason = None
+
+        if emp_id and emp_id in root_ids:
+            continue
+
+        if top_user_email:
+            email = (emp.get('email') or '').strip().lower()
+            if email and email == top_user_email:
+                continue
+
+        if manager_id and manager_id in employee_index:
+            manager_name = employee_index[manager_id].get('name') or ''
+
+        if not manager_id:
+            reason = 'no_manager'
+        elif manager_id not in employee_index:
+            reason = 'manager_not_found'
+        elif emp_id not in visited:
+            reason = 'detached'
+
+        if reason:
+            filter_reasons = list(emp.get('filterReasons') or [])
+            effective_reason = reason
+            if filter_reasons:
+                effective_reason = 'filtered'
+
+            record = {
+                'id': emp_id,
+                'name': emp.get('name'),
+                'title': emp.get('title'),
+                'department': emp.get('department'),
+                'email': emp.get('email'),
+                'phone': emp.get('phone'),
+                'businessPhone': emp.get('businessPhone'),
+                'location': emp.get('location') or emp.get('officeLocation') or '',
+                'managerName': manager_name,
+                'reason': effective_reason,
+                'missingReason': reason,
+                'filterReasons': filter_reasons,
+                'accountEnabled': emp.get('accountEnabled', True),
+                'userType': (emp.get('userType') or '').lower(),
+                'licenseCount': emp.get('licenseCount') or 0,
+                'licenseSkus': list(emp.get('licenseSkus') or []),
+                'licenseSkuIds': list(emp.get('licenseSkuIds') or []),
+                'mailboxType': emp.get('mailboxType'),
+                'isSharedMailbox': emp.get('isSharedMailbox'),
+            }
+            if 'syncedAt' in emp:
+                record['syncedAt'] = emp['syncedAt']
+            yield record
+
+
+def write_directory_datasets(generation, stored_datasets, employees, filtered_with_license, filtered_users,
+                             settings, *, token=None, mailbox_types=None):
+    """Build the hierarchy and the user-derived reports for ``generation``.
+
+    Shared by Graph syncs and archive re-derives. Missing-manager records get
+    their mailbox purpose from Graph when ``token`` is given, otherwise from
+    ``mailbox_types`` recorded by an earlier sync.
+    """
+    months_threshold = settings.get('newEmployeeMonths', 3)
+
+    hierarchy = org_index = None
+    missing_records = []
+    if employees:
+        ignored_employee_set = parse_ignored_employees(settings)
+        ignored_department_set = parse_ignored_departments(settings)
+
+        if ignored_employee_set:
+            before = len(employees)
+            employees = [
+                emp for emp in employees
+                if not employee_is_ignored(
+                    emp.get('name'),
+                    emp.get('email'),
+                    emp.get('userPrincipalName'),
+                    ignored_employee_set
+                )
+            ]
+            if before != len(employees):
+                logger.info(f"Filtered ignored employees; {before}->{len(employees)} remaining")
+
+        if ignored_department_set:
+            before = len(employees)
+            employees = [
+                emp for emp in employees
+                if not department_is_ignored(emp.get('department'), ignored_department_set)
+            ]
+            logger.info(
+                f"Filtered ignored departments {sorted(list(ignored_department_set))}; {before}->{len(employees)} employees"
+            )
+
+        write_employee_list_cache(employees, generation)
+
+        with measure('hierarchy_build', records=len(employees)):
+            hierarchy, org_index = build_org_hierarchy(employees, settings=settings, with_index=True)
+
+        if filtered_users:
+            combined_by_id: dict[str, dict] = {}
+            for record in employees:
+                record_id = record.get('id')
+                if record_id:
+                    combined_by_id[str(record_id)] = record
+                else:
+                    combined_by_id[f'anon-emp-{id(record)}'] = record
+            for record in filtered_users:
+                candidate = dict(record)
+                candidate.setdefault('children', [])
+                record_id = candidate.get('id')
+                if record_id:
+                    combined_by_id[str(record_id)] = candidate
+                else:
+                    combined_by_id[f'anon-filtered-{id(record)}'] = candidate
+            missing_source_records = list(combined_by_id.values())
+        else:
+            missing_source_records = employees
+
+        with measure('missing_managers', records=len(missing_source_records)):
+            missing_records = collect_missing_manager_records(missing_source_records, hierarchy, settings)
+
+        if missing_records and token:
+            enrichment_headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+            }
+            _enrich_mailbox_metadata(enrichment_headers, missing_records, max_lookups=0)
+        elif missing_records and mailbox_types:
+            apply_mailbox_types(missing_records, mailbox_types)
+
+        if hierarchy:
+            mark_new_employees(hierarchy, months_threshold)
+
+            write_hierarchy_cache(hierarchy, org_index, generation)
+            logger.info(f"[{datetime.now()}] Successfully updated employee data. Total employees: {len(employees)}")
+            write_search_index_cache(hierarchy, generation)
+            write_org_index_cache(org_index, generation)
+
+            try:
+                with measure('write_missing_manager', records=len(missing_records)):
+                    write_dataset(dataset_path(MISSING_MANAGER_FILE, generation), json_codec.dumps(missing_records))
+                stored_datasets['missing_manager'] = missing_records
+                logger.info(f"Updated missing manager report cache with {len(missing_records)} records")
+            except Exception as report_error:
+                logger.error(f"Failed to write missing manager report cache: {report_error}")
+        else:
+            logger.error(f"[{datetime.now()}] Could not build hierarchy from employee data")
+
+        try:
+            with measure('write_recently_hired', records=len(employees)):
+                recently_hired_records = collect_recently_hired_employees(employees, days=365)
+                write_dataset(dataset_path(RECENTLY_HIRED_FILE, generation), json_codec.dumps(recently_hired_records))
+            stored_datasets['recently_hired'] = recently_hired_records
+            logger.info(
+                f"Updated recently hired employees report cache with {len(recently_hired_records)} records"
+            )
+        except Exception as report_error:
+            logger.error(f"Failed to write recently hired employees report cache: {report_error}")
+    else:
+        logger.error(f"[{datetime.now()}] No employees fetched from Graph API")
+
+    try:
+        filtered_user_records = filtered_users or []
+        with measure('write_filtered_users', records=len(filtered_user_records)):
+            write_dataset(dataset_path(FILTERED_USERS_FILE, generation), json_codec.dumps(filtered_user_records))
+        stored_datasets['filtered_users'] = filtered_user_records
+        logger.info(
+            f"Updated filtered users report cache with {len(filtered_user_records)} records"
+        )
+    except Exception as report_error:
+        logger.error(f"Failed to write filtered users report cache: {report_error}")
+
+    try:
+        filtered_license_records = filtered_with_license or []
+        with measure('write_filtered_license', records=len(filtered_license_records)):
+            write_dataset(dataset_path(FILTERED_LICENSE_FILE, generation), json_codec.dumps(filtered_license_records))
+        stored_datasets['filtered_license'] = filtered_license_records
+        logger.info(
+            f"Updated filtered licensed users report cache with {len(filtered_license_records)} records"
+        )
+    except Exception as report_error:
+        logger.error(f"Failed to write filtered licensed users report cache: {report_error}")
+
+    return employees, hierarchy, org_index, missing_records
+
+
+def stream_employee_crawl(generation, settings, *, token, archive, spools):
+    """Bounded-memory counterpart of ``fetch_all_employees``.
+
+    Users are spooled to NDJSON in the staging directory as Graph pages
+    arrive. Spools are appended to ``spools`` for the caller to remove once
+    the sync is stored. Returns ``(employees, raw_filtered)`` spools, or None
+    when the crawl failed and the previous directory datasets should be
+    carried over.
+    """
+    staging_dir = generation_dir(generation)
+    employees = EmployeeSpool(os.path.join(staging_dir, 'employees.ndjson.spool'))
+    raw_filtered = RecordSpool(os.path.join(staging_dir, 'filtered-raw.ndjson.spool'))
+    spools.extend([employees, raw_filtered])
+
+    ignored_employee_set = parse_ignored_employees(settings)
+    ignored_department_set = parse_ignored_departments(settings)
+    ignored_count = 0
+
+    def spool_employee(employee):
+        nonlocal ignored_count
+        if (ignored_employee_set and employee_is_ignored(
+                employee.get('name'), employee.get('email'), employee.get('userPrincipalName'), ignored_employee_set
+        )) or (ignored_department_set and department_is_ignored(employee.get('department'), ignored_department_set)):
+            ignored_count += 1
+            return
+        employees.append(employee)
+
+    fetched = stream_all_employees(
+        token=token,
+        settings=settings,
+        on_employee=spool_employee,
+        on_filtered=raw_filtered.append,
+        archive=archive,
+        checkpoint=CrawlCheckpoint(app_config.CRAWL_CHECKPOINT_FILE, app_config.CRAWL_STATE_FILE),
+    )
+    if not fetched or not (len(employees) or ignored_count):
+        logger.error(
+            f"[{datetime.now()}] Streaming sync {'failed' if not fetched else 'returned no employees'}; "
+            "keeping the previous directory data"
+        )
+        archive.discard()
+        return None
+    if ignored_count:
+        logger.info(f"Filtered {ignored_count} ignored employees/departments; {len(employees)} employees remaining")
+    return employees, raw_filtered
+
+
+def stream_directory_datasets(generation, stored_datasets, settings, crawl, *, token, archive, spools):
+    """Bounded-memory counterpart of ``write_directory_datasets``.
+
+    Every dataset is streamed from the spools of ``stream_employee_crawl``;
+    the tree is held as id/parent arrays. Returns ``(employees, hierarchy)``
+    as an ``EmployeeSpool`` and ``CompactHierarchy``, or ``(None, None)``
+    when the crawl failed.
+    """
+    if crawl is None:
+        return None, None
+    employees, raw_filtered = crawl
+    staging_dir = generation_dir(generation)
+    filtered_users = RecordSpool(os.path.join(staging_dir, 'filtered.ndjson.spool'))
+    spools.append(filtered_users)
+    for record in iter_enriched_mailbox_metadata(token, raw_filtered):
+        filtered_users.append(record)
+    raw_filtered.remove()
+    filtered_with_license = filtered_users.where(lambda record: record.get('licenseSkuIds'))
+
+    try:
+        if write_streamed_dataset(dataset_path(EMPLOYEE_LIST_FILE, generation), iter_json_array(employees)):
+            logger.info(f"Cached {len(employees)} employees for session-specific hierarchy builds")
+        else:
+            logger.info(f"Employee cache unchanged ({len(employees)} employees)")
+    except Exception as cache_error:
+        logger.error(f"Failed to write employee cache: {cache_error}")
+    write_metadata_options(build_metadata_options(employees), generation)
+
+    months_threshold = settings.get('newEmployeeMonths', 3)
+    with measure('hierarchy_build', records=len(employees)):
+        hierarchy = build_compact_hierarchy(
+            employees,
+            top_user_email=resolve_top_user_email(settings),
+            top_user_id=TOP_LEVEL_USER_ID,
+            decorate=lambda node: flag_new_employee(node, months_threshold),
+        )
+
+    missing_records = []
+    if hierarchy is not None:
+        missing_spool = RecordSpool(os.path.join(staging_dir, 'missing.ndjson.spool'))
+        spools.append(missing_spool)
+        missing_sort_keys = []
+        with measure('missing_managers', records=len(employees) + len(filtered_users)):
+            for record in iter_enriched_mailbox_metadata(token, iter_missing_manager_records(
+                itertools.chain(employees, filtered_users),
+                hierarchy.node(0),
+                settings,
+                employee_index=RecordLookup(employees, filtered_users),
+                visited=hierarchy.index,
+            )):
+                missing_sort_keys.append((*missing_manager_sort_key(record), len(missing_spool)))
+                missing_spool.append(record)
+        missing_records = SpoolOrder(missing_spool, (row for *_, row in sorted(missing_sort_keys)))
+        del missing_sort_keys
+
+        with measure('write_hierarchy', records=len(hierarchy)):
+            if binary_snapshot_enabled():
+                write_binary_snapshot(
+                    dataset_path(EMPLOYEE_SNAPSHOT_FILE, generation), None, hierarchy.index, node_at=hierarchy.node
+                )
+            else:
+                write_streamed_dataset(dataset_path(DATA_FILE, generation), hierarchy.iter_json())
+        logger.info(f"[{datetime.now()}] Successfully updated employee data. Total employees: {len(employees)}")
+        write_search_index_cache(None, generation, rows=zip(hierarchy.nodes(), hierarchy.index.parents))
+        write_org_index_cache(hierarchy.index, generation)
+
+        try:
+            with measure('write_missing_manager', records=len(missing_records)):
+                write_streamed_dataset(dataset_path(MISSING_MANAGER_FILE, generation), iter_json_array(missing_records))
+            stored_datasets['missing_manager'] = missing_records
+            logger.info(f"Updated missing manager report cache with {len(missing_records)} records")
+        except Exception as report_error:
+            logger.error(f"Failed to write missing manager report cache: {report_error}")
+    else:
+        logger.error(f"[{datetime.now()}] Could not build hierarchy from employee data")
+
+    try:
+        with measure('write_recently_hired', records=len(employees)):
+            recently_hired_records = collect_recently_hired_employees(
+                employees, days=365, manager_lookup=RecordLookup(employees)
+            )
+            write_dataset(dataset_path(RECENTLY_HIRED_FILE, generation), json_codec.dumps(recently_hired_records))
+        stored_datasets['recently_hired'] = recently_hired_records
+        logger.info(f"Updated recently hired employees report cache with {len(recently_hired_records)} records")
+    except Exception as report_error:
+        logger.error(f"Failed to write recently hired employees report cache: {report_error}")
+
+    for dataset, path, records, description in (
+        ('filtered_users', FILTERED_USERS_FILE, filtered_users, 'filtered users'),
+        ('filtered_license', FILTERED_LICENSE_FILE, filtered_with_license, 'filtered licensed users'),
+    ):
+        try:
+            with measure(f'write_{dataset}'):
+                write_streamed_dataset(dataset_path(path, generation), iter_json_array(records))
+            stored_datasets[dataset] = records
+            logger.info(f"Updated {description} report cache with {len(records)} records")
+        except Exception as report_error:
+            logger.error(f"Failed to write {description} report cache: {report_error}")
+
+    archive.commit(mailbox_types=collect_mailbox_types(filtered_users, missing_records))
+    return employees, hierarchy
+
+
+def store_changed_datasets(generation, stored_datasets, employees, hierarchy, org_index):
+    """Copy the datasets this sync changed into the SQLite store, if enabled.
+
+    Datasets whose cache file was reused from the previous generation are
+    skipped unless the store has never held them.
+    """
+    if datastore is None:
+        return
+    changed = changed_datasets(generation)
+    node_at = None
+    if isinstance(hierarchy, CompactHierarchy):
+        hierarchy, node_at = None, hierarchy.node
+
+    def needs_update(name, *paths):
+        return any(os.path.basename(path) in changed for path in paths) or not datastore.has_dataset(name)
+
+    hierarchy_changed = bool(employees) and needs_update('hierarchy', DATA_FILE, EMPLOYEE_SNAPSHOT_FILE, ORG_INDEX_FILE)
+    reports = {
+        name: records for name, records in stored_datasets.items()
+        if needs_update(name, *[path for path, dataset in REPORT_DATASETS.items() if dataset == name])
+    }
+    try:
+        datastore.write_sync(
+            generation,
+            hierarchy=hierarchy if hierarchy_changed else None,
+            org_index=org_index if hierarchy_changed else None,
+            node_at=node_at if hierarchy_changed else None,
+            employees=employees if employees and needs_update('employees', EMPLOYEE_LIST_FILE) else None,
+            reports=reports,
+        )
+    except Exception as store_error:
+        logger.error(f"Failed to update SQLite data store: {store_error}")
+
+
+# Stages of a directory sync in reporting order; the middle ones run as a
+# dependency graph (see ``build_sync_stages``).
+SYNC_STAGES = (
+    'prepare',
+    'employee_crawl',
+    'directory',
+    'sign_in_crawl',
+    'last_login_report',
+    'disabled_crawl',
+    'disabled_reports',
+    'data_store',
+    'publish',
+)
+
+# Pipeline stages behind each sync scope (see ``sync_jobs.SYNC_SCOPES``); a
+# scoped sync runs only its own and carries the other datasets over.
+SYNC_SCOPE_STAGES = {
+    'directory': ('employee_crawl', 'directory'),
+    'signIns': ('sign_in_crawl', 'last_login_report'),
+    'disabled': ('disabled_crawl', 'disabled_reports'),
+}
+
+
+def build_sync_stages(generation, stored_datasets, settings, *, token, archive, spools, scopes=None):
+    """Stages of a Graph sync writing into the staged ``generation``.
+
+    The sign-in and disabled-user crawls do not depend on the employee crawl
+    and run alongside it. They only return records (so they may time out and
+    retry); writing them is a separate stage. A crawl that still fails leaves
+    its reports carried over from the previous generation, as do the stages
+    left out when only some ``scopes`` are refreshed.
+    """
+    crawl_timeout = crawl_timeout_seconds()
+    streaming = streaming_sync_enabled()
+
+    def employee_crawl():
+        if streaming:
+            return stream_employee_crawl(generation, settings, token=token, archive=archive, spools=spools)
+        return fetch_all_employees(
+            token=token,
+            settings=settings,
+            fallback_loader=_load_fetch_all_employees_fallback,
+            archive=archive,
+            checkpoint=CrawlCheckpoint(app_config.CRAWL_CHECKPOINT_FILE, app_config.CRAWL_STATE_FILE),
+        )
+
+    def directory(crawl):
+        if streaming:
+            employees, hierarchy = stream_directory_datasets(
+                generation, stored_datasets, settings, crawl, token=token, archive=archive, spools=spools
+            )
+            return employees, hierarchy, hierarchy.index if hierarchy is not None else None
+
+        employees, filtered_with_license, filtered_users = crawl
+        employees, hierarchy, org_index, missing_records = write_directory_datasets(
+            generation,
+            stored_datasets,
+            employees,
+            filtered_with_license,
+            filtered_users,
+            settings,
+            token=token,
+        )
+        archive.commit(mailbox_types=collect_mailbox_types(filtered_users, missing_records))
+        return employees, hierarchy, org_index
+
+    def last_login_report(last_login_records):
+        add_records(len(last_login_records))
+        write_dataset(dataset_path(LAST_LOGIN_FILE, generation), json_codec.dumps(last_login_records))
+        stored_datasets['last_login'] = last_login_records
+        logger.info(
+            f"Updated last sign-in report cache with {len(last_login_records)} records"
+        )
+
+    def disabled_crawl():
+        existing_disabled_records = []
+        previous_disabled_path = dataset_path(DISABLED_USERS_FILE)
+        if os.path.exists(previous_disabled_path):
+            try:
+                with open(previous_disabled_path, 'r') as previous_file:
+                    data = json_codec.load(previous_file)
+                    if isinstance(data, list):
+                        existing_disabled_records = data
+            except Exception as previous_error:
+                logger.warning(f"Unable to load existing disabled users cache: {previous_error}")
+
+        return collect_disabled_users(
+            token=token,
+            previous_records=existing_disabled_records
+        ) or []
+
+    def disabled_reports(disabled_user_records):
+        try:
+            with measure('write_disabled_users', records=len(disabled_user_records)):
+                write_dataset(dataset_path(DISABLED_USERS_FILE, generation), json_codec.dumps(disabled_user_records))
+            stored_datasets['disabled_users'] = disabled_user_records
+            logger.info(
+                f"Updated disabled users report cache with {len(disabled_user_records)} records"
+            )
+        except Exception as report_error:
+            logger.error(f"Failed to write disabled users report cache: {report_error}")
+
+        try:
+            disabled_license_records = [
+                record for record in disabled_user_records if (record.get('licenseCount') or 0) > 0
+            ]
+
+            with measure('write_disabled_license', records=len(disabled_license_records)):
+                write_dataset(dataset_path(DISABLED_LICENSE_FILE, generation), json_codec.dumps(disabled_license_records))
+            stored_datasets['disabled_license'] = disabled_license_records
+            logger.info(
+                f"Updated disabled licensed users report cache with {len(disabled_license_records)} records"
+            )
+        except Exception as report_error:
+            logger.error(f"Failed to write disabled licensed users report cache: {report_error}")
+
+        try:
+            with measure('write_recently_disabled', records=len(disabled_user_records)):
+                recently_disabled_records = collect_recently_disabled_employees(disabled_user_records, days=365)
+                write_dataset(dataset_path(RECENTLY_DISABLED_FILE, generation), json_codec.dumps(recently_disabled_records))
+            stored_datasets['recently_disabled'] = recently_disabled_records
+            logger.info(
+                f"Updated recently disabled employees report cache with {len(recently_disabled_records)} records"
+            )
+        except Exception as report_error:
+            logger.error(f"Failed to write recently disabled employees report cache: {report_error}")
+
+    stages = [
+        Stage('employee_crawl', employee_crawl, required=True),
+        Stage('directory', directory, requires=('employee_crawl',), required=True),
+        Stage('sign_in_crawl', lambda: collect_last_login_records(token=token), retries=1, timeout=crawl_timeout),
+        Stage('last_login_report', last_login_report, requires=('sign_in_crawl',)),
+        Stage('disabled_crawl', disabled_crawl, retries=1, timeout=crawl_timeout),
+        Stage('disabled_reports', disabled_reports, requires=('disabled_crawl',)),
+    ]
+    if scopes is None:
+        return stages
+    selected = {stage for scope in scopes for stage in SYNC_SCOPE_STAGES[scope]}
+    return [stage for stage in stages if stage.name in selected]
+
+
+def update_employee_data():
+    """Run one directory sync of the job's scopes; raises if it could not run or failed.
+
+    Call through ``sync_jobs`` rather than directly so concurrent requests
+    share one sync. Per-stage metrics are appended to ``SYNC_METRICS_FILE``.
+    """
+    job = current_sync_job()
+    with recording(job.id if job is not None else None):
+        _sync_employee_data(job.scopes if job is not None else None)
+
+
+def _sync_employee_data(scopes=None):
+    spools = []
+    try:
+        sync_stage('prepare')
+        # Ensure data directory exists and is writable
+        if not os.path.exists(DATA_DIR):
+            os.makedirs(DATA_DIR, exist_ok=True)
+            logger.info(f"Created data directory: {DATA_DIR}")
+
+        # Test if we can write to the data directory
+        test_file = os.path.join(DATA_DIR, 'test_write.tmp')
+        try:
+            with open(test_file, 'w') as f:
+                f.write('test')
+            os.remove(test_file)
+        except Exception as e:
+            raise RuntimeError(f"Cannot write to data directory {DATA_DIR}: {e}") from e
+
+        scope_label = ', '.join(sorted(scopes)) if scopes else 'all data'
+        logger.info(f"[{datetime.now()}] Starting employee data update ({scope_label})...")
+        started = time.monotonic()
+        generation = new_generation_id()
+        stored_datasets = {}
+
+        with measure('prepare'):
+            token = get_access_token()
+            if not token:
+                raise RuntimeError("Unable to refresh employee data because access token retrieval failed")
+
+            # Everything below is written into a private directory and only becomes
+            # visible to readers when publish_generation swaps the pointer.
+            begin_generation(generation)
+
+            settings = load_settings()
+            archive = CrawlArchiveWriter(dataset_path(CRAWL_ARCHIVE_FILE, generation))
+        sync_stage('prepare', finished=True)
+
+        pipeline = run_pipeline(
+            build_sync_stages(
+                generation, stored_datasets, settings, token=token, archive=archive, spools=spools, scopes=scopes
+            ),
+            on_start=sync_stage,
+            on_finish=lambda name, outcome: sync_stage(name, finished=True),
+        )
+        employees, hierarchy, org_index = pipeline.get('directory', (None, None, None))
+
+        sync_stage('data_store')
+        with measure('data_store'):
+            store_changed_datasets(generation, stored_datasets, employees, hierarchy, org_index)
+        sync_stage('data_store', finished=True)
+
+        sync_stage('publish')
+        with measure('publish'):
+            if publish_generation(generation) == generation:
+                query_cache.clear()
+                record_org_history(employees)
+        sync_stage('publish', finished=True)
+        logger.info(f"[{datetime.now()}] Employee data update finished in {time.monotonic() - started:.2f}s")
+    except SyncCancelled:
+        # The staged generation is never published and is removed by cleanup_generations.
+        logger.info(f"[{datetime.now()}] Employee data update cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"[{datetime.now()}] Error updating employee data: {e}")
+        raise
+    finally:
+        for spool in spools:
+            spool.remove()
+
+
+def record_org_history(employees):
+    """Add a published sync's employee list to the org history.
+
+    Only Graph syncs that publish a new generation are recorded: cancelled,
+    failed and no-op syncs never reach it, and settings re-derives would show
+    a filter change as people leaving.
+    """
+    if history_store is None or employees is None:
+        return
+    try:
+        with measure('history'):
+            history_store.record(employees)
+    except Exception as history_error:
+        logger.error(f"Failed to record org history: {history_error}")
+
+
+def rederive_employee_data():
+    """Re-apply the current settings to the last crawl archive without calling Graph.
+
+    Rebuilds the hierarchy and the user-derived reports; sign-in and disabled
+    user reports are carried over unchanged. Returns False when no complete
+    archive exists, in which case the settings apply on the next sync. Run it
+    as ``sync_jobs.request(..., kind='rederive')`` so it holds the sync lock
+    and cannot race a sync's publish.
+    """
+    try:
+        sync_stage('rederive')
+        archive = load_crawl_archive(dataset_path(CRAWL_ARCHIVE_FILE))
+        if archive is None:
+            logger.info("No crawl archive available; settings will apply on the next sync")
+            sync_stage('rederive', finished=True)
+            return False
+
+        started = time.monotonic()
+        settings = load_settings()
+        generation = begin_generation()
+        stored_datasets = {}
+        mailbox_types = archive['mailboxTypes']
+
+        employees, filtered_with_license, filtered_users = derive_employees(
+            archive['pages'],
+            sku_map=archive['skuMap'],
+            settings=settings,
+        )
+        apply_mailbox_types(filtered_users, mailbox_types)
+        apply_mailbox_types(filtered_with_license, mailbox_types)
+
+        employees, hierarchy, org_index, _ = write_directory_datasets(
+            generation,
+            stored_datasets,
+            employees,
+            filtered_with_license,
+            filtered_users,
+            settings,
+            mailbox_types=mailbox_types,
+        )
+
+        store_changed_datasets(generation, stored_datasets, employees, hierarchy, org_index)
+
+        if publish_generation(generation) == generation:
+            query_cache.clear()
+        sync_stage('rederive', finished=True)
+        logger.info(
+            f"Re-derived employee data from crawl of {archive['crawledAt']} "
+            f"in {time.monotonic() - started:.2f}s ({len(employees)} employees)"
+        )
+        return True
+    except SyncCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Error re-deriving employee data: {e}")
+        raise
+
+
+sync_jobs = SyncJobManager(
+    update_employee_data,
+    stages=SYNC_STAGES,
+    status_path=app_config.SYNC_STATUS_FILE,
+    scope_stages=SYNC_SCOPE_STAGES,
+    # With WEB_SYNC_ENABLED=false the sync worker (python -m simple_org_chart.sync) runs every sync.
+    delegate=not web_sync_enabled(),
+    rederive=rederive_employee_data,
+)
+
+
+configure_scheduler(lambda reason, scopes: sync_jobs.request(reason, scopes=scopes))
+datastore = get_datastore()
+history_store = get_history_store()
+
+
+@measure('write_employee_list')
+def write_employee_list_cache(employees, generation=None):
+    """Persist the filtered employee list and the option lists derived from it.
+
+    ``generation`` targets a staged sync directory; without it the files in the
+    live generation are replaced atomically.
+    """
+    try:
+        if write_dataset(dataset_path(EMPLOYEE_LIST_FILE, generation), json_codec.dumps(employees)):
+            logger.info(f"Cached {len(employees)} employees for session-specific hierarchy builds")
+        else:
+            logger.info(f"Employee cache unchanged ({len(employees)} employees)")
+    except Exception as cache_error:
+        logger.error(f"Failed to write employee cache: {cache_error}")
+
+    write_metadata_options(build_metadata_options(employees), generation)
+
+
+@measure('write_hierarchy')
+def write_hierarchy_cache(hierarchy, org_index, generation):
+    """Store the hierarchy for ``generation`` as JSON or, if enabled, as a binary snapshot."""
+    if binary_snapshot_enabled():
+        return write_binary_snapshot(dataset_path(EMPLOYEE_SNAPSHOT_FILE, generation), hierarchy, org_index)
+    return write_dataset(dataset_path(DATA_FILE, generation), json_codec.dumps(hierarchy))
+
+
+@measure('write_search_index')
+def write_search_index_cache(hierarchy, generation, rows=None):
+    try:
+        payload = build_search_index(hierarchy, generation, rows=rows)
+        write_search_index(dataset_path(SEARCH_INDEX_FILE, generation), payload)
+        logger.info(
+            f"Updated search index with {payload['count']} employees "
+            f"(client-side search {'enabled' if payload['clientSearch'] else 'disabled'})"
+        )
+    except Exception as index_error:
+        logger.error(f"Failed to write search index: {index_error}")
+
+
+def flag_new_employee(node, months_threshold):
+    """Set ``isNewEmployee`` on one node from its ``hireDate``."""
+    node['isNewEmployee'] = False
+    if node.get('hireDate'):
+        try:
+            hire_date = datetime.fromisoformat(node['hireDate'])
+            if hire_date.tzinfo:
+                cutoff_date = datetime.now(hire_date.tzinfo) - timedelta(days=months_threshold * 30)
+            else:
+                cutoff_date = datetime.now() - timedelta(days=months_threshold * 30)
+            node['isNewEmployee'] = hire_date > cutoff_date
+        except Exception:
+            node['isNewEmployee'] = False
+
+
+def mark_new_employees(root_node, months_threshold):
+    """Flag every node hired within ``months_threshold`` months as ``isNewEmployee``."""
+    stack = [root_node] if isinstance(root_node, dict) else []
+    while stack:
+        node = stack.pop()
+        flag_new_employee(node, months_threshold)
+        stack.extend(child for child in node.get('children') or [] if isinstance(child, dict))
+
+
+@measure('write_org_index')
+def write_org_index_cache(org_index, generation):
+    if org_index is None:
+        return
+    try:
+        write_org_index(dataset_path(ORG_INDEX_FILE, generation), org_index, generation)
+        logger.info(f"Updated org interval index with {len(org_index)} employees")
+    except Exception as index_error:
+        logger.error(f"Failed to write org interval index: {index_error}")
+
+
+def build_metadata_options(employees):
+    return {
+        'jobTitles': collect_unique_field_values(employees, 'title'),
+        'departments': collect_unique_field_values(employees, 'department'),
+        'employees': collect_employee_option_labels(employees),
+    }
+
+
+def write_metadata_options(options, generation=None):
+    try:
+        if not write_dataset(dataset_path(METADATA_OPTIONS_FILE, generation), json_codec.dumps(options)):
+            return True
+        logger.info(
+            f"Updated metadata options cache ({len(options['jobTitles'])} titles, "
+            f"{len(options['departments'])} departments, {len(options['employees'])} employees)"
+        )
+        return True
+    except Exception as options_error:
+        logger.error(f"Failed to write metadata options cache: {options_error}")
+        return False
+
+
+def load_cached_employees():
+    if datastore is not None and datastore.has_dataset('employees'):
+        try:
+            return datastore.load_employees()
+        except Exception as e:
+            logger.error(f"Failed to read employees from SQLite data store: {e}")
+    cache_path = dataset_path(EMPLOYEE_LIST_FILE)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as cache_file:
+                return json_codec.load(cache_file)
+        except Exception as e:
+            logger.error(f"Failed to read employee cache {cache_path}: {e}")
+    return None
+
+
+def collect_unique_field_values(employees, field_name):
+    unique = {}
+    for employee in employees or []:
+        value = (employee.get(field_name) or '').strip()
+        if not value:
+            continue
+        key = value.lower()
+        if key not in unique:
+            unique[key] = value
+
+    return sorted(unique.values(), key=lambda item: item.lower())
+
+
+def collect_employee_option_labels(employees):
+    options = {}
+    for employee in employees or []:
+        name = (employee.get('name') or '').strip()
+        email = (employee.get('email') or '').strip()
+        user_principal_name = (employee.get('userPrincipalName') or '').strip()
+
+        contact = email or user_principal_name
+
+        if not name and not contact:
+            continue
+
+        if name and contact:
+            label = f"{name} <{contact}>"
+        else:
+            label = name or contact
+
+        primary_key = normalize_filter_value(contact) or normalize_filter_value(name) or normalize_filter_value(label)
+        if not primary_key:
+            continue
+
+        if primary_key not in options:
+            options[primary_key] = label
+
+    return sorted(options.values(), key=lambda item: item.lower())
\ No newline at end of file
@@ -0,0 +1,366 @@
+"""Org history stored as periodic checkpoints plus per-sync record deltas.
+
+Each sync that changes the employee list appends one entry to
+``data/history/index.json``. Most entries point at a small delta file (records
+added, removed, and fields set or unset per changed record); every
+``HISTORY_CHECKPOINT_INTERVAL`` entries a full checkpoint is written instead,
+so reconstructing any past state replays at most that many deltas.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import simple_org_chart.config as app_config
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.snapshots import atomic_write
+
+try:  # pragma: no cover - fcntl is unavailable on Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HISTORY_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 30
+INDEX_FILE = "index.json"
+# Derived per request, recomputed from the clock or sync bookkeeping; not part of the directory state.
+VOLATILE_FIELDS = frozenset({"children", "isNewEmployee", "syncedAt"})
+_MISSING = object()
+
+Records = Dict[str, dict]
+
+
+def history_enabled() -> bool:
+    return os.environ.get("HISTORY_ENABLED", "true").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def checkpoint_interval() -> int:
+    """Maximum number of deltas between two full checkpoints."""
+    raw_value = os.environ.get("HISTORY_CHECKPOINT_INTERVAL", "")
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_CHECKPOINT_INTERVAL
+    except ValueError:
+        logger.warning("Invalid HISTORY_CHECKPOINT_INTERVAL '%s'; using %s", raw_value, DEFAULT_CHECKPOINT_INTERVAL)
+        return DEFAULT_CHECKPOINT_INTERVAL
+
+
+def parse_history_time(value: Optional[str], *, end_of_day: bool = False) -> Optional[datetime]:
+    """Parse an ISO date or timestamp; bare dates cover the whole (UTC) day when ``end_of_day``."""
+    if not value or not value.strip():
+        return None
+    text = value.strip()
+    if len(text) == 10:
+        day = datetime.fromisoformat(text).date()
+        return datetime.combine(day, dt_time.max if end_of_day else dt_time.min, tzinfo=timezone.utc)
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _normalize(employees: Sequence[dict]) -> Records:
+    records: Records = {}
+    for employee in employees:
+        employee_id = employee.get("id")
+        if employee_id:
+            records[str(employee_id)] = {
+                key: value for key, value in employee.items() if key not in VOLATILE_FIELDS
+            }
+    return records
+
+
+def compute_delta(previous: Records, current: Records) -> dict:
+    """Record-level difference turning ``previous`` into ``current``."""
+    added = {employee_id: record for employee_id, record in current.items() if employee_id not in previous}
+    removed = sorted(employee_id for employee_id in previous if employee_id not in current)
+    changed = {}
+    for employee_id, record in current.items():
+        before = previous.get(employee_id)
+        if before is None or before == record:
+            continue
+        changes: dict = {}
+        updated = {key: value for key, value in record.items() if before.get(key, _MISSING) != value}
+        if updated:
+            changes["set"] = updated
+        unset = sorted(key for key in before if key not in record)
+        if unset:
+            changes["unset"] = unset
+        changed[employee_id] = changes
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def apply_delta(records: Records, delta: dict) -> Records:
+    """Return a new mapping with ``delta`` applied; ``records`` is left untouched."""
+    result = dict(records)
+    for employee_id in delta.get("removed") or []:
+        result.pop(employee_id, None)
+    for employee_id, changes in (delta.get("changed") or {}).items():
+        record = dict(result.get(employee_id) or {})
+        record.update(changes.get("set") or {})
+        for key in changes.get("unset") or []:
+            record.pop(key, None)
+        result[employee_id] = record
+    result.update(delta.get("added") or {})
+    return result
+
+
+def _entry_time(entry: dict) -> datetime:
+    return datetime.fromisoformat(entry["syncedAt"])
+
+
+class HistoryStore:
+    """Append-only org history under ``directory``."""
+
+    def __init__(self, directory) -> None:
+        self.directory = str(directory)
+        self._lock = threading.RLock()
+        self._index: dict = {"mtime_ns": None, "entries": []}
+        # Most recently reconstructed state, reused when replaying forward.
+        self._state: Tuple[Optional[int], Records] = (None, {})
+
+    # ------------------------------------------------------------ storage
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(".lock"), "a+") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _write_blob(self, name: str, payload) -> int:
+        data = gzip.compress(json_codec.dumps(payload), compresslevel=6, mtime=0)
+        with atomic_write(self._path(name), "wb") as handle:
+            handle.write(data)
+        return len(data)
+
+    def _read_blob(self, name: str):
+        with gzip.open(self._path(name), "rb") as handle:
+            return json_codec.load(handle)
+
+    def entries(self) -> List[dict]:
+        """Index entries, oldest first, re-read whenever another process appends."""
+        path = self._path(INDEX_FILE)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            if self._index["mtime_ns"] != mtime_ns:
+                try:
+                    with open(path, "rb") as handle:
+                        payload = json_codec.load(handle)
+                    entries = payload.get("entries") or [] if isinstance(payload, dict) else []
+                except Exception as error:  # noqa: BLE001 - an unreadable index means no history
+                    logger.error("Failed to read history index %s: %s", path, error)
+                    entries = []
+                self._index = {"mtime_ns": mtime_ns, "entries": entries}
+            return self._index["entries"]
+
+    # -------------------------------------------------------- reconstruction
+
+    def _state_for(self, position: int, entries: List[dict]) -> Records:
+        """Records as of ``entries[position]``, replaying from the nearest checkpoint."""
+        target = entries[position]["sequence"]
+        with self._lock:
+            cached_sequence, cached_records = self._state
+        if cached_sequence == target:
+            return cached_records
+
+        start = position
+        while entries[start]["kind"] != "checkpoint":
+            start -= 1
+        records: Records = {}
+        first = start
+        # Continue from the cached state when it lies between the checkpoint and the target.
+        if cached_sequence is not None:
+            for candidate in range(start, position):
+                if entries[candidate]["sequence"] == cached_sequence:
+                    records, first = cached_records, candidate + 1
+                    break
+        for entry in entries[first:position + 1]:
+            payload = self._read_blob(entry["file"])
+            records = payload["records"] if entry["kind"] == "checkpoint" else apply_delta(records, payload)
+
+        with self._lock:
+            self._state = (target, records)
+        return records
+
+    def _position_at(self, entries: List[dict], at: Optional[datetime]) -> Optional[int]:
+        if not entries:
+            return None
+        if at is None:
+            return len(entries) - 1
+        position = None
+        for index, entry in enumerate(entries):
+            if _entry_time(entry) > at:
+                break
+            position = index
+        return position
+
+    def state_at(self, at: Optional[datetime] = None) -> Tuple[Optional[dict], Records]:
+        """Return the index entry in effect at ``at`` (latest if None) and its records."""
+        entries = self.entries()
+        position = self._position_at(entries, at)
+        if position is None:
+            return None, {}
+        return entries[position], self._state_for(position, entries)
+
+    # ---------------------------------------------------------------- writes
+
+    def record(self, employees: Sequence[dict], synced_at: Optional[datetime] = None) -> Optional[dict]:
+        """Append the current employee list; returns the new entry or None if nothing changed."""
+        current = _normalize(employees)
+        synced_at = synced_at or datetime.now(timezone.utc)
+        with self._lock, self._file_lock():
+            entries = list(self.entries())
+            if entries:
+                previous = self._state_for(len(entries) - 1, entries)
+                delta = compute_delta(previous, current)
+                if not (delta["added"] or delta["removed"] or delta["changed"]):
+                    return None
+            else:
+                delta = {"added": current, "removed": [], "changed": {}}
+
+            sequence = entries[-1]["sequence"] + 1 if entries else 1
+            since_checkpoint = 0
+            for entry in reversed(entries):
+                if entry["kind"] == "checkpoint":
+                    break
+                since_checkpoint += 1
+            checkpoint = not entries or since_checkpoint + 1 >= checkpoint_interval()
+
+            kind = "checkpoint" if checkpoint else "delta"
+            name = f"{kind}-{sequence:06d}.json.gz"
+            size = self._write_blob(name, {"records": current} if checkpoint else delta)
+            entry = {
+                "sequence": sequence,
+                "syncedAt": synced_at.isoformat(),
+                "kind": kind,
+                "file": name,
+                "bytes": size,
+                "headcount": len(current),
+                "added": len(delta["added"]),
+                "removed": len(delta["removed"]),
+                "changed": len(delta["changed"]),
+            }
+            entries.append(entry)
+            with atomic_write(self._path(INDEX_FILE), "wb") as handle:
+                json_codec.dump({"version": HISTORY_VERSION, "entries": entries}, handle)
+            self._state = (sequence, current)
+
+        logger.info(
+            "Recorded org history %s #%s: %s added, %s removed, %s changed (%s bytes)",
+            kind, sequence, entry["added"], entry["removed"], entry["changed"], size,
+        )
+        return entry
+
+    # ----------------------------------------------------------------- feeds
+
+    def _replay(self, since: Optional[datetime], until: Optional[datetime]) -> Iterator[Tuple[dict, Records, dict]]:
+        """Yield ``(entry, records before, delta)`` for entries in ``(since, until]``."""
+        entries = self.entries()
+        positions = [
+            index for index, entry in enumerate(entries)
+            if (since is None or _entry_time(entry) > since) and (until is None or _entry_time(entry) <= until)
+        ]
+        if not positions:
+            return
+        records = self._state_for(positions[0] - 1, entries) if positions[0] > 0 else {}
+        for position in positions:
+            entry = entries[position]
+            if entry["kind"] == "checkpoint":
+                current = self._read_blob(entry["file"])["records"]
+                delta = compute_delta(records, current)
+            else:
+                delta = self._read_blob(entry["file"])
+                current = apply_delta(records, delta)
+            yield entry, records, delta
+            records = current
+
+    def changes(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[dict]:
+        """Per-sync change feed with before/after values for every changed field."""
+        feed = []
+        for entry, before, delta in self._replay(since, until):
+            changed = []
+            for employee_id, changes in delta["changed"].items():
+                previous = before.get(employee_id) or {}
+                fields = {key: {"from": previous.get(key), "to": value} for key, value in (changes.get("set") or {}).items()}
+                fields.update({key: {"from": previous.get(key), "to": None} for key in changes.get("unset") or []})
+                changed.append({"id": employee_id, "name": previous.get("name"), "fields": fields})
+            feed.append({
+                "sequence": entry["sequence"],
+                "syncedAt": entry["syncedAt"],
+                "added": [_summary(record) for record in delta["added"].values()],
+                "removed": [_summary(before.get(employee_id) or {"id": employee_id}) for employee_id in delta["removed"]],
+                "changed": changed,
+            })
+        return feed
+
+    def headcount(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[dict]:
+        """Total and per-department headcount after every sync in the range."""
+        series = []
+        for entry, before, delta in self._replay(since, until):
+            records = apply_delta(before, delta)
+            departments: Dict[str, int] = {}
+            for record in records.values():
+                department = record.get("department") or ""
+                departments[department] = departments.get(department, 0) + 1
+            series.append({
+                "sequence": entry["sequence"],
+                "syncedAt": entry["syncedAt"],
+                "total": len(records),
+                "departments": dict(sorted(departments.items())),
+            })
+        return series
+
+
+def _summary(record: dict) -> dict:
+    return {
+        "id": record.get("id"),
+        "name": record.get("name"),
+        "title": record.get("title"),
+        "department": record.get("department"),
+        "managerId": record.get("managerId"),
+    }
+
+
+_store_lock = threading.Lock()
+_store: Optional[HistoryStore] = None
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """Shared store for ``data/history``, or None when ``HISTORY_ENABLED=false``."""
+    global _store
+    if not history_enabled():
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore(app_config.HISTORY_DIR)
+        return _store
+
+
+__all__ = [
+    "HISTORY_VERSION",
+    "HistoryStore",
+    "apply_delta",
+    "checkpoint_interval",
+    "compute_delta",
+    "get_history_store",
+    "history_enabled",
+    "parse_history_time",
+]
@@ -0,0 +1,130 @@
+"""JSON encoding for cache files and API responses.
+
+Uses ``orjson`` when it is installed and the standard library otherwise.
+Machine-read caches are written compactly; set ``JSON_CODEC=stdlib`` to force
+the standard library backend.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import IO, Any, Callable, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _select_backend() -> str:
+    requested = os.environ.get("JSON_CODEC", "").strip().lower()
+    if requested not in {"", "auto", "orjson", "stdlib"}:
+        logger.warning("Invalid JSON_CODEC '%s'; using auto", requested)
+        requested = "auto"
+    if requested == "stdlib":
+        return "stdlib"
+    if orjson is None:
+        if requested == "orjson":
+            logger.warning("JSON_CODEC=orjson requested but orjson is not installed; using stdlib")
+        return "stdlib"
+    return "orjson"
+
+
+BACKEND = _select_backend()
+
+
+def dumps(
+    obj: Any,
+    *,
+    indent: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> bytes:
+    """Serialize ``obj`` to UTF-8 JSON bytes (compact unless ``indent``)."""
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if default is not None:
+            # Let ``default`` format these the way the stdlib path would.
+            option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        return orjson.dumps(obj, default=default, option=option)
+
+    separators = None if indent else (",", ":")
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=separators,
+        sort_keys=sort_keys,
+        default=default,
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from ``str``, ``bytes`` or a ``memoryview``."""
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dump(obj: Any, handle: IO[bytes], *, indent: bool = False) -> None:
+    """Write ``obj`` to a file opened in binary mode."""
+    handle.write(dumps(obj, indent=indent))
+
+
+def load(handle: IO) -> Any:
+    """Read JSON from a file opened in text or binary mode."""
+    return loads(handle.read())
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by :func:`dumps`/:func:`loads`.
+
+    Output matches :class:`DefaultJSONProvider` (sorted keys, Flask's
+    ``default`` for dates and dataclasses) apart from non-ASCII characters
+    being sent as UTF-8 instead of ``\\u`` escapes.
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return dumps(
+            obj,
+            indent=bool(kwargs.get("indent")),
+            sort_keys=self.sort_keys,
+            default=self.default,
+        ).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = dumps(obj, indent=indent, sort_keys=self.sort_keys, default=self.default)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+__all__ = [
+    "BACKEND",
+    "CodecJSONProvider",
+    "dump",
+    "dumps",
+    "load",
+    "loads",
+]
@@ -0,0 +1,206 @@
+"""Elect one process per data directory to run scheduled syncs.
+
+Every gunicorn worker starts the scheduler thread, but only the holder of the
+lease in ``DATA_DIR/scheduler_lease.json`` acts on it. The holder renews the
+lease from a heartbeat thread; other processes poll it and take over once the
+heartbeat is older than ``SCHEDULER_LEASE_SECONDS`` or, on the same host, as
+soon as the holder's process has exited. Reads and writes of the lease file
+are serialized with ``flock`` where it exists.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import simple_org_chart.config as app_config
+from simple_org_chart.snapshots import atomic_write
+
+try:  # pragma: no cover - fcntl is unavailable on Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 90
+
+
+def lease_seconds() -> int:
+    """How long a lease stays valid without a heartbeat."""
+    raw_value = os.environ.get("SCHEDULER_LEASE_SECONDS", "")
+    try:
+        return max(10, int(raw_value)) if raw_value.strip() else DEFAULT_LEASE_SECONDS
+    except ValueError:
+        logger.warning("Invalid SCHEDULER_LEASE_SECONDS '%s'; using %s", raw_value, DEFAULT_LEASE_SECONDS)
+        return DEFAULT_LEASE_SECONDS
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:  # exists but owned by someone else
+        return True
+    return True
+
+
+def server_instance_id() -> str:
+    """Identify the running server: the gunicorn master for workers, else this process."""
+    pid = os.getppid() if "gunicorn" in sys.modules else os.getpid()
+    return f"{socket.gethostname()}:{pid}"
+
+
+class LeaderLease:
+    """File-backed lease naming the process allowed to run scheduled work."""
+
+    def __init__(self, path: Path, ttl: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.ttl = ttl or lease_seconds()
+        self.identity = {"pid": os.getpid(), "host": socket.gethostname()}
+        self._lock = threading.Lock()
+        self._leading = False
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_name(f".{self.path.name}.lock"), "a+") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def holder(self) -> Optional[dict]:
+        """The current lease record, or None if nobody holds one."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                record = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _is_mine(self, record: Optional[dict]) -> bool:
+        return bool(record) and record.get("pid") == self.identity["pid"] and record.get("host") == self.identity["host"]
+
+    def _expired(self, record: Optional[dict]) -> bool:
+        if not record:
+            return True
+        if time.time() - float(record.get("heartbeatAt") or 0) > self.ttl:
+            return True
+        return record.get("host") == self.identity["host"] and not _process_alive(int(record.get("pid") or 0))
+
+    def _write(self, previous: Optional[dict], **fields) -> None:
+        record = {**(previous or {}), **self.identity, "heartbeatAt": time.time(), **fields}
+        with atomic_write(self.path, "w") as handle:
+            json.dump(record, handle)
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; returns whether this process is the leader."""
+        with self._lock, self._file_lock():
+            record = self.holder()
+            if self._is_mine(record):
+                self._write(record)
+            elif self._expired(record):
+                if record:
+                    logger.info(
+                        "Taking over scheduler lease from pid %s on %s", record.get("pid"), record.get("host")
+                    )
+                self._write(record, acquiredAt=time.time())
+            else:
+                if self._leading:
+                    logger.warning("Lost scheduler lease to pid %s on %s", record.get("pid"), record.get("host"))
+                self._leading = False
+                return False
+
+            if not self._leading:
+                logger.info("Process %s is now the scheduler leader", self.identity["pid"])
+            self._leading = True
+        self._start_heartbeat()
+        return True
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading
+
+    def claim_once(self, marker: str, value: str) -> bool:
+        """Record ``marker=value`` on the lease; True only for the first claim of ``value``.
+
+        Lets the leader run start-up work once per server start even when the
+        lease later moves to another worker.
+        """
+        with self._lock, self._file_lock():
+            record = self.holder()
+            if not self._leading or not self._is_mine(record) or record.get(marker) == value:
+                return False
+            self._write(record, **{marker: value})
+            return True
+
+    def _start_heartbeat(self) -> None:
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="scheduler-lease", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self) -> None:
+        # Renew well inside the TTL so long syncs never let the lease lapse.
+        while not self._stop.wait(max(1.0, self.ttl / 3)):
+            try:
+                if not self.acquire():
+                    return
+            except OSError as error:
+                logger.warning("Unable to renew scheduler lease: %s", error)
+
+    def release(self) -> None:
+        """Give the lease up so another process can take over immediately."""
+        self._stop.set()
+        with self._lock:
+            if not self._leading:
+                return
+            self._leading = False
+            try:
+                with self._file_lock():
+                    record = self.holder()
+                    if self._is_mine(record):
+                        # Keep the record (expired) so run-once markers survive the handover.
+                        self._write(record, heartbeatAt=0)
+            except OSError as error:
+                logger.warning("Unable to release scheduler lease: %s", error)
+        logger.info("Process %s released the scheduler lease", self.identity["pid"])
+
+
+_lease: Optional[LeaderLease] = None
+_lease_lock = threading.Lock()
+
+
+def get_scheduler_lease() -> LeaderLease:
+    """The lease shared by this process (recreated after a fork)."""
+    global _lease
+    with _lease_lock:
+        if _lease is None or _lease.identity["pid"] != os.getpid():
+            _lease = LeaderLease(app_config.SCHEDULER_LEASE_FILE)
+        return _lease
+
+
+__all__ = [
+    "DEFAULT_LEASE_SECONDS",
+    "LeaderLease",
+    "get_scheduler_lease",
+    "lease_seconds",
+    "server_instance_id",
+]
@@ -0,0 +1,253 @@
+"""Compact in-memory employee records.
+
+Workers keep the parsed hierarchy for as long as a data generation is live,
+one record per employee. As dicts with around 30 keys each those records
+dominate worker memory, so they are held as ``__slots__`` objects instead:
+values that repeat across a tenant (departments, locations, license labels,
+manager ids) are shared through an :class:`Interner`, and each record keeps
+a shared "shape" tuple of its original keys so :meth:`Employee.to_dict`
+reproduces the cached JSON exactly.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EMPLOYEE_FIELDS = (
+    "id",
+    "name",
+    "title",
+    "department",
+    "email",
+    "phone",
+    "businessPhone",
+    "location",
+    "officeLocation",
+    "city",
+    "state",
+    "country",
+    "fullAddress",
+    "managerId",
+    "employeeHireDate",
+    "hireDate",
+    "isNewEmployee",
+    "photoUrl",
+    "userPrincipalName",
+    "accountEnabled",
+    "userType",
+    "usageLocation",
+    "filterReasons",
+    "licenseCount",
+    "licenseSkus",
+    "licenseSkuIds",
+    "mailboxType",
+    "isSharedMailbox",
+)
+_FIELDS = frozenset(EMPLOYEE_FIELDS)
+
+# Low-cardinality text, plus ids so every ``managerId`` shares its manager's id string.
+INTERNED_FIELDS = frozenset({
+    "id",
+    "title",
+    "department",
+    "location",
+    "officeLocation",
+    "city",
+    "state",
+    "country",
+    "managerId",
+    "userType",
+    "usageLocation",
+    "mailboxType",
+})
+# Lists are stored as shared tuples and handed out as fresh lists.
+LIST_FIELDS = frozenset({"filterReasons", "licenseSkus", "licenseSkuIds"})
+
+
+class Interner:
+    """Pool that returns one shared object per distinct value."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self) -> None:
+        self._values: Dict[Any, Any] = {}
+
+    def __call__(self, value: Any) -> Any:
+        try:
+            return self._values.setdefault(value, value)
+        except TypeError:  # unhashable values are kept as they are
+            return value
+
+    def sequence(self, values: Any) -> Any:
+        if not isinstance(values, list):
+            return values
+        return self(tuple(self(value) for value in values))
+
+
+class Employee:
+    """One employee record with the fields produced by ``transform_graph_user``.
+
+    Supports the read-only dict methods existing code calls on records
+    (``get``, ``[]``, ``in``, ``keys``, ``items``); keys outside
+    :data:`EMPLOYEE_FIELDS` are kept in a small overflow dict.
+    """
+
+    __slots__ = ("_shape", "_extra", *EMPLOYEE_FIELDS)
+
+    id: Optional[str]
+    name: str
+    title: str
+    department: str
+    email: str
+    phone: str
+    businessPhone: str
+    location: str
+    officeLocation: str
+    city: str
+    state: str
+    country: str
+    fullAddress: str
+    managerId: Optional[str]
+    employeeHireDate: Optional[str]
+    hireDate: Optional[str]
+    isNewEmployee: bool
+    photoUrl: str
+    userPrincipalName: str
+    accountEnabled: bool
+    userType: str
+    usageLocation: str
+    filterReasons: Tuple[str, ...]
+    licenseCount: int
+    licenseSkus: Tuple[str, ...]
+    licenseSkuIds: Tuple[str, ...]
+    mailboxType: Optional[str]
+    isSharedMailbox: Optional[bool]
+
+    @classmethod
+    def from_dict(cls, record: dict, interner: Optional[Interner] = None) -> "Employee":
+        interner = interner or Interner()
+        employee = cls.__new__(cls)
+        extra = None
+        for key, value in record.items():
+            if key == "children":
+                continue
+            if key in _FIELDS:
+                if key in INTERNED_FIELDS:
+                    value = interner(value)
+                elif key in LIST_FIELDS:
+                    value = interner.sequence(value)
+                setattr(employee, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        employee._shape = interner(tuple(record))
+        employee._extra = extra
+        return employee
+
+    def _value(self, key: str) -> Any:
+        if key in _FIELDS:
+            value = getattr(self, key)
+            return list(value) if key in LIST_FIELDS and isinstance(value, tuple) else value
+        if key == "children":
+            return []
+        return self._extra[key]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._shape:
+            raise KeyError(key)
+        return self._value(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._shape
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._value(key) if key in self._shape else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._shape
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, self._value(key)) for key in self._shape)
+
+    def to_dict(self) -> dict:
+        """The record as a plain dict in its original key order."""
+        return dict(self.items())
+
+
+class OrgNode(Employee):
+    """An :class:`Employee` placed in the reporting tree."""
+
+    __slots__ = ("children",)
+
+    children: List["OrgNode"]
+
+    @classmethod
+    def from_dict(cls, record: dict, interner: Optional[Interner] = None) -> "OrgNode":
+        node = super().from_dict(record, interner)
+        node.children = []
+        return node
+
+    def _value(self, key: str) -> Any:
+        if key == "children":
+            return self.children
+        return super()._value(key)
+
+    @classmethod
+    def from_hierarchy(cls, root: Optional[dict], interner: Optional[Interner] = None) -> Optional["OrgNode"]:
+        """Convert a nested ``employee_data.json`` tree without recursion."""
+        if not isinstance(root, dict):
+            return None
+        interner = interner or Interner()
+        top = cls.from_dict(root, interner)
+        stack = [(root, top)]
+        while stack:
+            source, node = stack.pop()
+            for child in source.get("children") or []:
+                if isinstance(child, dict):
+                    converted = cls.from_dict(child, interner)
+                    node.children.append(converted)
+                    stack.append((child, converted))
+        return top
+
+    def walk(self) -> Iterator["OrgNode"]:
+        """Yield this node and its descendants in pre-order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def to_dict(self, *, with_children: bool = True) -> dict:
+        """The subtree as nested dicts shaped like ``employee_data.json``."""
+        top = {key: [] if key == "children" else self._value(key) for key in self._shape}
+        if not with_children:
+            top.pop("children", None)
+            return top
+        stack = [(self, top)]
+        while stack:
+            node, payload = stack.pop()
+            if not node.children:
+                continue
+            children = payload.setdefault("children", [])
+            for child in node.children:
+                child_payload = {key: [] if key == "children" else child._value(key) for key in child._shape}
+                children.append(child_payload)
+                stack.append((child, child_payload))
+        return top
+
+
+def is_record(value: Any) -> bool:
+    """Whether ``value`` is an employee record, either a dict or an :class:`Employee`."""
+    return isinstance(value, (dict, Employee))
+
+
+__all__ = [
+    "EMPLOYEE_FIELDS",
+    "Employee",
+    "INTERNED_FIELDS",
+    "Interner",
+    "LIST_FIELDS",
+    "OrgNode",
+    "is_record",
+]
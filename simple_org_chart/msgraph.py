@@ -6,7 +6,7 @@ import logging
 import os
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Callable, Iterable, Optional, Sequence, Tuple
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
 
 import requests
 
@@ -19,6 +19,8 @@ from simple_org_chart.settings import (
     parse_ignored_employees,
     parse_ignored_titles,
 )
+from simple_org_chart.sync_metrics import measure, record_graph_request, record_page
+from simple_org_chart.sync_pipeline import check_abandoned
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,19 @@ EmployeeTriple = Tuple[list[dict], list[dict], list[dict]]
 FallbackLoader = Callable[[], EmployeeTriple]
 
 
+def _graph_get(url: str, **kwargs) -> requests.Response:
+    """``requests.get`` for directory crawls, counted in the running sync's metrics.
+
+    Raises ``StageTimeout`` instead once the sync stage making the
+    request has been abandoned after its timeout.
+    """
+    check_abandoned()
+    response = requests.get(url, **kwargs)
+    record_graph_request(len(response.content or b""))
+    return response
+
+
+@measure("mailbox_enrichment")
 def _enrich_mailbox_metadata(
     headers: dict,
     records: Iterable[dict],
@@ -69,7 +84,7 @@ def _enrich_mailbox_metadata(
             enrichment_headers["ConsistencyLevel"] = "eventual"
 
         try:
-            response = requests.get(lookup_url, headers=enrichment_headers, timeout=10)
+            response = _graph_get(lookup_url, headers=enrichment_headers, timeout=10)
         except requests.RequestException as exc:
             logger.debug("Failed to enrich mailbox settings for %s: %s", user_id, exc)
             continue
@@ -231,6 +246,7 @@ def fetch_employee_photo(user_id: str, token: str) -> Optional[bytes]:
         return None
 
 
+@measure("sku_map")
 def fetch_subscribed_sku_map(token: str) -> dict[str, str]:
     headers = {
         "Authorization": f"Bearer {token}",
@@ -242,7 +258,7 @@ def fetch_subscribed_sku_map(token: str) -> dict[str, str]:
 
     try:
         while skus_url:
-            response = requests.get(skus_url, headers=headers, timeout=10)
+            response = _graph_get(skus_url, headers=headers, timeout=10)
             response.raise_for_status()
             data = response.json()
             for sku in data.get("value", []):
@@ -260,12 +276,403 @@ def fetch_subscribed_sku_map(token: str) -> dict[str, str]:
     return sku_map
 
 
+def user_filter_options(settings: dict) -> dict:
+    """Resolve the settings that decide which Graph users appear on the chart."""
+    return {
+        "hide_disabled_users": settings.get("hideDisabledUsers", True),
+        "hide_guest_users": settings.get("hideGuestUsers", True),
+        "hide_no_title": settings.get("hideNoTitle", True),
+        "ignored_titles": parse_ignored_titles(settings),
+        "ignored_employees": parse_ignored_employees(settings),
+        "ignored_departments": parse_ignored_departments(settings),
+        "new_employee_months": settings.get("newEmployeeMonths", 3),
+    }
+
+
+def transform_graph_user(
+    user: dict,
+    *,
+    sku_map: dict[str, str],
+    options: dict,
+) -> Tuple[Optional[dict], Optional[dict]]:
+    """Map one raw Graph user to ``(employee, None)``, ``(None, filtered)`` or ``(None, None)``."""
+    display_name = user.get("displayName") or ""
+    primary_email = user.get("mail") or ""
+    user_principal_name = user.get("userPrincipalName") or ""
+    job_title_val = user.get("jobTitle") or ""
+    lowered_title = normalize_filter_value(job_title_val)
+    department_val = user.get("department") or ""
+    business_phones = user.get("businessPhones") or []
+    if isinstance(business_phones, list):
+        business_phone = next((phone for phone in business_phones if phone), "")
+    else:
+        business_phone = business_phones or ""
+
+    assigned_licenses = user.get("assignedLicenses") or []
+    user_type = (user.get("userType") or "").lower()
+
+    license_sku_ids: list[str] = []
+    license_labels: list[str] = []
+    if assigned_licenses:
+        seen_labels: set[str] = set()
+        for license_entry in assigned_licenses:
+            sku_id = license_entry.get("skuId")
+            if not sku_id:
+                continue
+            sku_key = str(sku_id).lower()
+            license_sku_ids.append(str(sku_id))
+            friendly_name = (
+                sku_map.get(sku_key)
+                or sku_map.get(sku_key.upper())
+                or str(sku_id)
+            )
+            normalized_label = friendly_name.lower()
+            if normalized_label not in seen_labels:
+                seen_labels.add(normalized_label)
+                license_labels.append(friendly_name)
+        license_labels.sort(key=lambda item: item.lower())
+
+    filtered_reasons: list[str] = []
+    if options["hide_disabled_users"] and not user.get("accountEnabled", True):
+        filtered_reasons.append("filter_disabled")
+    if options["hide_guest_users"] and user_type == "guest":
+        filtered_reasons.append("filter_guest")
+    if options["hide_no_title"] and job_title_val.strip() == "":
+        filtered_reasons.append("filter_no_title")
+    if options["ignored_titles"] and lowered_title in options["ignored_titles"]:
+        filtered_reasons.append("filter_ignored_title")
+    if department_is_ignored(department_val, options["ignored_departments"]):
+        filtered_reasons.append("filter_ignored_department")
+    if employee_is_ignored(
+        display_name,
+        primary_email,
+        user_principal_name,
+        options["ignored_employees"],
+    ):
+        filtered_reasons.append("filter_ignored_employee")
+
+    if filtered_reasons:
+        base_record = {
+            "id": user.get("id"),
+            "name": display_name or "Unknown",
+            "title": job_title_val or "No Title",
+            "department": department_val or "No Department",
+            "email": primary_email or user_principal_name or "",
+            "userPrincipalName": user_principal_name,
+            "phone": user.get("mobilePhone") or "",
+            "businessPhone": business_phone,
+            "location": user.get("officeLocation") or "",
+            "city": user.get("city") or "",
+            "state": user.get("state") or "",
+            "country": user.get("country") or "",
+            "usageLocation": user.get("usageLocation") or "",
+            "accountEnabled": user.get("accountEnabled", True),
+            "userType": user_type,
+            "filterReasons": filtered_reasons,
+            "licenseCount": len(license_sku_ids),
+            "licenseSkus": license_labels,
+            "licenseSkuIds": license_sku_ids,
+            "mailboxType": None,
+            "isSharedMailbox": None,
+            "managerId": user.get("manager", {}).get("id") if user.get("manager") else None,
+            "children": [],
+        }
+        return None, base_record
+
+    if display_name:
+        hire_date_str = user.get("employeeHireDate")
+        is_new = False
+        hire_date = None
+        if hire_date_str:
+            try:
+                if "T" in hire_date_str:
+                    hire_date = datetime.fromisoformat(hire_date_str.replace("Z", "+00:00"))
+                else:
+                    hire_date = datetime.strptime(hire_date_str, "%Y-%m-%d")
+                    hire_date = hire_date.replace(tzinfo=None)
+                if hire_date.tzinfo:
+                    cutoff_date = datetime.now(hire_date.tzinfo) - timedelta(days=options["new_employee_months"] * 30)
+                else:
+                    cutoff_date = datetime.now() - timedelta(days=options["new_employee_months"] * 30)
+                is_new = hire_date > cutoff_date
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("Error parsing hire date for user %s: %s", user.get("displayName"), exc)
+
+        address_components: list[str] = []
+        if user.get("streetAddress"):
+            address_components.append(user.get("streetAddress"))
+        if user.get("city"):
+            address_components.append(user.get("city"))
+        if user.get("state"):
+            address_components.append(user.get("state"))
+        if user.get("postalCode"):
+            address_components.append(user.get("postalCode"))
+        if user.get("country"):
+            address_components.append(user.get("country"))
+
+        full_address = ", ".join(address_components) if address_components else ""
+        email_value = primary_email or user_principal_name or ""
+
+        return (
+            {
+                "id": user.get("id"),
+                "name": display_name or "Unknown",
+                "title": user.get("jobTitle") or "No Title",
+                "department": department_val or "No Department",
+                "email": email_value,
+                "phone": user.get("mobilePhone") or "",
+                "businessPhone": business_phone,
+                "location": user.get("officeLocation") or "",
+                "officeLocation": user.get("officeLocation") or "",
+                "city": user.get("city") or "",
+                "state": user.get("state") or "",
+                "country": user.get("country") or "",
+                "fullAddress": full_address,
+                "managerId": user.get("manager", {}).get("id") if user.get("manager") else None,
+                "employeeHireDate": hire_date_str,
+                "hireDate": hire_date.isoformat() if hire_date else None,
+                "isNewEmployee": is_new,
+                "photoUrl": f"/api/photo/{user.get('id')}",
+                "userPrincipalName": user_principal_name,
+                "children": [],
+                "accountEnabled": user.get("accountEnabled", True),
+                "userType": user.get("userType") or "",
+                "usageLocation": user.get("usageLocation") or "",
+                "licenseCount": len(license_sku_ids),
+                "licenseSkus": list(license_labels),
+                "licenseSkuIds": list(license_sku_ids),
+                "mailboxType": None,
+                "isSharedMailbox": None,
+            },
+            None,
+        )
+
+    return None, None
+
+
+def derive_employees(
+    pages: Iterable[Sequence[dict]],
+    *,
+    sku_map: dict[str, str],
+    settings: dict,
+) -> EmployeeTriple:
+    """Rerun the ``fetch_all_employees`` filtering over previously crawled pages."""
+    options = user_filter_options(settings)
+    employees: list[dict] = []
+    filtered_with_license: list[dict] = []
+    filtered_users: list[dict] = []
+    for users in pages:
+        for user in users:
+            employee, filtered = transform_graph_user(user, sku_map=sku_map, options=options)
+            if employee is not None:
+                employees.append(employee)
+            elif filtered is not None:
+                filtered_users.append(filtered)
+                if filtered["licenseSkuIds"]:
+                    filtered_with_license.append(dict(filtered))
+    return employees, filtered_with_license, filtered_users
+
+
+def apply_mailbox_types(records: Iterable[dict], mailbox_types: dict[str, str]) -> None:
+    """Fill ``mailboxType``/``isSharedMailbox`` from previously looked-up purposes."""
+    for record in records:
+        purpose = mailbox_types.get(str(record.get("id") or ""))
+        if purpose and not (record.get("mailboxType") or "").strip():
+            record["mailboxType"] = purpose
+            record["isSharedMailbox"] = purpose.lower().startswith("shared")
+
+
+def collect_mailbox_types(*record_groups: Iterable[dict]) -> dict[str, str]:
+    """Map user id to the mailbox purpose recorded on any of ``record_groups``."""
+    mailbox_types: dict[str, str] = {}
+    for records in record_groups:
+        for record in records or []:
+            purpose = (record.get("mailboxType") or "").strip()
+            if purpose and record.get("id"):
+                mailbox_types[str(record["id"])] = purpose
+    return mailbox_types
+
+
+_USER_SELECT_FIELDS = (
+    "id,displayName,jobTitle,department,mail,userPrincipalName,mobilePhone,"
+    "businessPhones,officeLocation,city,state,country,usageLocation,streetAddress,"
+    "postalCode,employeeHireDate,accountEnabled,userType,assignedLicenses"
+)
+
+
+_USERS_QUERY = (
+    f"{GRAPH_API_ENDPOINT}/users?$select={_USER_SELECT_FIELDS}"
+    f"&$expand=manager($select=id,displayName)"
+)
+
+
+def _iter_user_pages(headers: dict, archive=None, checkpoint=None) -> Iterator[list[dict]]:
+    """Yield each page of ``/users``; request errors propagate to the caller.
+
+    With a ``CrawlCheckpoint`` the pages a failed crawl saved are replayed
+    first and the crawl continues after them; every fetched page is saved.
+    """
+    users_url = _USERS_QUERY
+    if checkpoint is not None:
+        resume_url = checkpoint.resume(_USERS_QUERY)
+        if resume_url:
+            for users in checkpoint.replay():
+                if archive is not None:
+                    archive.write_page(users)
+                yield users
+            users_url = resume_url
+        else:
+            checkpoint.start(_USERS_QUERY)
+    while users_url:
+        response = _graph_get(users_url, headers=headers, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        if "value" not in data:
+            break
+        users = data["value"]
+        next_url = data.get("@odata.nextLink")
+        record_page(len(users))
+        if archive is not None:
+            archive.write_page(users)
+        if checkpoint is not None:
+            checkpoint.write_page(users, next_url)
+        yield users
+        users_url = next_url
+    if checkpoint is not None:
+        checkpoint.finish()
+
+
+def _log_fetch_error(exc: Exception) -> None:
+    if not isinstance(exc, requests.RequestException):
+        logger.error("Unexpected error: %s", exc)
+        return
+    logger.error("Error fetching employees: %s", exc)
+    status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if status_code == 401:
+        logger.error("Authentication failed. Please check your credentials.")
+    elif status_code == 403:
+        logger.error("Permission denied. Ensure User.Read.All permission is granted.")
+
+
+def partial_merge_enabled() -> bool:
+    """Whether a failed crawl is merged with cached records (``CRAWL_PARTIAL_MERGE``, default true)."""
+    return os.environ.get("CRAWL_PARTIAL_MERGE", "").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def merge_partial_crawl(
+    fresh: list[dict],
+    cached: Iterable[dict],
+    reached_ids: set[str],
+    synced_at: Optional[str],
+) -> Tuple[list[dict], int]:
+    """Add the ``cached`` records of users a failed crawl did not reach to ``fresh``.
+
+    Added records are marked with ``syncedAt``: the one they already carry
+    from an earlier partial crawl, else ``synced_at`` (the crawl they came
+    from). Users the crawl did reach are never taken from the cache, even when
+    they are no longer in ``fresh``. Returns the merged list and how many
+    records were added.
+    """
+    merged = list(fresh)
+    added = 0
+    for record in cached or []:
+        user_id = record.get("id")
+        if not user_id or str(user_id) in reached_ids:
+            continue
+        stale = dict(record)
+        stale["syncedAt"] = record.get("syncedAt") or synced_at
+        merged.append(stale)
+        added += 1
+    return merged, added
+
+
+def enrich_mailbox_metadata(token: str, records: Iterable[dict]) -> None:
+    """Look up mailbox purposes for ``records`` that do not have one yet."""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    _enrich_mailbox_metadata(headers, records, max_lookups=0)
+
+
+def iter_enriched_mailbox_metadata(token: str, records: Iterable[dict], batch_size: int = 500) -> Iterator[dict]:
+    """Yield ``records`` after :func:`enrich_mailbox_metadata`, one batch at a time."""
+    batch: list[dict] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            enrich_mailbox_metadata(token, batch)
+            yield from batch
+            batch = []
+    if batch:
+        enrich_mailbox_metadata(token, batch)
+        yield from batch
+
+
+def stream_all_employees(
+    *,
+    token: str,
+    settings: dict,
+    on_employee: Callable[[dict], None],
+    on_filtered: Callable[[dict], None],
+    archive=None,
+    checkpoint=None,
+) -> bool:
+    """Crawl ``/users`` handing each transformed record to a callback.
+
+    Unlike :func:`fetch_all_employees` nothing is accumulated, so callers can
+    spool records to disk as pages arrive. Mailbox enrichment and cache
+    fallbacks are left to the caller. Returns False if any page failed.
+    """
+    options = user_filter_options(settings)
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    sku_map = fetch_subscribed_sku_map(token)
+    if archive is not None:
+        archive.begin(sku_map)
+
+    employee_count = filtered_count = 0
+    try:
+        for users in _iter_user_pages(headers, archive, checkpoint):
+            for user in users:
+                employee, filtered = transform_graph_user(user, sku_map=sku_map, options=options)
+                if employee is not None:
+                    on_employee(employee)
+                    employee_count += 1
+                elif filtered is not None:
+                    on_filtered(filtered)
+                    filtered_count += 1
+    except Exception as exc:
+        _log_fetch_error(exc)
+        return False
+
+    if archive is not None:
+        archive.mark_complete()
+    logger.info("Streamed %s employees from Graph API (filtered total %s)", employee_count, filtered_count)
+    return True
+
+
 def fetch_all_employees(
     *,
     token: Optional[str] = None,
     settings: Optional[dict] = None,
     fallback_loader: Optional[FallbackLoader] = None,
+    archive=None,
+    checkpoint=None,
 ) -> EmployeeTriple:
+    """Crawl ``/users`` and split the result into employees and filtered users.
+
+    When ``archive`` (a ``CrawlArchiveWriter``) is given, every raw page is
+    written to it and the crawl is marked complete if no page failed. A
+    ``CrawlCheckpoint`` lets the next crawl resume where a failed one stopped.
+
+    If a page fails, the users fetched so far are kept and the cached records
+    from ``fallback_loader`` fill in the users the crawl did not reach (see
+    :func:`merge_partial_crawl`). With ``CRAWL_PARTIAL_MERGE=false`` the
+    cached lists replace the partial result instead.
+    """
     token = token or get_access_token()
 
     if not token:
@@ -275,15 +682,7 @@ def fetch_all_employees(
             return fallback_loader()
         return ([], [], [])
 
-    settings = settings or load_settings()
-
-    hide_disabled_users = settings.get("hideDisabledUsers", True)
-    hide_guest_users = settings.get("hideGuestUsers", True)
-    hide_no_title = settings.get("hideNoTitle", True)
-    ignored_title_values = parse_ignored_titles(settings)
-    ignored_employee_values = parse_ignored_employees(settings)
-    ignored_department_values = parse_ignored_departments(settings)
-    new_employee_months = settings.get("newEmployeeMonths", 3)
+    options = user_filter_options(settings or load_settings())
 
     headers = {
         "Authorization": f"Bearer {token}",
@@ -293,194 +692,31 @@ def fetch_all_employees(
     employees: list[dict] = []
     filtered_with_license: list[dict] = []
     filtered_users: list[dict] = []
+    reached_ids: set[str] = set()
     fetch_failed = False
 
     sku_map = fetch_subscribed_sku_map(token)
+    if archive is not None:
+        archive.begin(sku_map)
 
-    select_fields = (
-        "id,displayName,jobTitle,department,mail,userPrincipalName,mobilePhone,"
-        "businessPhones,officeLocation,city,state,country,usageLocation,streetAddress,"
-        "postalCode,employeeHireDate,accountEnabled,userType,assignedLicenses"
-    )
-    users_url = (
-        f"{GRAPH_API_ENDPOINT}/users?$select={select_fields}"
-        f"&$expand=manager($select=id,displayName)"
-    )
-
-    while users_url:
-        try:
-            response = requests.get(users_url, headers=headers, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            if "value" not in data:
-                break
-            for user in data["value"]:
-                display_name = user.get("displayName") or ""
-                primary_email = user.get("mail") or ""
-                user_principal_name = user.get("userPrincipalName") or ""
-                job_title_val = user.get("jobTitle") or ""
-                lowered_title = normalize_filter_value(job_title_val)
-                department_val = user.get("department") or ""
-                business_phones = user.get("businessPhones") or []
-                if isinstance(business_phones, list):
-                    business_phone = next((phone for phone in business_phones if phone), "")
-                else:
-                    business_phone = business_phones or ""
-
-                assigned_licenses = user.get("assignedLicenses") or []
-                user_type = (user.get("userType") or "").lower()
-
-                license_sku_ids: list[str] = []
-                license_labels: list[str] = []
-                if assigned_licenses:
-                    seen_labels: set[str] = set()
-                    for license_entry in assigned_licenses:
-                        sku_id = license_entry.get("skuId")
-                        if not sku_id:
-                            continue
-                        sku_key = str(sku_id).lower()
-                        license_sku_ids.append(str(sku_id))
-                        friendly_name = (
-                            sku_map.get(sku_key)
-                            or sku_map.get(sku_key.upper())
-                            or str(sku_id)
-                        )
-                        normalized_label = friendly_name.lower()
-                        if normalized_label not in seen_labels:
-                            seen_labels.add(normalized_label)
-                            license_labels.append(friendly_name)
-                    license_labels.sort(key=lambda item: item.lower())
-
-                filtered_reasons: list[str] = []
-                if hide_disabled_users and not user.get("accountEnabled", True):
-                    filtered_reasons.append("filter_disabled")
-                if hide_guest_users and user_type == "guest":
-                    filtered_reasons.append("filter_guest")
-                if hide_no_title and job_title_val.strip() == "":
-                    filtered_reasons.append("filter_no_title")
-                if ignored_title_values and lowered_title in ignored_title_values:
-                    filtered_reasons.append("filter_ignored_title")
-                if department_is_ignored(department_val, ignored_department_values):
-                    filtered_reasons.append("filter_ignored_department")
-                if employee_is_ignored(
-                    display_name,
-                    primary_email,
-                    user_principal_name,
-                    ignored_employee_values,
-                ):
-                    filtered_reasons.append("filter_ignored_employee")
-
-                if filtered_reasons:
-                    base_record = {
-                        "id": user.get("id"),
-                        "name": display_name or "Unknown",
-                        "title": job_title_val or "No Title",
-                        "department": department_val or "No Department",
-                        "email": primary_email or user_principal_name or "",
-                        "userPrincipalName": user_principal_name,
-                        "phone": user.get("mobilePhone") or "",
-                        "businessPhone": business_phone,
-                        "location": user.get("officeLocation") or "",
-                        "city": user.get("city") or "",
-                        "state": user.get("state") or "",
-                        "country": user.get("country") or "",
-                        "usageLocation": user.get("usageLocation") or "",
-                        "accountEnabled": user.get("accountEnabled", True),
-                        "userType": user_type,
-                        "filterReasons": filtered_reasons,
-                        "licenseCount": len(license_sku_ids),
-                        "licenseSkus": license_labels,
-                        "licenseSkuIds": license_sku_ids,
-                        "mailboxType": None,
-                        "isSharedMailbox": None,
-                        "managerId": user.get("manager", {}).get("id") if user.get("manager") else None,
-                        "children": [],
-                    }
-                    filtered_users.append(base_record)
-                    if license_sku_ids:
-                        filtered_with_license.append(dict(base_record))
-                    continue
-
-                if display_name:
-                    hire_date_str = user.get("employeeHireDate")
-                    is_new = False
-                    hire_date = None
-                    if hire_date_str:
-                        try:
-                            if "T" in hire_date_str:
-                                hire_date = datetime.fromisoformat(hire_date_str.replace("Z", "+00:00"))
-                            else:
-                                hire_date = datetime.strptime(hire_date_str, "%Y-%m-%d")
-                                hire_date = hire_date.replace(tzinfo=None)
-                            if hire_date.tzinfo:
-                                cutoff_date = datetime.now(hire_date.tzinfo) - timedelta(days=new_employee_months * 30)
-                            else:
-                                cutoff_date = datetime.now() - timedelta(days=new_employee_months * 30)
-                            is_new = hire_date > cutoff_date
-                        except Exception as exc:  # pragma: no cover - defensive
-                            logger.warning("Error parsing hire date for user %s: %s", user.get("displayName"), exc)
-
-                    address_components: list[str] = []
-                    if user.get("streetAddress"):
-                        address_components.append(user.get("streetAddress"))
-                    if user.get("city"):
-                        address_components.append(user.get("city"))
-                    if user.get("state"):
-                        address_components.append(user.get("state"))
-                    if user.get("postalCode"):
-                        address_components.append(user.get("postalCode"))
-                    if user.get("country"):
-                        address_components.append(user.get("country"))
-
-                    full_address = ", ".join(address_components) if address_components else ""
-                    email_value = primary_email or user_principal_name or ""
-
-                    employees.append(
-                        {
-                            "id": user.get("id"),
-                            "name": display_name or "Unknown",
-                            "title": user.get("jobTitle") or "No Title",
-                            "department": department_val or "No Department",
-                            "email": email_value,
-                            "phone": user.get("mobilePhone") or "",
-                            "businessPhone": business_phone,
-                            "location": user.get("officeLocation") or "",
-                            "officeLocation": user.get("officeLocation") or "",
-                            "city": user.get("city") or "",
-                            "state": user.get("state") or "",
-                            "country": user.get("country") or "",
-                            "fullAddress": full_address,
-                            "managerId": user.get("manager", {}).get("id") if user.get("manager") else None,
-                            "employeeHireDate": hire_date_str,
-                            "hireDate": hire_date.isoformat() if hire_date else None,
-                            "isNewEmployee": is_new,
-                            "photoUrl": f"/api/photo/{user.get('id')}",
-                            "userPrincipalName": user_principal_name,
-                            "children": [],
-                            "accountEnabled": user.get("accountEnabled", True),
-                            "userType": user.get("userType") or "",
-                            "usageLocation": user.get("usageLocation") or "",
-                            "licenseCount": len(license_sku_ids),
-                            "licenseSkus": list(license_labels),
-                            "licenseSkuIds": list(license_sku_ids),
-                            "mailboxType": None,
-                            "isSharedMailbox": None,
-                        }
-                    )
-            users_url = data.get("@odata.nextLink")
-        except requests.RequestException as exc:
-            fetch_failed = True
-            logger.error("Error fetching employees: %s", exc)
-            status_code = getattr(getattr(exc, "response", None), "status_code", None)
-            if status_code == 401:
-                logger.error("Authentication failed. Please check your credentials.")
-            elif status_code == 403:
-                logger.error("Permission denied. Ensure User.Read.All permission is granted.")
-            break
-        except Exception as exc:  # pragma: no cover - defensive
-            fetch_failed = True
-            logger.error("Unexpected error: %s", exc)
-            break
+    try:
+        for users in _iter_user_pages(headers, archive, checkpoint):
+            for user in users:
+                if user.get("id"):
+                    reached_ids.add(str(user["id"]))
+                employee, filtered = transform_graph_user(user, sku_map=sku_map, options=options)
+                if employee is not None:
+                    employees.append(employee)
+                elif filtered is not None:
+                    filtered_users.append(filtered)
+                    if filtered["licenseSkuIds"]:
+                        filtered_with_license.append(dict(filtered))
+    except Exception as exc:
+        fetch_failed = True
+        _log_fetch_error(exc)
+
+    if archive is not None and not fetch_failed:
+        archive.mark_complete()
 
     logger.info(
         "Fetched %s employees from Graph API (filtered total %s, with licenses %s)",
@@ -489,7 +725,22 @@ def fetch_all_employees(
         len(filtered_with_license),
     )
 
-    if (fetch_failed or not employees) and fallback_loader:
+    if fetch_failed and reached_ids and fallback_loader and partial_merge_enabled():
+        cached_employees, cached_filtered_with_license, cached_filtered_users = fallback_loader()
+        synced_at = checkpoint.last_crawled() if checkpoint is not None else None
+        employees, stale_count = merge_partial_crawl(employees, cached_employees, reached_ids, synced_at)
+        filtered_with_license, _ = merge_partial_crawl(
+            filtered_with_license, cached_filtered_with_license, reached_ids, synced_at
+        )
+        filtered_users, _ = merge_partial_crawl(filtered_users, cached_filtered_users, reached_ids, synced_at)
+        logger.warning(
+            "Graph fetch failed after %s users; kept %s cached employee records for users it did not reach "
+            "(last crawled %s)",
+            len(reached_ids),
+            stale_count,
+            synced_at or "at an unknown time",
+        )
+    elif (fetch_failed or not employees) and fallback_loader:
         fallback_employees, fallback_filtered_with_license, fallback_filtered_users = fallback_loader()
         if fallback_employees:
             logger.warning(
@@ -532,10 +783,14 @@ def fetch_all_employees(
 
 
 def collect_last_login_records(*, token: Optional[str] = None) -> list[dict]:
+    """Crawl sign-in activity for every user.
+
+    Raises on any Graph failure rather than returning a partial list, so the
+    sync keeps the previous report.
+    """
     token = token or get_access_token()
     if not token:
-        logger.error("Failed to get access token for last sign-in report")
-        return []
+        raise RuntimeError("Failed to get access token for last sign-in report")
 
     sku_map = fetch_subscribed_sku_map(token)
 
@@ -592,10 +847,10 @@ def collect_last_login_records(*, token: Optional[str] = None) -> list[dict]:
 
     while users_url:
         try:
-            response = requests.get(users_url, headers=headers, timeout=20)
+            response = _graph_get(users_url, headers=headers, timeout=20)
         except requests.RequestException as exc:
             logger.error("Failed to fetch sign-in activity: %s", exc)
-            break
+            raise
 
         if response.status_code == 429:
             retry_after = response.headers.get("Retry-After")
@@ -618,9 +873,10 @@ def collect_last_login_records(*, token: Optional[str] = None) -> list[dict]:
                 status_code,
                 exc,
             )
-            break
+            raise
 
         payload = response.json()
+        record_page(len(payload.get("value", [])))
 
         for user in payload.get("value", []):
             sign_in = user.get("signInActivity") or {}
@@ -676,10 +932,10 @@ def collect_last_login_records(*, token: Optional[str] = None) -> list[dict]:
 
 
 def _collect_disabled_users(*, token: Optional[str] = None) -> list[dict]:
+    """Crawl disabled accounts; raises on any Graph failure like :func:`collect_last_login_records`."""
     token = token or get_access_token()
     if not token:
-        logger.error("Failed to get access token for disabled user reports")
-        return []
+        raise RuntimeError("Failed to get access token for disabled user reports")
 
     sku_map = fetch_subscribed_sku_map(token)
 
@@ -699,9 +955,10 @@ def _collect_disabled_users(*, token: Optional[str] = None) -> list[dict]:
 
     while users_url:
         try:
-            response = requests.get(users_url, headers=headers, timeout=15)
+            response = _graph_get(users_url, headers=headers, timeout=15)
             response.raise_for_status()
             data = response.json()
+            record_page(len(data.get("value", [])))
             for user in data.get("value", []):
                 display_name = user.get("displayName") or ""
                 primary_email = user.get("mail") or ""
@@ -764,10 +1021,7 @@ def _collect_disabled_users(*, token: Optional[str] = None) -> list[dict]:
             users_url = data.get("@odata.nextLink")
         except requests.RequestException as exc:
             logger.error("Error fetching disabled users: %s", exc)
-            break
-        except Exception as exc:  # pragma: no cover
-            logger.error("Unexpected error while collecting disabled user data: %s", exc)
-            break
+            raise
 
     logger.info("Collected %s disabled users", len(records))
     return records
@@ -822,14 +1076,24 @@ def collect_disabled_licensed_users(
 
 
 __all__ = [
+    "apply_mailbox_types",
     "calculate_days_since",
     "collect_disabled_licensed_users",
     "collect_disabled_users",
     "collect_last_login_records",
+    "collect_mailbox_types",
     "datetime_to_iso",
+    "derive_employees",
+    "enrich_mailbox_metadata",
+    "iter_enriched_mailbox_metadata",
     "fetch_all_employees",
     "fetch_employee_photo",
     "fetch_subscribed_sku_map",
     "get_access_token",
+    "merge_partial_crawl",
     "parse_graph_datetime",
+    "partial_merge_enabled",
+    "stream_all_employees",
+    "transform_graph_user",
+    "user_filter_options",
 ]
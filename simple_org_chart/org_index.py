@@ -0,0 +1,207 @@
+"""Euler-tour interval index over the org hierarchy."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Iterable, List, Optional
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.models import is_record
+from simple_org_chart.snapshots import dataset_fingerprint, write_dataset
+
+logger = logging.getLogger(__name__)
+
+ORG_INDEX_VERSION = 1
+
+_load_lock = threading.Lock()
+_loaded: dict = {"key": None, "index": None}
+
+
+class OrgIntervalIndex:
+    """Pre-order enter/exit numbering of every node in the hierarchy.
+
+    Row ``i`` is the node entered ``i``-th in a depth-first walk, so a node's
+    enter number is its row and its exit number is the row of its last
+    descendant. ``y`` manages ``x`` (directly or indirectly) exactly when
+    ``enter[y] < enter[x] <= exit[y]``, and a subtree holds
+    ``exit - enter + 1`` people.
+    """
+
+    __slots__ = ("ids", "parents", "exits", "depths", "child_counts", "generation", "_rows")
+
+    def __init__(
+        self,
+        ids: List[str],
+        parents: List[int],
+        exits: List[int],
+        depths: List[int],
+        child_counts: Optional[List[int]] = None,
+        generation: Optional[str] = None,
+    ) -> None:
+        self.ids = ids
+        self.parents = parents
+        self.exits = exits
+        self.depths = depths
+        if child_counts is None:
+            child_counts = [0] * len(ids)
+            for parent_row in parents:
+                if parent_row >= 0:
+                    child_counts[parent_row] += 1
+        self.child_counts = child_counts
+        self.generation = generation
+        self._rows = {employee_id: row for row, employee_id in enumerate(ids)}
+
+    @classmethod
+    def from_hierarchy(cls, root: Optional[dict]) -> "OrgIntervalIndex":
+        ids: List[str] = []
+        parents: List[int] = []
+        exits: List[int] = []
+        depths: List[int] = []
+        seen: set = set()
+
+        # Iterative walk: deep reporting lines would overflow recursion limits.
+        stack = [(root, -1, 0, False)] if is_record(root) else []
+        while stack:
+            node, parent_row, depth, leaving = stack.pop()
+            if leaving:
+                exits[parent_row] = len(ids) - 1
+                continue
+            node_id = str(node.get("id") or "")
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            row = len(ids)
+            ids.append(node_id)
+            parents.append(parent_row)
+            exits.append(row)
+            depths.append(depth)
+            stack.append((None, row, depth, True))
+            children = [child for child in node.get("children") or [] if is_record(child)]
+            stack.extend((child, row, depth + 1, False) for child in reversed(children))
+
+        return cls(ids, parents, exits, depths)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "OrgIntervalIndex":
+        if payload.get("version") != ORG_INDEX_VERSION:
+            raise ValueError(f"Unsupported org index version: {payload.get('version')}")
+        return cls(
+            list(payload.get("ids") or []),
+            list(payload.get("parents") or []),
+            list(payload.get("exits") or []),
+            list(payload.get("depths") or []),
+            list(payload.get("childCounts") or []) or None,
+            payload.get("generation"),
+        )
+
+    def to_payload(self, generation: Optional[str] = None) -> dict:
+        return {
+            "version": ORG_INDEX_VERSION,
+            "generation": generation or self.generation,
+            "ids": self.ids,
+            "parents": self.parents,
+            "exits": self.exits,
+            "depths": self.depths,
+            "childCounts": self.child_counts,
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, employee_id: object) -> bool:
+        return employee_id in self._rows
+
+    def row(self, employee_id: str) -> Optional[int]:
+        return self._rows.get(employee_id)
+
+    def is_descendant(self, employee_id: str, manager_id: str, *, inclusive: bool = False) -> bool:
+        """Return True when ``employee_id`` sits inside ``manager_id``'s org."""
+        employee_row = self._rows.get(employee_id)
+        manager_row = self._rows.get(manager_id)
+        if employee_row is None or manager_row is None:
+            return False
+        if employee_row == manager_row:
+            return inclusive
+        return manager_row < employee_row <= self.exits[manager_row]
+
+    def subtree_size(self, employee_id: str) -> int:
+        """Number of people in the employee's org, including themselves."""
+        row = self._rows.get(employee_id)
+        if row is None:
+            return 0
+        return self.exits[row] - row + 1
+
+    def descendant_count(self, employee_id: str) -> int:
+        return max(self.subtree_size(employee_id) - 1, 0)
+
+    def direct_report_count(self, employee_id: str) -> int:
+        row = self._rows.get(employee_id)
+        return self.child_counts[row] if row is not None else 0
+
+    def depth(self, employee_id: str) -> Optional[int]:
+        row = self._rows.get(employee_id)
+        return self.depths[row] if row is not None else None
+
+    def parent(self, employee_id: str) -> Optional[str]:
+        row = self._rows.get(employee_id)
+        if row is None or self.parents[row] < 0:
+            return None
+        return self.ids[self.parents[row]]
+
+    def chain(self, employee_id: str) -> List[str]:
+        """Management chain from the top of the org down to ``employee_id``."""
+        row = self._rows.get(employee_id)
+        chain: List[str] = []
+        while row is not None and row >= 0:
+            chain.append(self.ids[row])
+            row = self.parents[row]
+        chain.reverse()
+        return chain
+
+    def subtree_ids(self, employee_id: str) -> Iterable[str]:
+        row = self._rows.get(employee_id)
+        if row is None:
+            return []
+        return self.ids[row:self.exits[row] + 1]
+
+
+def write_org_index(path: str, index: OrgIntervalIndex, generation: Optional[str] = None) -> bool:
+    payload = index.to_payload(generation)
+    # Fingerprint the structure only so an unchanged index keeps its generation.
+    fingerprint = dataset_fingerprint(json_codec.dumps({**payload, "generation": None}))
+    return write_dataset(path, json_codec.dumps(payload), fingerprint=fingerprint)
+
+
+def load_org_index(path: str) -> Optional[OrgIntervalIndex]:
+    """Load the persisted index, reusing the parsed copy until the file changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        if _loaded["key"] == key:
+            return _loaded["index"]
+
+    try:
+        with open(path, "rb") as handle:
+            index = OrgIntervalIndex.from_payload(json_codec.load(handle))
+    except Exception as error:  # noqa: BLE001 - treat unreadable caches as missing
+        logger.error("Failed to load org index from %s: %s", path, error)
+        return None
+
+    with _load_lock:
+        _loaded["key"] = key
+        _loaded["index"] = index
+    return index
+
+
+__all__ = [
+    "ORG_INDEX_VERSION",
+    "OrgIntervalIndex",
+    "load_org_index",
+    "write_org_index",
+]
@@ -0,0 +1,179 @@
+"""Bounded LRU cache for JSON query results, keyed by data generation.
+
+Keys also carry the current UTC date, because several reports count days
+back from today, and the settings file's modification stamp, because
+filters and thresholds change results without a new generation.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import current_app, request
+
+from simple_org_chart.settings import settings_version
+from simple_org_chart.snapshots import active_generation, current_generation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_MEGABYTES = 64
+
+# Parameters that never change the result: cache busters and explicit refreshes
+# (a refresh bypasses the cache entirely, see ``cached_query``).
+IGNORED_PARAMS = frozenset({"_", "refresh"})
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...], Optional[str], str, Optional[int]]
+
+
+def _env_int(name: str, default: int) -> int:
+    raw_value = os.environ.get(name, "")
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else default
+    except ValueError:
+        logger.warning("Invalid %s '%s'; using %s", name, raw_value, default)
+        return default
+
+
+class QueryResultCache:
+    """Thread-safe LRU of serialized responses bounded by entry count and bytes."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_MEGABYTES * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[bytes, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._generation: Optional[str] = None
+        self._context: Tuple[str, Optional[int]] = ("", None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def _observe_generation(self, key: CacheKey) -> None:
+        # Entries for older generations, days or settings can never be hit
+        # again; drop them eagerly.
+        generation, context = key[2], key[3:]
+        if generation != self._generation or context != self._context:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+            self._context = context
+
+    def get(self, key: CacheKey) -> Optional[Tuple[bytes, int, str]]:
+        with self._lock:
+            self._observe_generation(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, body: bytes, status: int, mimetype: str) -> None:
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._observe_generation(key)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, status, mimetype)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[0])
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "generation": self._generation,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+query_cache = QueryResultCache(
+    max_entries=_env_int("QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    max_bytes=_env_int("QUERY_CACHE_MAX_MB", DEFAULT_MAX_MEGABYTES) * 1024 * 1024,
+)
+
+
+def build_cache_key(generation: Optional[str]) -> CacheKey:
+    """Normalize the current request into a cache key."""
+    route = request.path.rstrip("/") or "/"
+    params = tuple(
+        sorted(
+            (name, value.strip().lower())
+            for name, value in request.args.items(multi=True)
+            if name not in IGNORED_PARAMS
+        )
+    )
+    today = datetime.now(timezone.utc).date().isoformat()
+    return route, params, generation, today, settings_version()
+
+
+def _is_refresh_request() -> bool:
+    return request.args.get("refresh", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def cached_query(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Serve repeated GET queries from :data:`query_cache` until the generation, day or settings change."""
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any):
+        if not query_cache.enabled or request.method != "GET" or _is_refresh_request():
+            return func(*args, **kwargs)
+
+        generation = active_generation()
+        key = build_cache_key(generation)
+        cached = query_cache.get(key)
+        if cached is not None:
+            body, status, mimetype = cached
+            response = current_app.response_class(body, status=status, mimetype=mimetype)
+            response.headers["X-Query-Cache"] = "hit"
+            return response
+
+        response = current_app.make_response(func(*args, **kwargs))
+        # Only keep results for the live generation; a request pinned to an older
+        # one would otherwise flush the cache back to superseded data.
+        if response.status_code == 200 and not response.direct_passthrough and current_generation() == generation:
+            query_cache.put(key, response.get_data(), response.status_code, response.mimetype)
+        response.headers["X-Query-Cache"] = "miss"
+        return response
+
+    return wrapper
+
+
+__all__ = [
+    "QueryResultCache",
+    "build_cache_key",
+    "cached_query",
+    "query_cache",
+]
@@ -2,14 +2,15 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Callable, Iterable, List, Optional, Sequence, Type
 
 import simple_org_chart.config as app_config
+import simple_org_chart.json_codec as json_codec
 from simple_org_chart.msgraph import parse_graph_datetime
+from simple_org_chart.snapshots import dataset_path
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +24,58 @@ LAST_LOGIN_FILE = str(app_config.LAST_LOGIN_FILE)
 FILTERED_LICENSE_FILE = str(app_config.FILTERED_LICENSE_FILE)
 FILTERED_USERS_FILE = str(app_config.FILTERED_USERS_FILE)
 
+# JSON cache file -> data store dataset name.
+DATASET_BY_PATH = {
+    MISSING_MANAGER_FILE: "missing_manager",
+    DISABLED_USERS_FILE: "disabled_users",
+    DISABLED_LICENSE_FILE: "disabled_license",
+    RECENTLY_DISABLED_FILE: "recently_disabled",
+    RECENTLY_HIRED_FILE: "recently_hired",
+    LAST_LOGIN_FILE: "last_login",
+    FILTERED_USERS_FILE: "filtered_users",
+    FILTERED_LICENSE_FILE: "filtered_license",
+}
+
 
 class ReportCacheManager:
-    """Centralised helper for loading cached report data."""
+    """Centralised helper for loading cached report data.
+
+    When a data ``store`` is configured, datasets it holds are read from there
+    instead of the JSON cache files.
+    """
 
-    def __init__(self, refresh_callback: Optional[Callable[[], None]] = None) -> None:
+    def __init__(self, refresh_callback: Optional[Callable[[bool], None]] = None, store=None) -> None:
         self._refresh_callback = refresh_callback
+        self._store = store
+
+    @property
+    def uses_store(self) -> bool:
+        return self._store is not None
+
+    def _store_dataset(self, path: str) -> Optional[str]:
+        if self._store is None:
+            return None
+        dataset = DATASET_BY_PATH.get(path)
+        if dataset is None:
+            return None
+        try:
+            return dataset if self._store.has_dataset(dataset) else None
+        except Exception as error:  # pragma: no cover - fall back to JSON caches
+            logger.error("Data store unavailable for %s: %s", dataset, error)
+            return None
+
+    def _refresh_if_needed(self, path: str, refresh: bool, description: str) -> None:
+        if refresh or (not os.path.exists(dataset_path(path)) and self._store_dataset(path) is None):
+            if refresh:
+                logger.info("Refreshing %s", description)
+            if self._refresh_callback is not None:
+                try:
+                    # ``refresh`` asks for a new sync; a missing cache is satisfied by one already running.
+                    self._refresh_callback(refresh)
+                except Exception as exc:  # pragma: no cover - defensive
+                    logger.error("Failed to refresh %s: %s", description, exc)
+            else:
+                logger.warning("No refresh callback configured; cannot refresh %s", description)
 
     def load_json(
         self,
@@ -43,25 +90,25 @@ class ReportCacheManager:
             logger.error("No path provided for %s", description)
             return [] if expected_type is list else None
 
-        if refresh or not os.path.exists(path):
-            if refresh:
-                logger.info("Refreshing %s", description)
-            if self._refresh_callback is not None:
-                try:
-                    self._refresh_callback()
-                except Exception as exc:  # pragma: no cover - defensive
-                    logger.error("Failed to refresh %s: %s", description, exc)
-            else:
-                logger.warning("No refresh callback configured; cannot refresh %s", description)
+        self._refresh_if_needed(path, refresh, description)
+
+        dataset = self._store_dataset(path) if expected_type is list else None
+        if dataset is not None:
+            try:
+                return self._store.load_report(dataset)
+            except Exception as error:  # pragma: no cover - fall back to JSON caches
+                logger.error("Failed to read %s from data store: %s", description, error)
 
+        # Resolved after any refresh so a sync triggered here is read back.
+        path = dataset_path(path)
         if not os.path.exists(path):
             logger.warning("%s not found at %s", description, path)
             return [] if expected_type is list else None
 
         try:
-            with open(path, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
-        except json.JSONDecodeError as decode_error:
+            with open(path, "rb") as handle:
+                data = json_codec.load(handle)
+        except ValueError as decode_error:
             logger.error("Failed to parse %s at %s: %s", description, path, decode_error)
             return [] if expected_type is list else None
         except Exception as error:  # pragma: no cover - I/O errors
@@ -74,6 +121,32 @@ class ReportCacheManager:
 
         return data
 
+    def query(
+        self,
+        path: str,
+        *,
+        refresh: bool = False,
+        description: str = "report cache",
+        **filters,
+    ) -> Optional[List[dict]]:
+        """Run a filtered query against the data store.
+
+        Returns ``None`` when the dataset is not in the store so callers can
+        fall back to loading the JSON cache and filtering in Python. Without a
+        store nothing is refreshed here; the fallback load handles it.
+        """
+        if self._store is None:
+            return None
+        self._refresh_if_needed(path, refresh, description)
+        dataset = self._store_dataset(path)
+        if dataset is None:
+            return None
+        try:
+            return self._store.query_report(dataset, **filters)
+        except Exception as error:  # pragma: no cover - fall back to JSON caches
+            logger.error("Failed to query %s from data store: %s", description, error)
+            return None
+
 
 def load_missing_manager_data(cache: ReportCacheManager, *, force_refresh: bool = False):
     return cache.load_json(
@@ -184,7 +257,7 @@ def calculate_license_totals(records: Optional[Iterable[dict]]):
     return sum((record.get("licenseCount") or 0) for record in records or [])
 
 
-def _resolve_mailbox_categories(record: dict) -> tuple[bool, bool, bool]:
+def resolve_mailbox_categories(record: dict) -> tuple[bool, bool, bool]:
     mailbox_type_raw = record.get("mailboxType")
     mailbox_type_value = str(mailbox_type_raw).strip().lower() if mailbox_type_raw is not None else ""
 
@@ -258,7 +331,7 @@ def apply_last_login_filters(
     filtered: List[dict] = []
 
     for record in records:
-        is_user_mailbox, is_shared_mailbox, is_room_equipment_mailbox = _resolve_mailbox_categories(record)
+        is_user_mailbox, is_shared_mailbox, is_room_equipment_mailbox = resolve_mailbox_categories(record)
 
         if is_user_mailbox and not include_user_mailboxes:
             continue
@@ -326,7 +399,7 @@ def apply_filtered_user_filters(
     filtered: List[dict] = []
 
     for record in records:
-        is_user_mailbox, is_shared_mailbox, is_room_equipment_mailbox = _resolve_mailbox_categories(record)
+        is_user_mailbox, is_shared_mailbox, is_room_equipment_mailbox = resolve_mailbox_categories(record)
 
         if is_user_mailbox and not include_user_mailboxes:
             continue
@@ -386,6 +459,94 @@ def apply_missing_manager_filters(
     )
 
 
+def _parse_inactive_thresholds(inactive_days, inactive_days_max):
+    """Mirror the ``inactive_days`` parsing done by :func:`apply_last_login_filters`."""
+    minimum = None
+    maximum = None
+    never_only = False
+    if inactive_days not in (None, "", "none"):
+        if isinstance(inactive_days, str) and inactive_days.lower() == "never":
+            never_only = True
+        else:
+            try:
+                minimum = int(inactive_days)  # type: ignore[arg-type]
+            except (TypeError, ValueError):
+                minimum = None
+    if inactive_days_max not in (None, "", "none"):
+        try:
+            maximum = int(inactive_days_max)  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            maximum = None
+    return minimum, maximum, never_only
+
+
+def query_last_login_data(cache: ReportCacheManager, *, force_refresh: bool = False, **filters):
+    """Filtered sign-in activity, answered by the data store when available."""
+    minimum, maximum, never_only = _parse_inactive_thresholds(
+        filters.get("inactive_days"), filters.get("inactive_days_max")
+    )
+    store_filters = {key: value for key, value in filters.items() if key not in {"inactive_days", "inactive_days_max"}}
+    records = cache.query(
+        LAST_LOGIN_FILE,
+        refresh=force_refresh,
+        description="last sign-in cache",
+        user_type_applies_to_user_mailboxes_only=True,
+        require_never_signed_in=never_only,
+        min_days_inactive=minimum,
+        max_days_inactive=maximum,
+        **store_filters,
+    )
+    if records is not None:
+        return records
+    return apply_last_login_filters(load_last_login_data(cache, force_refresh=force_refresh and not cache.uses_store), **filters)
+
+
+def query_filtered_user_data(cache: ReportCacheManager, *, force_refresh: bool = False, **filters):
+    records = cache.query(FILTERED_USERS_FILE, refresh=force_refresh, description="filtered users cache", **filters)
+    if records is not None:
+        return records
+    return apply_filtered_user_filters(load_filtered_user_data(cache, force_refresh=force_refresh and not cache.uses_store), **filters)
+
+
+def query_missing_manager_data(cache: ReportCacheManager, *, force_refresh: bool = False, **filters):
+    records = cache.query(MISSING_MANAGER_FILE, refresh=force_refresh, description="missing manager cache", **filters)
+    if records is not None:
+        return records
+    return apply_missing_manager_filters(load_missing_manager_data(cache, force_refresh=force_refresh and not cache.uses_store), **filters)
+
+
+def query_disabled_users_data(
+    cache: ReportCacheManager,
+    *,
+    force_refresh: bool = False,
+    licensed_only: bool = False,
+    recent_days: Optional[int] = None,
+    include_guests: bool = False,
+    include_members: bool = True,
+):
+    disabled_since = None
+    if recent_days and recent_days > 0:
+        disabled_since = datetime.now(timezone.utc) - timedelta(days=recent_days)
+    records = cache.query(
+        DISABLED_USERS_FILE,
+        refresh=force_refresh,
+        description="disabled users cache",
+        include_unlicensed=not licensed_only,
+        include_guests=include_guests,
+        include_members=include_members,
+        disabled_since=disabled_since,
+    )
+    if records is not None:
+        return records
+    return apply_disabled_filters(
+        load_disabled_users_data(cache, force_refresh=force_refresh and not cache.uses_store),
+        licensed_only=licensed_only,
+        recent_days=recent_days,
+        include_guests=include_guests,
+        include_members=include_members,
+    )
+
+
 __all__ = [
     "ReportCacheManager",
     "apply_disabled_filters",
@@ -401,4 +562,9 @@ __all__ = [
     "load_missing_manager_data",
     "load_recently_disabled_data",
     "load_recently_hired_data",
+    "query_disabled_users_data",
+    "query_filtered_user_data",
+    "query_last_login_data",
+    "query_missing_manager_data",
+    "resolve_mailbox_categories",
 ]
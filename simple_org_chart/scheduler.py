@@ -1,32 +1,43 @@
-"""Background scheduler management for SimpleOrgChart."""
+"""Background scheduler management for SimpleOrgChart.
+
+Scheduled syncs are named jobs. The daily job built from ``updateTime`` and
+``updateTimezone`` refreshes everything; each entry of the ``scheduledJobs``
+setting adds a job that refreshes only some sync scopes (``directory``,
+``signIns``, ``disabled``) every ``intervalMinutes`` or on a five-field
+``cron`` expression evaluated in its own ``timezone``. The next run of every
+job is kept in a heap and the loop sleeps until the earliest one is due.
+"""
 
 from __future__ import annotations
 
+import heapq
+import json
 import logging
 import os
 import threading
-import time
 from datetime import datetime, timedelta, time as dt_time, timezone
-from typing import Callable, Optional
-
-import schedule
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Set, Tuple
 
 try:
     from zoneinfo import ZoneInfo
 except ImportError:  # pragma: no cover - Python < 3.9 not officially supported but guard anyway
     ZoneInfo = None  # type: ignore[assignment]
 
+from simple_org_chart.leader_election import get_scheduler_lease, server_instance_id
 from simple_org_chart.settings import load_settings
+from simple_org_chart.sync_jobs import SYNC_SCOPES
 
 logger = logging.getLogger(__name__)
 
 _scheduler_running = False
 _scheduler_lock = threading.Lock()
 _scheduler_thread: Optional[threading.Thread] = None
-_update_callback: Optional[Callable[[], None]] = None
+_stop_event: Optional[threading.Event] = None
+_update_callback: Optional[Callable[[str, Optional[Tuple[str, ...]]], None]] = None
 
 DEFAULT_TIME_STRING = "20:00"
 DEFAULT_TIMEZONE = "UTC"
+DAILY_JOB_NAME = "daily"
 
 
 def _resolve_timezone(tz_name: Optional[str]) -> timezone:
@@ -54,16 +65,200 @@ def _parse_time_string(value: Optional[str]) -> dt_time:
         return dt_time(hour=20, minute=0)
 
 
-def _compute_next_run(update_time: dt_time, tz: timezone) -> datetime:
-    tz_now = datetime.now(tz)
-    candidate = tz_now.replace(hour=update_time.hour, minute=update_time.minute, second=0, microsecond=0)
-    if candidate <= tz_now:
-        candidate += timedelta(days=1)
-    return candidate.astimezone(timezone.utc)
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if step < 1:
+            raise ValueError(f"invalid step in cron field '{field}'")
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start_text, end_text = base.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"cron field '{field}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Five-field cron expression: minute, hour, day of month, month, day of week.
+
+    Fields accept ``*``, numbers, ranges, lists and ``/step``. Sunday is 0 or 7
+    and, as in cron, a day matching either restricted day field qualifies.
+    """
+
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        fields = str(expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression '{expression}' must have five fields")
+        self.expression = " ".join(fields)
+        try:
+            self.minutes, self.hours, self.days, self.months, weekdays = (
+                _parse_cron_field(field, low, high) for field, (low, high) in zip(fields, self._RANGES)
+            )
+        except ValueError as error:
+            raise ValueError(f"invalid cron expression '{expression}': {error}") from None
+        self.weekdays = {day % 7 for day in weekdays}
+        self._every_day = fields[2] == "*" or fields[4] == "*"
+
+    def _day_matches(self, candidate: datetime) -> bool:
+        in_month = candidate.day in self.days
+        in_week = (candidate.weekday() + 1) % 7 in self.weekdays
+        return in_month and in_week if self._every_day else in_month or in_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute after ``moment``, in the wall time of its timezone."""
+        candidate = moment.replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate.replace(tzinfo=moment.tzinfo)
+        raise ValueError(f"cron expression '{self.expression}' never matches")
+
+
+class ScheduledJob:
+    """A named sync of some scopes (None for all) on an interval or cron expression."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        scopes: Optional[Iterable[str]] = None,
+        interval_minutes: Optional[int] = None,
+        cron: Optional[str] = None,
+        tz: Optional[timezone] = None,
+        enabled: bool = True,
+    ) -> None:
+        if (interval_minutes is None) == (cron is None):
+            raise ValueError("set either intervalMinutes or cron")
+        if interval_minutes is not None and interval_minutes < 1:
+            raise ValueError("intervalMinutes must be at least 1")
+        self.name = name
+        self.scopes = tuple(sorted(scopes)) if scopes else None
+        self.interval = timedelta(minutes=interval_minutes) if interval_minutes is not None else None
+        self.cron = CronExpression(cron) if cron is not None else None
+        self.tz = tz or _resolve_timezone(DEFAULT_TIMEZONE)
+        self.enabled = enabled
+
+    def next_run(self, after: datetime) -> datetime:
+        """The first run (in UTC) after ``after``."""
+        if self.interval is not None:
+            return after + self.interval
+        return self.cron.next_after(after.astimezone(self.tz)).astimezone(timezone.utc)
+
+    def describe(self) -> str:
+        timing = f"every {int(self.interval.total_seconds() // 60)} min" if self.interval else f"cron '{self.cron.expression}'"
+        return f"{self.name} ({', '.join(self.scopes or ('all data',))}; {timing})"
+
+
+def parse_scheduled_job(entry: Any) -> ScheduledJob:
+    """Build a job from one ``scheduledJobs`` setting; raises ValueError if invalid."""
+    if not isinstance(entry, dict):
+        raise ValueError("a scheduled job must be an object")
+    name = str(entry.get("name") or "").strip()
+    if not name:
+        raise ValueError("a scheduled job needs a name")
+    scopes = entry.get("scopes")
+    if not isinstance(scopes, list) or not scopes:
+        raise ValueError(f"scheduled job '{name}' must refresh at least one of {', '.join(SYNC_SCOPES)}")
+    unknown = [scope for scope in scopes if scope not in SYNC_SCOPES]
+    if unknown:
+        raise ValueError(f"scheduled job '{name}' has unknown scopes: {', '.join(map(str, unknown))}")
+
+    interval = entry.get("intervalMinutes")
+    cron = str(entry.get("cron") or "").strip() or None
+    if interval in ("", None):
+        interval = None
+    else:
+        try:
+            interval = int(interval)
+        except (TypeError, ValueError):
+            raise ValueError(f"scheduled job '{name}' has an invalid interval '{interval}'") from None
 
+    tz_name = str(entry.get("timezone") or DEFAULT_TIMEZONE)
+    try:
+        tz = ZoneInfo(tz_name) if ZoneInfo is not None else None
+    except Exception:  # noqa: BLE001 - ZoneInfo raises several error types
+        raise ValueError(f"scheduled job '{name}' has an unknown timezone '{tz_name}'") from None
 
-def configure_scheduler(update_callback: Callable[[], None]) -> None:
-    """Register the callback used to refresh employee data."""
+    try:
+        job = ScheduledJob(
+            name, scopes=scopes, interval_minutes=interval, cron=cron, tz=tz, enabled=entry.get("enabled", True) is not False
+        )
+        job.next_run(datetime.now(timezone.utc))  # rejects cron dates that never occur
+    except ValueError as error:
+        raise ValueError(f"scheduled job '{name}': {error}") from None
+    return job
+
+
+def validate_scheduled_jobs(entries: Any) -> List[str]:
+    """Problems with a ``scheduledJobs`` setting, for the settings endpoint."""
+    if entries in (None, []):
+        return []
+    if not isinstance(entries, list):
+        return ["scheduledJobs must be a list"]
+    errors = []
+    names = {DAILY_JOB_NAME}
+    for entry in entries:
+        try:
+            job = parse_scheduled_job(entry)
+        except ValueError as error:
+            errors.append(str(error))
+            continue
+        if job.name in names:
+            errors.append(f"scheduled job name '{job.name}' is used more than once")
+        names.add(job.name)
+    return errors
+
+
+def load_scheduled_jobs(settings: dict) -> List[ScheduledJob]:
+    """Enabled jobs from settings; invalid entries are logged and skipped."""
+    jobs = []
+    if settings.get("autoUpdateEnabled", True):
+        update_time = _parse_time_string(settings.get("updateTime"))
+        jobs.append(ScheduledJob(
+            DAILY_JOB_NAME,
+            cron=f"{update_time.minute} {update_time.hour} * * *",
+            tz=_resolve_timezone(settings.get("updateTimezone")),
+        ))
+    names = {job.name for job in jobs} | {DAILY_JOB_NAME}
+    for entry in settings.get("scheduledJobs") or []:
+        try:
+            job = parse_scheduled_job(entry)
+        except ValueError as error:
+            logger.warning("Ignoring %s", error)
+            continue
+        if job.name in names:
+            logger.warning("Ignoring duplicate scheduled job '%s'", job.name)
+            continue
+        names.add(job.name)
+        if job.enabled:
+            jobs.append(job)
+    return jobs
+
+
+def configure_scheduler(update_callback: Callable[[str, Optional[Tuple[str, ...]]], None]) -> None:
+    """Register the callback that requests a sync.
+
+    It is called with a reason and the scopes to refresh (None for all) and
+    should return without waiting for the sync.
+    """
     global _update_callback
     _update_callback = update_callback
 
@@ -73,13 +268,43 @@ def is_scheduler_running() -> bool:
     return _scheduler_running
 
 
-def _ensure_callback() -> Callable[[], None]:
+def _ensure_callback() -> Callable[[str, Optional[Tuple[str, ...]]], None]:
     if _update_callback is None:
         raise RuntimeError("Scheduler update callback has not been configured")
     return _update_callback
 
 
-def _schedule_loop() -> None:
+def _settings_signature(settings: dict) -> tuple:
+    return (
+        settings.get("updateTime"),
+        settings.get("updateTimezone"),
+        settings.get("autoUpdateEnabled", True),
+        json.dumps(settings.get("scheduledJobs") or [], sort_keys=True),
+    )
+
+
+def _run_update(update_callback: Callable[[str, Optional[Tuple[str, ...]]], None], jobs: Sequence[ScheduledJob]) -> None:
+    # Jobs due together share one sync covering all their scopes.
+    scopes: Optional[Set[str]] = set()
+    for job in jobs:
+        scopes = None if scopes is None or job.scopes is None else scopes | set(job.scopes)
+    try:
+        update_callback(f"scheduled: {', '.join(job.name for job in jobs)}", tuple(sorted(scopes)) if scopes else None)
+    except Exception as exc:  # noqa: BLE001 - log and continue running loop
+        logger.exception("Scheduled update callback failed: %s", exc)
+
+
+def _plan(jobs: Sequence[ScheduledJob], now: datetime) -> List[tuple]:
+    queue = [(job.next_run(now), job.name, job) for job in jobs]
+    heapq.heapify(queue)
+    for run_at, _, job in sorted(queue):
+        logger.info("Scheduled job %s; next run at %s", job.describe(), run_at.astimezone(job.tz).strftime("%Y-%m-%d %H:%M %Z"))
+    if not queue:
+        logger.info("Automatic updates are disabled; no scheduled jobs")
+    return queue
+
+
+def _schedule_loop(stop_event: threading.Event) -> None:
     global _scheduler_running
 
     try:
@@ -89,89 +314,121 @@ def _schedule_loop() -> None:
         _scheduler_running = False
         return
 
-    schedule.clear()
-    settings = load_settings()
-
-    if os.environ.get("RUN_INITIAL_UPDATE", "true").lower() == "true":
-        logger.info("[%s] Running initial employee data update on startup...", datetime.now())
-        update_callback()
-
-    update_time = _parse_time_string(settings.get("updateTime"))
-    tz = _resolve_timezone(settings.get("updateTimezone"))
-    next_run_utc: Optional[datetime]
-    if settings.get("autoUpdateEnabled", True):
-        next_run_utc = _compute_next_run(update_time, tz)
-        logger.info(
-            "Scheduled daily updates for %s (%s); next run at %s",
-            update_time.strftime("%H:%M"),
-            getattr(tz, "key", str(tz)),
-            next_run_utc.astimezone(tz).strftime("%Y-%m-%d %H:%M %Z"),
-        )
-    else:
-        next_run_utc = None
-        logger.info("Automatic updates are disabled; skipping daily schedule")
-
-    while _scheduler_running:
-        if next_run_utc is not None and datetime.now(timezone.utc) >= next_run_utc:
-            logger.info("Executing scheduled update at %s", datetime.now(tz).strftime("%Y-%m-%d %H:%M %Z"))
-            try:
-                update_callback()
-            except Exception as exc:  # noqa: BLE001 - log and continue running loop
-                logger.exception("Scheduled update callback failed: %s", exc)
+    lease = get_scheduler_lease()
+    run_initial_update = os.environ.get("RUN_INITIAL_UPDATE", "true").lower() == "true"
+    signature: Optional[tuple] = None
+    # Heap of (next run in UTC, job name, job); names are unique.
+    queue: List[tuple] = []
 
+    while not stop_event.is_set():
+        try:
+            leading = lease.acquire()
+        except OSError as exc:
+            logger.warning("Unable to read scheduler lease: %s", exc)
+            leading = False
+
+        if not leading:
+            # Another process runs the schedule; re-plan from settings if we take over.
+            signature = None
+            queue = []
+        else:
+            if run_initial_update and lease.claim_once("initialUpdateFor", server_instance_id()):
+                logger.info("[%s] Running initial employee data update on startup...", datetime.now())
+                try:
+                    update_callback("startup", None)
+                except Exception as exc:  # noqa: BLE001 - log and continue running loop
+                    logger.exception("Initial update callback failed: %s", exc)
+
+            # Settings may have been saved by another worker, so the leader re-reads them on every wake-up.
             settings = load_settings()
-            update_time = _parse_time_string(settings.get("updateTime"))
-            tz = _resolve_timezone(settings.get("updateTimezone"))
-
-            if settings.get("autoUpdateEnabled", True):
-                next_run_utc = _compute_next_run(update_time, tz)
-                logger.info(
-                    "Next scheduled update at %s",
-                    next_run_utc.astimezone(tz).strftime("%Y-%m-%d %H:%M %Z"),
-                )
-            else:
-                next_run_utc = None
-                logger.info("Automatic updates disabled; halting further scheduling")
-
-        time.sleep(30)
+            if _settings_signature(settings) != signature:
+                signature = _settings_signature(settings)
+                queue = _plan(load_scheduled_jobs(settings), datetime.now(timezone.utc))
+
+            now = datetime.now(timezone.utc)
+            due = []
+            # Jobs falling due within the same second share one sync.
+            while queue and queue[0][0] <= now + timedelta(seconds=1):
+                run_at, _, job = heapq.heappop(queue)
+                due.append(job)
+                # From the slot just taken, not from now: a wake-up in the second
+                # before a cron slot would otherwise plan that same slot again.
+                heapq.heappush(queue, (job.next_run(max(now, run_at)), job.name, job))
+            if due:
+                logger.info("Running scheduled jobs: %s", ", ".join(job.describe() for job in due))
+                _run_update(update_callback, due)
+
+        # Sleep until the next job is due, waking sooner to keep up with the lease and settings.
+        timeout = max(1.0, lease.ttl / 3)
+        if queue:
+            timeout = min(timeout, max(0.0, (queue[0][0] - datetime.now(timezone.utc)).total_seconds()))
+        stop_event.wait(timeout)
 
 
 def start_scheduler() -> None:
-    """Start the background scheduler thread if it is not already running."""
-    global _scheduler_running, _scheduler_thread
+    """Start the background scheduler thread if it is not already running.
+
+    Every process runs the thread, but only the holder of the scheduler lease
+    (see :mod:`simple_org_chart.leader_election`) executes updates.
+    """
+    global _scheduler_running, _scheduler_thread, _stop_event
 
     with _scheduler_lock:
         if _scheduler_running:
             return
         _scheduler_running = True
-        _scheduler_thread = threading.Thread(target=_schedule_loop, daemon=True)
+        _stop_event = threading.Event()
+        _scheduler_thread = threading.Thread(target=_schedule_loop, args=(_stop_event,), daemon=True)
         _scheduler_thread.start()
         logger.info("Scheduler started")
 
 
-def stop_scheduler() -> None:
-    """Stop the background scheduler loop."""
+def _halt_loop() -> bool:
     global _scheduler_running
 
     with _scheduler_lock:
         if not _scheduler_running:
-            return
+            return False
         _scheduler_running = False
+        if _stop_event is not None:
+            _stop_event.set()
+        return True
+
+
+def stop_scheduler() -> None:
+    """Stop the background scheduler loop and hand the lease to another process."""
+    if _halt_loop():
         logger.info("Scheduler stopped")
+    get_scheduler_lease().release()
 
 
 def restart_scheduler() -> None:
-    """Restart the scheduler, reloading settings and timings."""
-    stop_scheduler()
-    time.sleep(2)
-    schedule.clear()
+    """Restart the scheduler, reloading settings and timings.
+
+    The lease is kept, so leadership does not move to another worker.
+    """
+    _halt_loop()
+    if _scheduler_thread is not None:
+        _scheduler_thread.join(timeout=5)
     start_scheduler()
 
 
+def is_scheduler_leader() -> bool:
+    """Return True if this process currently runs scheduled updates."""
+    return get_scheduler_lease().is_leader
+
+
 __all__ = [
+    "CronExpression",
+    "DAILY_JOB_NAME",
+    "ScheduledJob",
     "configure_scheduler",
+    "is_scheduler_leader",
     "is_scheduler_running",
+    "load_scheduled_jobs",
+    "parse_scheduled_job",
     "restart_scheduler",
     "start_scheduler",
     "stop_scheduler",
+    "validate_scheduled_jobs",
 ]
@@ -0,0 +1,119 @@
+"""Compact search payload used for client-side employee search."""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+from typing import Iterable, Iterator, Optional, Tuple
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.snapshots import dataset_fingerprint, reuse_dataset, write_dataset
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_VERSION = 1
+DEFAULT_CLIENT_LIMIT = 50000
+
+
+def client_search_limit() -> int:
+    """Largest tenant (in employees) for which browsers search locally."""
+    raw_value = os.environ.get("SEARCH_INDEX_CLIENT_LIMIT", "")
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else DEFAULT_CLIENT_LIMIT
+    except ValueError:
+        logger.warning("Invalid SEARCH_INDEX_CLIENT_LIMIT '%s'; using %s", raw_value, DEFAULT_CLIENT_LIMIT)
+        return DEFAULT_CLIENT_LIMIT
+
+
+def _hierarchy_rows(hierarchy: Optional[dict]) -> Iterator[Tuple[dict, int]]:
+    stack = [(hierarchy, -1)] if isinstance(hierarchy, dict) else []
+    row = 0
+    while stack:
+        node, parent_row = stack.pop()
+        yield node, parent_row
+        children = [child for child in node.get("children") or [] if isinstance(child, dict)]
+        stack.extend((child, row) for child in reversed(children))
+        row += 1
+
+
+def build_search_index(
+    hierarchy: Optional[dict],
+    generation: Optional[str],
+    *,
+    rows: Optional[Iterable[Tuple[dict, int]]] = None,
+) -> dict:
+    """Encode the hierarchy as dictionary-coded columns in pre-order.
+
+    Names, titles and departments share one string table; ``parents`` holds the
+    row index of each employee's manager (``-1`` for the root). Rows follow the
+    same order as the server-side search so results match between the two.
+    ``rows`` supplies pre-order ``(node, parent_row)`` pairs instead of
+    walking a nested ``hierarchy``.
+    """
+    strings: list[str] = []
+    string_ids: dict[str, int] = {}
+
+    def encode(value) -> int:
+        text = value if isinstance(value, str) else ""
+        index = string_ids.get(text)
+        if index is None:
+            index = len(strings)
+            string_ids[text] = index
+            strings.append(text)
+        return index
+
+    ids: list[str] = []
+    names: list[int] = []
+    titles: list[int] = []
+    departments: list[int] = []
+    parents: list[int] = []
+
+    for node, parent_row in rows if rows is not None else _hierarchy_rows(hierarchy):
+        ids.append(str(node.get("id") or ""))
+        names.append(encode(node.get("name")))
+        titles.append(encode(node.get("title")))
+        departments.append(encode(node.get("department")))
+        parents.append(parent_row)
+
+    count = len(ids)
+    payload = {
+        "version": SEARCH_INDEX_VERSION,
+        "generation": generation,
+        "count": count,
+        "clientSearch": 0 < count <= client_search_limit(),
+    }
+    if payload["clientSearch"]:
+        payload.update(
+            {
+                "strings": strings,
+                "ids": ids,
+                "names": names,
+                "titles": titles,
+                "departments": departments,
+                "parents": parents,
+            }
+        )
+    return payload
+
+
+def write_search_index(path: str, payload: dict) -> bool:
+    """Persist the payload as compact JSON plus a pre-compressed ``.gz`` copy.
+
+    The fingerprint ignores ``generation``, so an unchanged index keeps the
+    generation it was first built for. Returns True if the index changed.
+    """
+    encoded = json_codec.dumps(payload)
+    fingerprint = dataset_fingerprint(json_codec.dumps({**payload, "generation": None}))
+    changed = write_dataset(path, encoded, fingerprint=fingerprint)
+    if changed or not reuse_dataset(f"{path}.gz", fingerprint):
+        write_dataset(f"{path}.gz", gzip.compress(encoded, compresslevel=6, mtime=0), fingerprint=fingerprint)
+    return changed
+
+
+__all__ = [
+    "SEARCH_INDEX_VERSION",
+    "build_search_index",
+    "client_search_limit",
+    "write_search_index",
+]
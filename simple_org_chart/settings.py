@@ -33,6 +33,7 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
     "autoUpdateEnabled": True,
     "updateTime": "20:00",
     "updateTimezone": "UTC",
+    "scheduledJobs": [],
     "collapseLevel": "2",
     "searchAutoExpand": True,
     "searchHighlight": True,
@@ -71,6 +72,19 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
     "ignoredTitles": "",
 }
 
+# Settings that change which users are on the chart or how the tree is built.
+# Saving a new value for any of them re-derives the data from the last crawl.
+DIRECTORY_SETTING_KEYS = (
+    "hideDisabledUsers",
+    "hideGuestUsers",
+    "hideNoTitle",
+    "ignoredEmployees",
+    "ignoredDepartments",
+    "ignoredTitles",
+    "newEmployeeMonths",
+    "topUserEmail",
+)
+
 _filter_legacy_split_re = re.compile(r"\s*[;,]+\s*")
 _trim_edge_punct = re.compile(r"^[\s\-–—|]+|[\s\-–—|]+$")
 _hex_six_pattern = re.compile(r"^[0-9a-fA-F]{6}$")
@@ -147,6 +161,14 @@ def load_settings() -> Dict[str, Any]:
     return _apply_environment_overrides(DEFAULT_SETTINGS)
 
 
+def settings_version() -> int | None:
+    """Modification stamp of the settings file, shared by every worker; None without one."""
+    try:
+        return SETTINGS_FILE.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
 def save_settings(settings: Dict[str, Any]) -> bool:
     """Persist settings to disk, returning True on success."""
     SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -277,6 +299,7 @@ def employee_is_ignored(name: str | None, email: str | None, user_principal_name
 
 __all__ = [
     "DEFAULT_SETTINGS",
+    "DIRECTORY_SETTING_KEYS",
     "TOP_LEVEL_USER_EMAIL",
     "TOP_LEVEL_USER_ID",
     "department_is_ignored",
@@ -288,5 +311,6 @@ __all__ = [
     "parse_ignored_employees",
     "parse_ignored_titles",
     "save_settings",
+    "settings_version",
     "translate_placeholder",
 ]
@@ -0,0 +1,588 @@
+"""Data generation tracking for SimpleOrgChart snapshots.
+
+Every sync writes its files into a fresh ``data/generations/<generation>/``
+directory and then swaps ``data_generation.json`` to point at it, so readers
+never observe a half-written file or a mix of two syncs. Requests pin the
+generation that was current when they started (see :func:`pin_generation`);
+superseded directories are removed once they have been retired for longer
+than ``GENERATION_RETENTION_SECONDS`` and no process still pins them. Each
+process holds a shared ``flock`` on a generation's ``.readers`` file while
+any of its requests pin it, so cleanup in one worker sees pins held by the
+others. Without ``fcntl`` only the retention period protects readers.
+
+Each published directory also carries a ``datasets.json`` manifest with a
+SHA-256 fingerprint per file and the generation that first produced that
+content. Datasets a sync reproduces byte-for-byte are hard-linked from the
+previous generation instead of being rewritten and keep their original
+generation (and therefore their ETag); a sync that changes nothing publishes
+nothing.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Dict, Iterator, Optional, Set, Union
+
+import simple_org_chart.config as app_config
+
+try:  # pragma: no cover - fcntl is unavailable on Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_SECONDS = 300
+# Directories that were never published (e.g. a sync that crashed half-way).
+ABANDONED_STAGING_SECONDS = 6 * 60 * 60
+RETIRED_MARKER = ".retired"
+READERS_LOCK = ".readers"
+DATASET_MANIFEST = "datasets.json"
+_MANIFEST_CACHE_SIZE = 16
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+_generation_lock = threading.Lock()
+_generation_cache: dict = {"mtime_ns": None, "generation": None}
+
+_pins = threading.local()
+_pin_lock = threading.Lock()
+_pinned_counts: Counter = Counter()
+# generation -> open ``.readers`` file holding this process's shared lock
+_pin_handles: Dict[str, IO] = {}
+
+_manifest_lock = threading.Lock()
+_manifests: Dict[str, dict] = {}
+# generation being staged -> dataset name -> {"sha256", "generation"}
+_staged: Dict[str, Dict[str, dict]] = {}
+
+
+def new_generation_id() -> str:
+    """Return a sortable, unique identifier for a freshly synced data set."""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return f"{timestamp}-{secrets.token_hex(3)}"
+
+
+def retention_seconds() -> int:
+    """How long a superseded generation is kept for requests still reading it."""
+    raw_value = os.environ.get("GENERATION_RETENTION_SECONDS", "")
+    try:
+        return max(0, int(raw_value)) if raw_value.strip() else DEFAULT_RETENTION_SECONDS
+    except ValueError:
+        logger.warning("Invalid GENERATION_RETENTION_SECONDS '%s'; using %s", raw_value, DEFAULT_RETENTION_SECONDS)
+        return DEFAULT_RETENTION_SECONDS
+
+
+def current_generation() -> Optional[str]:
+    """Return the most recently published data generation, if any."""
+    path = app_config.DATA_GENERATION_FILE
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    with _generation_lock:
+        if _generation_cache["mtime_ns"] == mtime_ns:
+            return _generation_cache["generation"]
+
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+    except Exception as error:  # noqa: BLE001 - treat unreadable markers as missing
+        logger.warning("Unable to read data generation marker %s: %s", path, error)
+        return None
+
+    generation = payload.get("generation") if isinstance(payload, dict) else None
+    with _generation_lock:
+        _generation_cache["mtime_ns"] = mtime_ns
+        _generation_cache["generation"] = generation
+    return generation
+
+
+def generation_dir(generation: str) -> Path:
+    return app_config.GENERATIONS_DIR / generation
+
+
+def pinned_generation() -> Optional[str]:
+    return getattr(_pins, "generation", None)
+
+
+def active_generation() -> Optional[str]:
+    """Generation the current thread reads from: its pin, else the live one."""
+    return pinned_generation() or current_generation()
+
+
+def _hold_readers_lock(generation: str) -> None:
+    # Called with _pin_lock held when this process starts reading generation.
+    if fcntl is None:
+        return
+    try:
+        handle = open(generation_dir(generation) / READERS_LOCK, "a+")
+    except OSError:
+        # Not a published directory (or already removed); nothing to protect.
+        return
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_SH)
+    except OSError as error:
+        logger.warning("Unable to lock data generation %s for reading: %s", generation, error)
+        handle.close()
+        return
+    _pin_handles[generation] = handle
+
+
+def _set_pin(generation: Optional[str]) -> None:
+    with _pin_lock:
+        previous = getattr(_pins, "generation", None)
+        if previous is not None:
+            _pinned_counts[previous] -= 1
+            if _pinned_counts[previous] <= 0:
+                del _pinned_counts[previous]
+                handle = _pin_handles.pop(previous, None)
+                if handle is not None:
+                    handle.close()
+        if generation is not None:
+            _pinned_counts[generation] += 1
+            if _pinned_counts[generation] == 1:
+                _hold_readers_lock(generation)
+        _pins.generation = generation
+
+
+def pin_generation() -> Optional[str]:
+    """Pin the live generation for the rest of this thread's request."""
+    generation = current_generation()
+    _set_pin(generation)
+    return generation
+
+
+def release_generation() -> None:
+    _set_pin(None)
+
+
+def dataset_path(path: PathLike, generation: Optional[str] = None) -> str:
+    """Resolve a dataset constant (e.g. ``DATA_FILE``) to its file in a generation.
+
+    Without ``generation`` the pinned or live generation is used. Before the
+    first sync there is no generation and the legacy flat path is returned.
+    """
+    generation = generation or active_generation()
+    if not generation:
+        return str(path)
+    return str(generation_dir(generation) / Path(path).name)
+
+
+def dataset_fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_fingerprint(path: PathLike) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generation_manifest(generation: Optional[str] = None) -> Dict[str, dict]:
+    """Return ``{dataset name: {"sha256", "generation"}}`` for a published generation.
+
+    Defaults to the active generation. Generations published before manifests
+    existed (and staging directories) return an empty mapping.
+    """
+    generation = generation or active_generation()
+    if not generation:
+        return {}
+    with _manifest_lock:
+        cached = _manifests.get(generation)
+    if cached is not None:
+        return cached
+
+    try:
+        with open(generation_dir(generation) / DATASET_MANIFEST, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle).get("datasets") or {}
+    except FileNotFoundError:
+        return {}
+    except Exception as error:  # noqa: BLE001 - an unreadable manifest only disables reuse
+        logger.warning("Unable to read dataset manifest for generation %s: %s", generation, error)
+        return {}
+
+    # Published generations never change, so their manifests can be kept.
+    with _manifest_lock:
+        if len(_manifests) >= _MANIFEST_CACHE_SIZE:
+            _manifests.clear()
+        _manifests[generation] = manifest
+    return manifest
+
+
+def dataset_generation(path: PathLike) -> Optional[str]:
+    """Generation whose sync last changed ``path``'s content (falls back to the active one)."""
+    entry = generation_manifest().get(Path(path).name)
+    return entry.get("generation") if entry else active_generation()
+
+
+def dataset_etag(path: PathLike) -> Optional[str]:
+    """Content fingerprint of ``path`` in the active generation, if recorded."""
+    entry = generation_manifest().get(Path(path).name)
+    return entry.get("sha256") if entry else None
+
+
+def _staging_generation(path: Path) -> Optional[str]:
+    """Generation ``path`` is being staged into, or None for published/flat paths."""
+    if path.parent.parent != app_config.GENERATIONS_DIR:
+        return None
+    if path.parent.name == current_generation() or (path.parent / DATASET_MANIFEST).exists():
+        return None
+    return path.parent.name
+
+
+def reuse_dataset(path: PathLike, fingerprint: str) -> bool:
+    """Record ``fingerprint`` for the staged file ``path``.
+
+    When the live generation holds identical content, hard-link that file
+    into place and return True so the caller can skip writing it.
+    """
+    path = Path(path)
+    generation = _staging_generation(path)
+    if generation is None:
+        return False
+
+    live = current_generation()
+    entry = generation_manifest(live).get(path.name) if live and live != generation else None
+    reused = False
+    if entry and entry.get("sha256") == fingerprint:
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.link")
+        try:
+            _link_or_copy(generation_dir(live) / path.name, temp_path)
+            os.replace(temp_path, path)
+            reused = True
+        except OSError as error:
+            logger.warning("Unable to reuse %s from generation %s: %s", path.name, live, error)
+
+    with _manifest_lock:
+        _staged.setdefault(generation, {})[path.name] = {
+            "sha256": fingerprint,
+            "generation": entry["generation"] if reused else generation,
+        }
+    return reused
+
+
+def write_dataset(path: PathLike, data: bytes, *, fingerprint: Optional[str] = None) -> bool:
+    """Write ``data`` to ``path`` unless the live generation already has it.
+
+    ``fingerprint`` overrides the content hash for payloads that embed their
+    own generation id. Returns True when the file was actually written.
+    """
+    if reuse_dataset(path, fingerprint or dataset_fingerprint(data)):
+        return False
+    with atomic_write(path, "wb") as handle:
+        handle.write(data)
+    return True
+
+
+class DatasetStream:
+    """Write a dataset in pieces, fingerprinting it on the way.
+
+    Used like :func:`write_dataset` for payloads too large to build in
+    memory: :meth:`commit` either publishes the temporary file or, when the
+    live generation already holds identical content, links that in instead.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        self.path = Path(path)
+        self._temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._handle = open(self._temp_path, "wb")
+        self._digest = hashlib.sha256()
+
+    def write(self, data: bytes) -> None:
+        self._handle.write(data)
+        self._digest.update(data)
+
+    def commit(self) -> bool:
+        """Finish the file; returns True if new content was written."""
+        self._handle.close()
+        if reuse_dataset(self.path, self._digest.hexdigest()):
+            self.discard()
+            return False
+        os.replace(self._temp_path, self.path)
+        return True
+
+    def discard(self) -> None:
+        self._handle.close()
+        try:
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "DatasetStream":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            self.discard()
+
+
+def changed_datasets(generation: str) -> Set[str]:
+    """Names of the datasets staged into ``generation`` with new content so far."""
+    with _manifest_lock:
+        staged = dict(_staged.get(generation) or {})
+    return {name for name, entry in staged.items() if entry["generation"] == generation}
+
+
+@contextmanager
+def atomic_write(path: PathLike, mode: str = "w") -> Iterator[IO]:
+    """Write ``path`` via a temporary file so readers never see it half-written."""
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, mode) as handle:
+            yield handle
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def begin_generation(generation: Optional[str] = None) -> str:
+    """Create the staging directory a sync writes its files into."""
+    generation = generation or new_generation_id()
+    generation_dir(generation).mkdir(parents=True, exist_ok=True)
+    return generation
+
+
+@contextmanager
+def _generations_lock() -> Iterator[None]:
+    """Serialize publish and cleanup across processes where ``fcntl`` exists."""
+    app_config.GENERATIONS_DIR.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(app_config.GENERATIONS_DIR / ".lock", "a+") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _carry_over(previous: Optional[str], generation: str) -> Set[str]:
+    """Reuse datasets this sync did not produce from the previous generation."""
+    carried: Set[str] = set()
+    if not previous or previous == generation:
+        return carried
+    source_dir = generation_dir(previous)
+    target_dir = generation_dir(generation)
+    # Mixing hierarchy files from two builds (e.g. a fresh JSON tree next to
+    # an old binary snapshot) would serve inconsistent data.
+    rebuilt_hierarchy = any((target_dir / dataset.name).exists() for dataset in app_config.HIERARCHY_DATASETS)
+    for dataset in app_config.GENERATION_DATASETS:
+        source = source_dir / dataset.name
+        target = target_dir / dataset.name
+        if target.exists() or not source.exists():
+            continue
+        if rebuilt_hierarchy and dataset in app_config.HIERARCHY_DATASETS:
+            continue
+        try:
+            _link_or_copy(source, target)
+            carried.add(dataset.name)
+        except OSError as error:
+            logger.warning("Unable to carry %s over from generation %s: %s", dataset.name, previous, error)
+    return carried
+
+
+def _build_manifest(previous: Optional[str], generation: str, carried: Set[str]) -> Dict[str, dict]:
+    previous_manifest = generation_manifest(previous) if previous else {}
+    with _manifest_lock:
+        staged = _staged.pop(generation, {})
+
+    manifest: Dict[str, dict] = {}
+    for dataset in app_config.GENERATION_DATASETS:
+        path = generation_dir(generation) / dataset.name
+        if not path.exists():
+            continue
+        entry = staged.get(dataset.name)
+        if entry is None and dataset.name in carried:
+            entry = previous_manifest.get(dataset.name) or {
+                "sha256": file_fingerprint(path),
+                "generation": previous,
+            }
+        if entry is None:
+            # Written without write_dataset (e.g. legacy migration): hash what is on disk.
+            fingerprint = file_fingerprint(path)
+            previous_entry = previous_manifest.get(dataset.name)
+            if previous_entry and previous_entry.get("sha256") == fingerprint:
+                entry = dict(previous_entry)
+            else:
+                entry = {"sha256": fingerprint, "generation": generation}
+        manifest[dataset.name] = entry
+    return manifest
+
+
+def _write_manifest(generation: str, manifest: Dict[str, dict]) -> None:
+    with atomic_write(generation_dir(generation) / DATASET_MANIFEST, "w") as handle:
+        json.dump({"generation": generation, "datasets": manifest}, handle, indent=2, sort_keys=True)
+
+
+def _write_pointer(generation: str) -> None:
+    path = app_config.DATA_GENERATION_FILE
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    payload = {
+        "generation": generation,
+        "publishedAt": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+def publish_generation(generation: Optional[str] = None) -> str:
+    """Atomically make ``generation`` the current data generation.
+
+    Files missing from the new directory are hard-linked from the previous
+    generation, the pointer file is swapped with ``os.replace`` and the
+    previous directory is marked as retired for later cleanup. If every
+    dataset matches the previous generation the staging directory is dropped
+    and the previous generation stays live. Returns the live generation.
+    """
+    generation = begin_generation(generation)
+    with _generations_lock():
+        previous = current_generation()
+        carried = _carry_over(previous, generation)
+        manifest = _build_manifest(previous, generation, carried)
+        if previous and previous != generation and manifest and manifest == generation_manifest(previous):
+            shutil.rmtree(generation_dir(generation), ignore_errors=True)
+            logger.info("No datasets changed; data generation %s stays live", previous)
+            return previous
+        _write_manifest(generation, manifest)
+        _write_pointer(generation)
+        if previous and previous != generation and generation_dir(previous).is_dir():
+            (generation_dir(previous) / RETIRED_MARKER).touch()
+    changed = sorted(name for name, entry in manifest.items() if entry.get("generation") == generation)
+    logger.info(
+        "Published data generation %s; changed datasets: %s",
+        generation,
+        ", ".join(changed) if changed else "none",
+    )
+
+    # A request that triggered the sync should see what it just produced.
+    if pinned_generation() is not None:
+        _set_pin(generation)
+    cleanup_generations()
+    return generation
+
+
+def cleanup_generations() -> int:
+    """Delete expired retired generations no process still pins; return the count."""
+    root = app_config.GENERATIONS_DIR
+    if not root.is_dir():
+        return 0
+
+    now = time.time()
+    retention = retention_seconds()
+    removed = 0
+    with _generations_lock():
+        live = current_generation()
+        with _pin_lock:
+            pinned = set(_pinned_counts)
+        for entry in root.iterdir():
+            if not entry.is_dir() or entry.name in (live, *pinned):
+                continue
+            marker = entry / RETIRED_MARKER
+            try:
+                if marker.exists():
+                    expired = now - marker.stat().st_mtime >= retention
+                else:
+                    expired = now - entry.stat().st_mtime >= ABANDONED_STAGING_SECONDS
+            except OSError:
+                continue
+            if not expired or _pinned_elsewhere(entry):
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+            logger.info("Removed data generation %s", entry.name)
+    return removed
+
+
+def _pinned_elsewhere(directory: Path) -> bool:
+    """True while another process holds its shared lock on ``directory``."""
+    if fcntl is None:
+        return False
+    try:
+        with open(directory / READERS_LOCK, "rb") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        # No reader ever locked it.
+        return False
+    return False
+
+
+def migrate_legacy_layout() -> Optional[str]:
+    """Move flat ``data/*.json`` caches from older releases into a generation."""
+    legacy = [path for path in app_config.GENERATION_DATASETS if path.is_file()]
+    generation = current_generation()
+    if generation and generation_dir(generation).is_dir():
+        return generation
+    if not legacy:
+        return generation
+
+    generation = begin_generation(generation)
+    target_dir = generation_dir(generation)
+    for path in legacy:
+        try:
+            os.replace(path, target_dir / path.name)
+        except OSError as error:
+            logger.warning("Unable to move legacy cache %s into generation %s: %s", path, generation, error)
+    logger.info("Moved %d legacy cache files into data generation %s", len(legacy), generation)
+    return publish_generation(generation)
+
+
+__all__ = [
+    "DatasetStream",
+    "active_generation",
+    "atomic_write",
+    "begin_generation",
+    "changed_datasets",
+    "cleanup_generations",
+    "current_generation",
+    "dataset_etag",
+    "dataset_fingerprint",
+    "dataset_generation",
+    "dataset_path",
+    "file_fingerprint",
+    "generation_dir",
+    "generation_manifest",
+    "migrate_legacy_layout",
+    "new_generation_id",
+    "pin_generation",
+    "pinned_generation",
+    "publish_generation",
+    "release_generation",
+    "retention_seconds",
+    "reuse_dataset",
+    "write_dataset",
+]
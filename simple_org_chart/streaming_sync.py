@@ -0,0 +1,358 @@
+"""Bounded-memory building blocks for syncing very large tenants.
+
+With ``STREAMING_SYNC=true`` a sync spools transformed users to NDJSON files
+as Graph pages arrive instead of collecting them in lists. The reporting tree
+is then derived from compact id/parent integer arrays and every cache is
+written by streaming records back from the spool, so peak memory holds only
+those arrays plus one record at a time rather than several copies of the
+tenant.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sys
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import simple_org_chart.json_codec as json_codec
+from simple_org_chart.org_index import OrgIntervalIndex
+from simple_org_chart.snapshots import DatasetStream
+
+logger = logging.getLogger(__name__)
+
+ROOT_TITLE_KEYWORDS = ("chief executive", "ceo", "president", "chair", "director", "head")
+_EMPTY_CHILDREN = b'"children":[]'
+
+
+def streaming_sync_enabled() -> bool:
+    return os.environ.get("STREAMING_SYNC", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class RecordSpool:
+    """Append-only NDJSON file of records, readable in order or by row."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._writer = open(path, "wb")
+        self._reader = None
+        self.offsets = array("Q")
+        self._size = 0
+
+    def append(self, record: dict) -> None:
+        line = json_codec.dumps(record) + b"\n"
+        self.offsets.append(self._size)
+        self._writer.write(line)
+        self._size += len(line)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[dict]:
+        self._writer.flush()
+        with open(self.path, "rb") as handle:
+            for line in handle:
+                yield json_codec.loads(line)
+
+    def __getitem__(self, row: int) -> dict:
+        self._writer.flush()
+        if self._reader is None:
+            self._reader = open(self.path, "rb")
+        self._reader.seek(self.offsets[row])
+        return json_codec.loads(self._reader.readline())
+
+    def where(self, predicate: Callable[[dict], bool]) -> "SpoolView":
+        return SpoolView(self, predicate)
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SpoolView:
+    """Re-iterable filtered view over a spool (e.g. licensed filtered users)."""
+
+    def __init__(self, spool: RecordSpool, predicate: Callable[[dict], bool]) -> None:
+        self._spool = spool
+        self._predicate = predicate
+
+    def __iter__(self) -> Iterator[dict]:
+        return (record for record in self._spool if self._predicate(record))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class SpoolOrder:
+    """Re-iterable view over a spool in a given row order (e.g. sorted)."""
+
+    def __init__(self, spool: RecordSpool, rows: Iterable[int]) -> None:
+        self._spool = spool
+        self._rows = array("I", rows)
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self._spool[row] for row in self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmployeeSpool(RecordSpool):
+    """Spool that also keeps each employee's id and manager id in memory."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.ids: List[str] = []
+        self.manager_ids: List[Optional[str]] = []
+
+    def append(self, record: dict) -> None:
+        super().append(record)
+        self.ids.append(sys.intern(str(record.get("id") or "")))
+        manager_id = record.get("managerId")
+        self.manager_ids.append(sys.intern(str(manager_id)) if manager_id else None)
+
+
+class RecordLookup:
+    """Read-only ``id -> record`` mapping over one or more spools.
+
+    Stands in for the ``{id: record}`` dictionaries the in-memory sync builds;
+    only the row numbers are held in memory.
+    """
+
+    def __init__(self, *spools: RecordSpool) -> None:
+        self._spools = spools
+        self._rows: Dict[str, tuple] = {}
+        for spool_number, spool in enumerate(spools):
+            ids = spool.ids if isinstance(spool, EmployeeSpool) else (str(record.get("id") or "") for record in spool)
+            for row, employee_id in enumerate(ids):
+                if employee_id:
+                    self._rows[sys.intern(employee_id)] = (spool_number, row)
+
+    def __contains__(self, employee_id) -> bool:
+        return employee_id in self._rows
+
+    def __getitem__(self, employee_id) -> dict:
+        spool_number, row = self._rows[employee_id]
+        return self._spools[spool_number][row]
+
+    def get(self, employee_id, default=None):
+        return self[employee_id] if employee_id in self._rows else default
+
+
+class CompactHierarchy:
+    """Reporting tree over an :class:`EmployeeSpool`, stored as arrays.
+
+    ``rows[i]`` is the spool row of the ``i``-th employee in pre-order, the
+    same order :class:`OrgIntervalIndex` uses, so ``node(i)`` rebuilds the
+    flat record a nested tree would hold at that position.
+    """
+
+    def __init__(
+        self,
+        spool: EmployeeSpool,
+        rows: array,
+        index: OrgIntervalIndex,
+        *,
+        clear_root_manager: bool,
+        decorate: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        self.spool = spool
+        self.rows = rows
+        self.index = index
+        self._clear_root_manager = clear_root_manager
+        self._decorate = decorate
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def root_id(self) -> str:
+        return self.index.ids[0]
+
+    def node(self, position: int) -> dict:
+        record = self.spool[self.rows[position]]
+        record["children"] = []
+        if position == 0 and self._clear_root_manager:
+            record["managerId"] = None
+        if self._decorate is not None:
+            self._decorate(record)
+        return record
+
+    def nodes(self) -> Iterator[dict]:
+        return (self.node(position) for position in range(len(self.rows)))
+
+    def iter_json(self) -> Iterator[bytes]:
+        """Encode the nested tree without materializing it.
+
+        Each node is encoded with an empty ``children`` list that is split
+        open in place, so the output matches encoding the nested dicts.
+        """
+        exits = self.index.exits
+        open_nodes: List[list] = []
+        for position in range(len(self.rows)):
+            while open_nodes and position > exits[open_nodes[-1][0]]:
+                yield open_nodes.pop()[2]
+            if open_nodes:
+                if open_nodes[-1][1]:
+                    yield b","
+                open_nodes[-1][1] = True
+            body = json_codec.dumps(self.node(position))
+            split = body.find(_EMPTY_CHILDREN) + len(_EMPTY_CHILDREN) - 1
+            yield body[:split]
+            open_nodes.append([position, False, body[split:]])
+        while open_nodes:
+            yield open_nodes.pop()[2]
+
+
+def build_compact_hierarchy(
+    spool: EmployeeSpool,
+    *,
+    top_user_email: Optional[str] = None,
+    top_user_id: Optional[str] = None,
+    decorate: Optional[Callable[[dict], None]] = None,
+) -> Optional[CompactHierarchy]:
+    """Pick the root and link managers exactly as ``build_org_hierarchy`` does."""
+    count = len(spool.ids)
+    if not count:
+        return None
+
+    row_of: Dict[str, int] = {}
+    for row, employee_id in enumerate(spool.ids):
+        row_of[employee_id] = row
+    canonical = [row for row, employee_id in enumerate(spool.ids) if row_of[employee_id] == row]
+
+    root: Optional[int] = None
+    if top_user_email:
+        for row, record in enumerate(spool):
+            if record.get("email") == top_user_email:
+                root = row_of[spool.ids[row]]
+                logger.info("Found and using configured top-level user by email: %s", record.get("name"))
+                break
+        else:
+            logger.warning("Could not find user with email '%s' in employee list", top_user_email)
+    if root is None and top_user_id and top_user_id in row_of:
+        root = row_of[top_user_id]
+    configured = root is not None
+
+    parents = array("i", [-1]) * count
+    for row in canonical:
+        if configured and row == root:
+            continue
+        manager_id = spool.manager_ids[row]
+        if manager_id and manager_id in row_of:
+            parents[row] = row_of[manager_id]
+
+    if not configured:
+        candidates = [row for row in canonical if not spool.manager_ids[row]]
+        for row in candidates:
+            title = (spool[row].get("title") or "").lower()
+            if any(keyword in title for keyword in ROOT_TITLE_KEYWORDS):
+                root = row
+                break
+        if root is None and candidates:
+            root = candidates[0]
+        if root is None:
+            report_counts = array("I", [0]) * count
+            for row in canonical:
+                if parents[row] >= 0:
+                    report_counts[parents[row]] += 1
+            most = 0
+            for row in canonical:
+                if report_counts[row] > most:
+                    most, root = report_counts[row], row
+        if root is None:
+            root = row_of[spool.ids[0]]
+        logger.info("Auto-detected top-level user: %s", spool[root].get("name"))
+
+    # Children in spool order (compressed sparse rows), as the dict-based build appends them.
+    child_counts = array("I", [0]) * (count + 1)
+    for row in canonical:
+        if parents[row] >= 0:
+            child_counts[parents[row] + 1] += 1
+    for row in range(count):
+        child_counts[row + 1] += child_counts[row]
+    child_rows = array("i", [0]) * child_counts[count]
+    fill = array("I", child_counts[:count])
+    for row in canonical:
+        parent = parents[row]
+        if parent >= 0:
+            child_rows[fill[parent]] = row
+            fill[parent] += 1
+    del fill
+
+    rows = array("i")
+    ids: List[str] = []
+    tree_parents: List[int] = []
+    exits: List[int] = []
+    depths: List[int] = []
+    seen = bytearray(count)
+    stack = [(root, -1, 0, False)]
+    while stack:
+        row, parent_position, depth, leaving = stack.pop()
+        if leaving:
+            exits[parent_position] = len(ids) - 1
+            continue
+        if seen[row]:
+            continue
+        seen[row] = 1
+        position = len(ids)
+        rows.append(row)
+        ids.append(spool.ids[row])
+        tree_parents.append(parent_position)
+        exits.append(position)
+        depths.append(depth)
+        stack.append((row, position, depth, True))
+        children = child_rows[child_counts[row]:child_counts[row + 1]]
+        stack.extend((child, position, depth + 1, False) for child in reversed(children))
+
+    return CompactHierarchy(
+        spool,
+        rows,
+        OrgIntervalIndex(ids, tree_parents, exits, depths),
+        clear_root_manager=configured,
+        decorate=decorate,
+    )
+
+
+def iter_json_array(records: Iterable[dict]) -> Iterator[bytes]:
+    """Encode ``records`` as a JSON array one element at a time."""
+    yield b"["
+    first = True
+    for record in records:
+        if not first:
+            yield b","
+        first = False
+        yield json_codec.dumps(record)
+    yield b"]"
+
+
+def write_streamed_dataset(path: str, chunks: Iterable[bytes]) -> bool:
+    """Stream ``chunks`` into a staged dataset; returns True if the content changed."""
+    with DatasetStream(path) as stream:
+        for chunk in chunks:
+            stream.write(chunk)
+        return stream.commit()
+
+
+__all__ = [
+    "CompactHierarchy",
+    "EmployeeSpool",
+    "RecordLookup",
+    "RecordSpool",
+    "SpoolOrder",
+    "SpoolView",
+    "build_compact_hierarchy",
+    "iter_json_array",
+    "streaming_sync_enabled",
+    "write_streamed_dataset",
+]
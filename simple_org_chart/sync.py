@@ -0,0 +1,95 @@
+"""Dedicated sync worker: ``python -m simple_org_chart.sync``.
+
+Runs the scheduler and every directory sync in its own process (or
+container), away from the web workers, whose request threads would otherwise
+share the GIL with the CPU-heavy stages of a sync. Syncs publish data
+generations as usual; web workers pick each one up on their next request.
+
+Start the web tier with ``WEB_SYNC_ENABLED=false`` so it never syncs on its
+own. Syncs it needs (**Update Now**, a missing cache, a settings re-derive)
+are then written to ``data/sync_requests/`` and claimed here. With ``--once`` a single sync runs
+and the exit status tells whether it succeeded, for use from cron. The worker
+imports only :mod:`simple_org_chart.directory_sync`, never the web app, so it
+needs the Graph credentials but not ``ADMIN_PASSWORD`` or ``SECRET_KEY``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from simple_org_chart.sync_jobs import SYNC_SCOPES
+
+logger = logging.getLogger(__name__)
+
+REQUEST_POLL_SECONDS = 1.0
+
+
+def run_once(scopes: Optional[List[str]] = None) -> int:
+    """Run one sync now and return the process exit status."""
+    from simple_org_chart.directory_sync import sync_jobs
+
+    sync_jobs.delegate = False
+    job = sync_jobs.run("command line", scopes=scopes)
+    if job.succeeded:
+        logger.info("Sync %s finished (%s)", job.id, job.state)
+        return 0
+    logger.error("Sync %s ended %s: %s", job.id, job.state, job.error)
+    return 1
+
+
+def serve(stop: threading.Event) -> int:
+    """Run scheduled and delegated syncs until ``stop`` is set."""
+    from simple_org_chart.directory_sync import sync_jobs as manager
+    from simple_org_chart.scheduler import start_scheduler, stop_scheduler
+
+    manager.delegate = False
+    start_scheduler()
+    logger.info("Sync worker started; watching %s for requests", manager.status_path.parent)
+    try:
+        while not stop.wait(REQUEST_POLL_SECONDS):
+            for job in manager.claim_requests():
+                logger.info("Claimed delegated %s request (%s) as job %s", job.kind, job.reason, job.id)
+    finally:
+        # A running sync stops at its next stage; nothing it staged is published.
+        manager.cancel()
+        stop_scheduler()
+        logger.info("Sync worker stopped")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m simple_org_chart.sync",
+        description="Run the scheduler and directory syncs outside the web workers.",
+    )
+    parser.add_argument("--once", action="store_true", help="run one sync now and exit")
+    parser.add_argument(
+        "--scope",
+        action="append",
+        choices=SYNC_SCOPES,
+        help="with --once, refresh only this part of the data (repeatable; default: everything)",
+    )
+    args = parser.parse_args(argv)
+    if args.scope and not args.once:
+        parser.error("--scope requires --once")
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        return run_once(args.scope)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    return serve(stop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,709 @@
+"""Single-flight management of directory sync jobs.
+
+The scheduler, the admin endpoints and pages that find their cache missing all
+ask :class:`SyncJobManager` for a sync instead of calling the sync function
+directly. At most one job runs per process; requests arriving meanwhile are
+coalesced into one queued follow-up job (or, when they only need *some* data,
+attached to the running job). Across processes the running job holds an
+``flock`` on ``data/.sync.lock`` and publishes its progress to
+``data/sync_status.json``, so every worker reports the same status and a job
+that waited for another worker's sync is skipped when that sync started after
+it was requested.
+
+A job may cover only some :data:`SYNC_SCOPES`; its stages for the other
+scopes are skipped and their datasets carried over from the live generation.
+Merged requests cover the union of what was asked for.
+
+Re-deriving the directory data from the last crawl after a settings change is
+a job too (``kind="rederive"``), so it takes the same lock and never races a
+sync's publish. A sync covering the directory makes a pending re-derive
+unnecessary: the two merge into that sync.
+
+Syncs report progress and honour cancellation by calling :func:`sync_stage`
+between stages. While a job runs its Graph page and record counts are
+republished every second, so :meth:`SyncJobManager.job_status` in any worker
+can follow it.
+
+With ``WEB_SYNC_ENABLED=false`` the web workers never sync themselves: their
+manager *delegates*, writing each request to ``data/sync_requests/`` for the
+sync worker (``python -m simple_org_chart.sync``), which claims the requests,
+runs them as its own jobs under the request ids and publishes their progress
+to the same status file.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from simple_org_chart.snapshots import atomic_write
+from simple_org_chart.sync_metrics import live_progress
+
+try:  # pragma: no cover - fcntl is unavailable on Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Parts of the data a sync can refresh on its own.
+SYNC_SCOPES = ("directory", "signIns", "disabled")
+FINISHED_STATES = frozenset({"succeeded", "failed", "cancelled", "coalesced"})
+DEFAULT_STREAM_SECONDS = 25
+DEFAULT_WAIT_SECONDS = 20
+PROGRESS_PUBLISH_SECONDS = 1.0
+RECENT_JOBS = 20
+DELEGATED_POLL_SECONDS = 1.0
+JOB_KINDS = ("sync", "rederive")
+REDERIVE_STAGES = ("rederive",)
+
+
+def progress_stream_seconds() -> int:
+    """How long one progress event stream stays open (``SYNC_STREAM_SECONDS``).
+
+    Keep it below gunicorn's worker ``timeout``; clients reconnect.
+    """
+    raw_value = os.environ.get("SYNC_STREAM_SECONDS", "")
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_STREAM_SECONDS
+    except ValueError:
+        logger.warning("Invalid SYNC_STREAM_SECONDS '%s'; using %s", raw_value, DEFAULT_STREAM_SECONDS)
+        return DEFAULT_STREAM_SECONDS
+
+
+def sync_wait_seconds() -> int:
+    """How long a request waits for a sync it needs (``SYNC_WAIT_SECONDS``).
+
+    Keep it below gunicorn's worker ``timeout``; the sync carries on after the
+    request gives up waiting.
+    """
+    raw_value = os.environ.get("SYNC_WAIT_SECONDS", "")
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_WAIT_SECONDS
+    except ValueError:
+        logger.warning("Invalid SYNC_WAIT_SECONDS '%s'; using %s", raw_value, DEFAULT_WAIT_SECONDS)
+        return DEFAULT_WAIT_SECONDS
+
+
+def web_sync_enabled() -> bool:
+    """Whether web workers run syncs themselves (``WEB_SYNC_ENABLED``, default true).
+
+    Turn it off when a separate sync worker process runs the syncs.
+    """
+    return os.environ.get("WEB_SYNC_ENABLED", "").strip().lower() not in {"0", "false", "no", "off"}
+
+
+class SyncCancelled(Exception):
+    """Raised from :func:`sync_stage` when the running job was cancelled."""
+
+
+def _merge_scopes(first: Optional[FrozenSet[str]], second: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    if first is None or second is None:
+        return None
+    return first | second
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+class SyncJob:
+    """One requested sync and its progress."""
+
+    def __init__(
+        self,
+        reason: str,
+        scopes: Optional[Iterable[str]] = None,
+        *,
+        job_id: Optional[str] = None,
+        kind: str = "sync",
+    ) -> None:
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.reason = reason
+        self.kind = kind
+        # None refreshes everything.
+        self.scopes: Optional[FrozenSet[str]] = frozenset(scopes) if scopes else None
+        self.requests = 1
+        # Ids of delegated requests this job satisfies; they resolve to it in job_status.
+        self.request_ids: List[str] = [job_id] if job_id else []
+        self.state = "queued"
+        self.stage: Optional[str] = None
+        self.running: List[str] = []
+        self.completed: List[str] = []
+        self.requested_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.counts = {"graphRequests": 0, "graphPages": 0, "records": 0}
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether fresh data is available: the job ran, or a sync it waited for did."""
+        return self.state in {"succeeded", "coalesced"}
+
+    def covers(self, scopes: Optional[FrozenSet[str]]) -> bool:
+        return self.scopes is None or (scopes is not None and scopes <= self.scopes)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round(self.finished_at - self.started_at, 3)
+
+    def refresh_counts(self) -> None:
+        self.counts = live_progress(self.id) or self.counts
+
+    def to_dict(self, steps: int) -> dict:
+        return {
+            "id": self.id,
+            "reason": self.reason,
+            "kind": self.kind,
+            "scopes": sorted(self.scopes) if self.scopes is not None else None,
+            "state": self.state,
+            "stage": self.stage,
+            "running": list(self.running),
+            "completed": list(self.completed),
+            "step": len(self.completed),
+            "steps": steps,
+            "progress": round(len(self.completed) / steps, 3) if steps else None,
+            **self.counts,
+            "requests": self.requests,
+            "requestIds": list(self.request_ids),
+            "requestedAt": _timestamp(self.requested_at),
+            "startedAt": _timestamp(self.started_at),
+            "finishedAt": _timestamp(self.finished_at),
+            "durationSeconds": self.duration,
+            "error": self.error,
+            "pid": os.getpid(),
+        }
+
+
+class DelegatedSyncJob(SyncJob):
+    """A sync requested from the sync worker; its state is read back from the shared status."""
+
+    def __init__(
+        self, manager: "SyncJobManager", reason: str, scopes: Optional[Iterable[str]] = None, *, kind: str = "sync"
+    ) -> None:
+        super().__init__(reason, scopes, kind=kind)
+        self._manager = manager
+
+    @property
+    def done(self) -> bool:
+        return self.wait(0)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._done.is_set():
+            record = self._manager.job_status(self.id)
+            if record is not None:
+                self.state = record.get("state") or self.state
+                self.error = record.get("error")
+                if self.state in FINISHED_STATES:
+                    self._done.set()
+                    break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            time.sleep(DELEGATED_POLL_SECONDS if remaining is None else min(DELEGATED_POLL_SECONDS, remaining))
+        return True
+
+
+class SyncJobManager:
+    """Run ``runner`` (or ``rederive`` for re-derive jobs) as background jobs, one at a time.
+
+    A manager created with ``delegate=True`` runs nothing itself and hands
+    every request to the sync worker instead.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[], None],
+        *,
+        stages: Sequence[str],
+        status_path: Path,
+        scope_stages: Optional[Mapping[str, Sequence[str]]] = None,
+        delegate: bool = False,
+        rederive: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self._runner = runner
+        self._rederive = rederive
+        self.delegate = delegate
+        self.stages = tuple(stages)
+        self.scope_stages = dict(scope_stages or {})
+        self.status_path = Path(status_path)
+        self._lock_path = self.status_path.with_name(".sync.lock")
+        self._cancel_path = self.status_path.with_name(".sync_cancel")
+        self._requests_dir = self.status_path.with_name("sync_requests")
+        self._lock = threading.Lock()
+        self._current: Optional[SyncJob] = None
+        self._queued: Optional[SyncJob] = None
+        self._last: Optional[SyncJob] = None
+        self._recent: "OrderedDict[str, SyncJob]" = OrderedDict()
+        self._publish_lock = threading.Lock()
+
+    # -- requesting -------------------------------------------------------
+
+    def request(
+        self,
+        reason: str,
+        *,
+        fresh: bool = True,
+        scopes: Optional[Iterable[str]] = None,
+        request_id: Optional[str] = None,
+        kind: str = "sync",
+    ) -> SyncJob:
+        """Ask for a sync of ``scopes`` (None for all) and return the job that will satisfy it.
+
+        With ``fresh=False`` a running job covering the scopes is good enough;
+        otherwise the request joins the queued follow-up job, creating it if
+        needed. ``request_id`` names a delegated request the job satisfies.
+        ``kind="rederive"`` asks for a re-derive of the directory data instead.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown sync job kind '{kind}'")
+        scopes = frozenset(scopes) if scopes else None
+        if kind == "rederive":
+            scopes = frozenset({"directory"})
+        if self.delegate:
+            return self._delegate(reason, fresh, scopes, kind)
+        with self._lock:
+            current = self._current
+            if current is not None and not fresh and current.kind == kind and current.covers(scopes):
+                current.requests += 1
+                if request_id:
+                    current.request_ids.append(request_id)
+                return current
+            if self._queued is not None:
+                self._queued.requests += 1
+                self._queued.scopes = _merge_scopes(self._queued.scopes, scopes)
+                if self._queued.kind != kind:
+                    # A sync of the directory re-derives it with the saved settings anyway.
+                    self._queued.kind = "sync"
+                if request_id:
+                    self._queued.request_ids.append(request_id)
+                return self._queued
+            job = SyncJob(reason, scopes, job_id=request_id, kind=kind)
+            if self._current is None:
+                self._current = job
+                threading.Thread(target=self._work, args=(job,), name=f"sync-{job.id}", daemon=True).start()
+            else:
+                self._queued = job
+                logger.info("Sync requested (%s) while job %s runs; queued as %s", reason, self._current.id, job.id)
+            return job
+
+    def run(
+        self,
+        reason: str,
+        *,
+        fresh: bool = True,
+        scopes: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> SyncJob:
+        """Request a sync and wait for it to finish."""
+        job = self.request(reason, fresh=fresh, scopes=scopes)
+        job.wait(timeout)
+        return job
+
+    def _delegate(self, reason: str, fresh: bool, scopes: Optional[FrozenSet[str]], kind: str) -> SyncJob:
+        job = DelegatedSyncJob(self, reason, scopes, kind=kind)
+        entry = {
+            "id": job.id,
+            "reason": reason,
+            "kind": kind,
+            "fresh": fresh,
+            "scopes": sorted(scopes) if scopes is not None else None,
+            "requestedAt": _timestamp(job.requested_at),
+        }
+        try:
+            self._requests_dir.mkdir(parents=True, exist_ok=True)
+            with atomic_write(self._requests_dir / f"{job.id}.json", "w") as handle:
+                json.dump(entry, handle)
+        except OSError as error:
+            job.state = "failed"
+            job.error = f"Unable to hand the sync to the sync worker: {error}"
+            job.finished_at = time.time()
+            job._done.set()
+            logger.error("Unable to request sync (%s): %s", reason, error)
+            return job
+        logger.info("Sync requested (%s); handed to the sync worker as %s", reason, job.id)
+        return job
+
+    def _pending_request(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._requests_dir / f"{os.path.basename(job_id)}.json", "r", encoding="utf-8") as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) else None
+
+    def claim_requests(self) -> List[SyncJob]:
+        """Run the syncs web workers delegated to this process; returns the jobs they joined."""
+        try:
+            paths = sorted(self._requests_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        except OSError:
+            return []
+        jobs = []
+        for path in paths:
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    entry = json.load(handle)
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as error:
+                logger.warning("Dropping unreadable sync request %s: %s", path.name, error)
+                path.unlink(missing_ok=True)
+                continue
+            scopes = [scope for scope in entry.get("scopes") or [] if scope in SYNC_SCOPES]
+            kind = entry.get("kind") if entry.get("kind") in JOB_KINDS else "sync"
+            jobs.append(self.request(
+                entry.get("reason") or "delegated request",
+                fresh=entry.get("fresh", True) is not False,
+                scopes=scopes or None,
+                request_id=path.stem,
+                kind=kind,
+            ))
+        return jobs
+
+    def cancel(self, job_id: Optional[str] = None) -> bool:
+        """Cancel the queued and running job (or only ``job_id``); True if any was signalled."""
+        signalled = False
+        with self._lock:
+            queued = self._queued
+            if queued is not None and job_id in (None, queued.id):
+                self._queued = None
+                queued.state = "cancelled"
+                queued.finished_at = time.time()
+                queued._cancel.set()
+                queued._done.set()
+                signalled = True
+            current = self._current
+            if current is not None and job_id in (None, current.id) and current.state in {"queued", "waiting", "running"}:
+                current._cancel.set()
+                signalled = True
+        shared = self._shared_current()
+        if shared and shared.get("pid") != os.getpid() and job_id in (None, shared.get("id"), *(shared.get("requestIds") or [])):
+            # The sync runs in another worker; it checks this marker between stages.
+            try:
+                with atomic_write(self._cancel_path, "w") as handle:
+                    handle.write(str(shared.get("id")))
+                signalled = True
+            except OSError as error:
+                logger.warning("Unable to request cancellation of sync %s: %s", shared.get("id"), error)
+        return signalled
+
+    # -- running ----------------------------------------------------------
+
+    def _work(self, job: Optional[SyncJob]) -> None:
+        while job is not None:
+            self._execute(job)
+            with self._lock:
+                if job.state != "coalesced":
+                    self._last = job
+                self._recent[job.id] = job
+                while len(self._recent) > RECENT_JOBS:
+                    self._recent.popitem(last=False)
+                finished, job, self._queued = job, self._queued, None
+                self._current = job
+            # Waiters are released once the job is no longer reported as current.
+            finished._done.set()
+
+    def _execute(self, job: SyncJob) -> None:
+        _local.job, _local.manager = job, self
+        try:
+            with self._sync_lock(job):
+                if self._satisfied_elsewhere(job):
+                    job.state = "coalesced"
+                    logger.info("Sync job %s (%s) satisfied by a sync in another worker", job.id, job.reason)
+                    return
+                job.state = "running"
+                job.started_at = time.time()
+                logger.info("Sync job %s started (%s)", job.id, job.reason)
+                self._publish(job)
+                stop_reporting = threading.Event()
+                reporter = threading.Thread(
+                    target=self._report_progress, args=(job, stop_reporting), name=f"sync-progress-{job.id}", daemon=True
+                )
+                reporter.start()
+                try:
+                    if job.kind == "rederive":
+                        if self._rederive is None:
+                            raise RuntimeError("This process cannot re-derive directory data")
+                        self._rederive()
+                    else:
+                        self._runner()
+                    job.state = "succeeded"
+                except SyncCancelled:
+                    job.state = "cancelled"
+                    logger.info("Sync job %s cancelled during %s", job.id, job.stage)
+                except Exception as error:  # noqa: BLE001 - recorded for the status endpoint
+                    job.state = "failed"
+                    job.error = str(error) or type(error).__name__
+                    logger.error("Sync job %s failed: %s", job.id, job.error)
+                finally:
+                    stop_reporting.set()
+                    reporter.join()
+                job.finished_at = time.time()
+                self._publish(job, finished=True)
+                if job.state == "succeeded":
+                    logger.info("Sync job %s finished in %.2fs", job.id, job.duration)
+        except SyncCancelled:
+            job.state = "cancelled"
+        finally:
+            if job.finished_at is None:
+                job.finished_at = time.time()
+            _local.job = _local.manager = None
+
+    @contextmanager
+    def _sync_lock(self, job: SyncJob) -> Iterator[None]:
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a+") as handle:
+            while True:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if job.state != "waiting":
+                        job.state = "waiting"
+                        logger.info("Sync job %s waiting for a sync in another worker", job.id)
+                    if job._cancel.wait(1):
+                        raise SyncCancelled()
+            try:
+                self._clear_cancel_marker()
+                yield
+            finally:
+                self._clear_cancel_marker()
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _report_progress(self, job: SyncJob, stop: threading.Event) -> None:
+        # Stages publish when they start and finish; this keeps the page and record counts moving in between.
+        while not stop.wait(PROGRESS_PUBLISH_SECONDS):
+            job.refresh_counts()
+            self._publish(job)
+
+    def _clear_cancel_marker(self) -> None:
+        try:
+            os.remove(self._cancel_path)
+        except OSError:
+            pass
+
+    def _satisfied_elsewhere(self, job: SyncJob) -> bool:
+        last = self._read_shared().get("lastRun") or {}
+        if last.get("state") != "succeeded" or last.get("pid") == os.getpid() or not last.get("startedAt"):
+            return False
+        # A re-derive is satisfied by either kind; a sync only by a sync.
+        if job.kind == "sync" and last.get("kind", "sync") != "sync":
+            return False
+        if last.get("scopes") is not None and not (job.scopes is not None and job.scopes <= set(last["scopes"])):
+            return False
+        try:
+            started = datetime.fromisoformat(last["startedAt"]).timestamp()
+        except ValueError:
+            return False
+        return started >= job.requested_at
+
+    def stages_for(self, job: SyncJob) -> List[str]:
+        """The stages ``job`` runs, given its kind and scopes."""
+        if job.kind == "rederive":
+            return list(REDERIVE_STAGES)
+        if job.scopes is None:
+            return list(self.stages)
+        skipped = {
+            stage for scope, stages in self.scope_stages.items() if scope not in job.scopes for stage in stages
+        }
+        return [stage for stage in self.stages if stage not in skipped]
+
+    def checkpoint(self, job: SyncJob, stage: str, *, finished: bool = False) -> None:
+        job.refresh_counts()
+        if finished:
+            if stage in job.running:
+                job.running.remove(stage)
+            job.completed.append(stage)
+        else:
+            job.stage = stage
+            job.running.append(stage)
+        self._publish(job)
+        # Checked when a stage starts, so work that already finished (e.g. a publish) is never reported as cancelled.
+        if not finished and (job.cancelled or self._cancel_requested(job)):
+            raise SyncCancelled()
+
+    def _cancel_requested(self, job: SyncJob) -> bool:
+        try:
+            with open(self._cancel_path, "r", encoding="utf-8") as handle:
+                return handle.read().strip() == job.id
+        except OSError:
+            return False
+
+    # -- status -----------------------------------------------------------
+
+    def _read_shared(self) -> dict:
+        try:
+            with open(self.status_path, "r", encoding="utf-8") as handle:
+                status = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        return status if isinstance(status, dict) else {}
+
+    def _publish(self, job: SyncJob, *, finished: bool = False) -> None:
+        """Write the running job to the shared status file (only the lock holder calls this)."""
+        with self._publish_lock:
+            shared = self._read_shared()
+            if finished:
+                job.running.clear()
+                record = job.to_dict(len(self.stages_for(job)))
+                shared["current"] = None
+                shared["lastRun"] = record
+                shared["recent"] = ([record] + [
+                    entry for entry in shared.get("recent") or [] if entry.get("id") != job.id
+                ])[:RECENT_JOBS]
+                if job.state == "failed":
+                    shared["lastError"] = {"jobId": job.id, "message": job.error, "at": record["finishedAt"]}
+            else:
+                shared["current"] = job.to_dict(len(self.stages_for(job)))
+            with self._lock:
+                queued = self._queued
+            shared["queued"] = queued.to_dict(len(self.stages_for(queued))) if queued is not None else None
+            try:
+                with atomic_write(self.status_path, "w") as handle:
+                    json.dump(shared, handle)
+            except OSError as error:
+                logger.warning("Unable to write sync status: %s", error)
+
+    def _sync_running_elsewhere(self) -> bool:
+        if fcntl is None or not self._lock_path.exists():
+            return False
+        with open(self._lock_path, "a+") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            return False
+
+    def _shared_current(self) -> Optional[dict]:
+        current = self._read_shared().get("current")
+        # A holder that died mid-sync leaves a stale record behind; the lock tells.
+        return current if current and self._sync_running_elsewhere() else None
+
+    def job_status(self, job_id: str) -> Optional[dict]:
+        """One job by id, from this worker or the shared status file; None if unknown."""
+        with self._lock:
+            for job in (self._current, self._queued, *self._recent.values()):
+                if job is not None and job_id in (job.id, *job.request_ids):
+                    job.refresh_counts()
+                    return job.to_dict(len(self.stages_for(job)))
+
+        def matches(record: Optional[dict]) -> bool:
+            return bool(record) and job_id in (record.get("id"), *(record.get("requestIds") or []))
+
+        current = self._shared_current()
+        if matches(current):
+            return current
+        shared = self._read_shared()
+        # The queued record is only trusted while a sync holds the lock and keeps it up to date.
+        if current and matches(shared.get("queued")):
+            return shared["queued"]
+        for record in shared.get("recent") or []:
+            if matches(record):
+                return record
+        entry = self._pending_request(job_id)
+        if entry is not None:
+            # Not yet claimed by the sync worker.
+            return {
+                "id": job_id,
+                "reason": entry.get("reason"),
+                "kind": entry.get("kind", "sync"),
+                "scopes": entry.get("scopes"),
+                "state": "queued",
+                "requestIds": [job_id],
+                "requestedAt": entry.get("requestedAt"),
+            }
+        return None
+
+    def status(self) -> dict:
+        """Current, queued and last job, shared across workers where possible."""
+        shared = self._read_shared()
+        with self._lock:
+            current, queued, last = (
+                job.to_dict(len(self.stages_for(job))) if job is not None else None
+                for job in (self._current, self._queued, self._last)
+            )
+        if current is None or current["state"] == "waiting":
+            current = self._shared_current() or current
+        if queued is None and current is not None and current.get("pid") != os.getpid():
+            queued = shared.get("queued")
+        last_run = shared.get("lastRun") or last
+        return {
+            "state": current["state"] if current else "idle",
+            "current": current,
+            "queued": queued,
+            "stages": list(self.stages),
+            "lastRun": last_run,
+            "lastDurationSeconds": (last_run or {}).get("durationSeconds"),
+            "lastError": shared.get("lastError"),
+        }
+
+
+def current_sync_job() -> Optional[SyncJob]:
+    """The job the calling thread is running, if any."""
+    return getattr(_local, "job", None)
+
+
+def sync_stage(stage: str, *, finished: bool = False) -> None:
+    """Record that ``stage`` of the calling sync started (or ``finished``).
+
+    Raises :class:`SyncCancelled` if the job was cancelled. Only the thread
+    running the job reports; the call is a no-op outside a managed job.
+    """
+    job = getattr(_local, "job", None)
+    manager = getattr(_local, "manager", None)
+    if job is not None and manager is not None:
+        manager.checkpoint(job, stage, finished=finished)
+
+
+__all__ = [
+    "DEFAULT_STREAM_SECONDS",
+    "DEFAULT_WAIT_SECONDS",
+    "DelegatedSyncJob",
+    "FINISHED_STATES",
+    "JOB_KINDS",
+    "REDERIVE_STAGES",
+    "SYNC_SCOPES",
+    "SyncCancelled",
+    "SyncJob",
+    "SyncJobManager",
+    "current_sync_job",
+    "progress_stream_seconds",
+    "sync_stage",
+    "sync_wait_seconds",
+    "web_sync_enabled",
+]
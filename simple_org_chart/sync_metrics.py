@@ -0,0 +1,364 @@
+"""Per-stage timing and resource metrics for directory syncs.
+
+A sync runs inside :func:`recording`; code marks the work it wants costed
+with :func:`measure`. Sections nest per thread (``directory/hierarchy_build``)
+and each one collects wall and CPU time, Graph requests, result pages and
+response bytes, records processed and, when ``SYNC_TRACEMALLOC=true``, peak traced memory.
+Counts roll up into every enclosing section of the thread.
+The finished sync is appended to ``data/sync_metrics.json``, which keeps the
+last ``SYNC_METRICS_HISTORY`` syncs.
+
+Only threads the sync owns record: the thread running :func:`recording` and
+the stage threads it hands its recorder to with :func:`attach`. On any other
+thread (a web request calling a measured helper mid-sync, say) every helper
+here is a no-op. ``tracemalloc`` has one process-wide peak, so the peak of a
+section that overlapped another thread's sections is flagged approximate.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import simple_org_chart.config as app_config
+from simple_org_chart.snapshots import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_SIZE = 100
+
+_local = threading.local()
+# Recorders of the syncs running in this process, by job id, for live_progress.
+_recorders: Dict[str, "SyncRecorder"] = {}
+_recorders_lock = threading.Lock()
+
+
+def tracemalloc_enabled() -> bool:
+    return os.environ.get("SYNC_TRACEMALLOC", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def history_size() -> int:
+    raw_value = os.environ.get("SYNC_METRICS_HISTORY", "")
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_HISTORY_SIZE
+    except ValueError:
+        logger.warning("Invalid SYNC_METRICS_HISTORY '%s'; using %s", raw_value, DEFAULT_HISTORY_SIZE)
+        return DEFAULT_HISTORY_SIZE
+
+
+class SectionMetrics:
+    """Totals for one section path; repeated sections (retries, pages) accumulate."""
+
+    __slots__ = (
+        "path",
+        "calls",
+        "wall",
+        "cpu",
+        "requests",
+        "pages",
+        "bytes_in",
+        "records",
+        "peak_memory",
+        "peak_approximate",
+        "outcome",
+    )
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.requests = 0
+        self.pages = 0
+        self.bytes_in = 0
+        self.records = 0
+        self.peak_memory: Optional[int] = None
+        self.peak_approximate = False
+        self.outcome: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        payload = {
+            "calls": self.calls,
+            "wallSeconds": round(self.wall, 4),
+            "cpuSeconds": round(self.cpu, 4),
+            "graphRequests": self.requests,
+            "graphPages": self.pages,
+            "graphBytes": self.bytes_in,
+            "records": self.records,
+            "peakMemoryBytes": self.peak_memory,
+            "peakMemoryApproximate": self.peak_approximate,
+        }
+        if self.outcome:
+            payload.update(self.outcome)
+        return payload
+
+
+class SyncRecorder:
+    """Sections measured during one sync."""
+
+    def __init__(self, job_id: Optional[str] = None) -> None:
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.state = "running"
+        self.sections: Dict[str, SectionMetrics] = {}
+        # (thread id, section) for every open section.
+        self._active: List[tuple] = []
+        self._lock = threading.Lock()
+        self.tracing = False
+
+    def section(self, path: str) -> SectionMetrics:
+        with self._lock:
+            metrics = self.sections.get(path)
+            if metrics is None:
+                metrics = self.sections[path] = SectionMetrics(path)
+            return metrics
+
+    def observe_peak(self) -> None:
+        """Fold the traced peak into every open section, then start a new peak window.
+
+        When sections of several threads are open the peak is theirs jointly,
+        so each of them is marked approximate.
+        """
+        if not self.tracing:
+            return
+        with self._lock:
+            _, peak = tracemalloc.get_traced_memory()
+            concurrent = len({thread_id for thread_id, _ in self._active}) > 1
+            for _, metrics in self._active:
+                metrics.peak_memory = max(metrics.peak_memory or 0, peak)
+                metrics.peak_approximate = metrics.peak_approximate or concurrent
+            tracemalloc.reset_peak()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            sections = {path: metrics.to_dict() for path, metrics in self.sections.items()}
+        return {
+            "jobId": self.job_id,
+            "state": self.state,
+            "startedAt": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "durationSeconds": round((self.finished_at or time.time()) - self.started_at, 3),
+            "tracemalloc": self.tracing,
+            "stages": sections,
+        }
+
+
+def current_recorder() -> Optional[SyncRecorder]:
+    """The recorder of the sync that owns this thread, if any."""
+    return getattr(_local, "recorder", None)
+
+
+@contextmanager
+def attach(recorder: Optional[SyncRecorder]) -> Iterator[None]:
+    """Record this thread's sections into ``recorder`` (a sync's worker thread)."""
+    previous = current_recorder()
+    _local.recorder = recorder
+    try:
+        yield
+    finally:
+        _local.recorder = previous
+
+
+def _stack() -> List[SectionMetrics]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def recording(job_id: Optional[str] = None) -> Iterator[SyncRecorder]:
+    """Record the sync run inside the block and append it to the history."""
+    recorder = SyncRecorder(job_id)
+    started_tracing = False
+    if tracemalloc_enabled():
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        recorder.tracing = True
+        tracemalloc.reset_peak()
+    if job_id is not None:
+        with _recorders_lock:
+            _recorders[job_id] = recorder
+    try:
+        with attach(recorder):
+            yield recorder
+        recorder.state = "succeeded"
+    except BaseException:
+        recorder.state = "failed"
+        raise
+    finally:
+        recorder.finished_at = time.time()
+        if job_id is not None:
+            with _recorders_lock:
+                if _recorders.get(job_id) is recorder:
+                    del _recorders[job_id]
+        if started_tracing:
+            tracemalloc.stop()
+        append_history(recorder.to_dict())
+
+
+@contextmanager
+def measure(name: str, *, records: int = 0) -> Iterator[Optional[SectionMetrics]]:
+    """Cost the block as section ``name`` nested under the thread's open sections.
+
+    ``records`` is added to the processed-record count. Also usable as a
+    function decorator.
+    """
+    recorder = current_recorder()
+    if recorder is None:
+        yield None
+        return
+    stack = _stack()
+    path = f"{stack[-1].path}/{name}" if stack else name
+    metrics = recorder.section(path)
+    recorder.observe_peak()
+    active = (threading.get_ident(), metrics)
+    with recorder._lock:
+        recorder._active.append(active)
+    stack.append(metrics)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        if records:
+            add_records(records)
+        yield metrics
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+        recorder.observe_peak()
+        stack.pop()
+        with recorder._lock:
+            recorder._active.remove(active)
+            metrics.calls += 1
+            metrics.wall += wall
+            metrics.cpu += cpu
+
+
+def _add(field: str, amount: int) -> None:
+    recorder = current_recorder()
+    stack = getattr(_local, "stack", None)
+    if recorder is None or not stack:
+        return
+    with recorder._lock:
+        for metrics in stack:
+            setattr(metrics, field, getattr(metrics, field) + amount)
+
+
+def record_graph_request(response_bytes: int) -> None:
+    """Count one Graph HTTP request and its response size."""
+    _add("requests", 1)
+    _add("bytes_in", response_bytes)
+
+
+def add_records(count: int) -> None:
+    """Count records processed by the current section."""
+    _add("records", count)
+
+
+def record_page(count: int) -> None:
+    """Count one page of Graph results holding ``count`` records."""
+    _add("pages", 1)
+    _add("records", count)
+
+
+def live_progress(job_id: Optional[str]) -> Optional[dict]:
+    """Running totals of the sync recording ``job_id`` in this process, if any."""
+    if job_id is None:
+        return None
+    with _recorders_lock:
+        recorder = _recorders.get(job_id)
+    if recorder is None:
+        return None
+    with recorder._lock:
+        # Counts roll up, so the top-level sections hold every total once.
+        stages = [metrics for path, metrics in recorder.sections.items() if "/" not in path]
+        return {
+            "graphRequests": sum(metrics.requests for metrics in stages),
+            "graphPages": sum(metrics.pages for metrics in stages),
+            "records": sum(metrics.records for metrics in stages),
+        }
+
+
+def annotate(path: str, outcome: dict) -> None:
+    """Attach a stage's outcome (state, attempts, error) to its section."""
+    recorder = current_recorder()
+    if recorder is not None:
+        recorder.section(path).outcome = {
+            key: value for key, value in outcome.items() if key in {"state", "attempts", "error"}
+        }
+
+
+# -- history ----------------------------------------------------------------
+
+
+def load_history() -> List[dict]:
+    try:
+        with open(app_config.SYNC_METRICS_FILE, "r", encoding="utf-8") as handle:
+            history = json.load(handle)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as error:
+        logger.warning("Unable to read sync metrics history: %s", error)
+        return []
+    return history if isinstance(history, list) else []
+
+
+def append_history(entry: dict) -> None:
+    # Syncs are serialized across workers by the job manager, so no lock is needed here.
+    history = load_history()
+    history.append(entry)
+    del history[:-history_size()]
+    try:
+        with atomic_write(app_config.SYNC_METRICS_FILE, "w") as handle:
+            json.dump(history, handle)
+    except OSError as error:
+        logger.warning("Unable to write sync metrics history: %s", error)
+
+
+def stage_trends(history: List[dict]) -> Dict[str, dict]:
+    """Compare each section's latest wall time with its median over earlier syncs."""
+    trends: Dict[str, dict] = {}
+    if not history:
+        return trends
+    latest = history[-1].get("stages") or {}
+    for path, metrics in latest.items():
+        earlier = [
+            entry["stages"][path]["wallSeconds"]
+            for entry in history[:-1]
+            if path in (entry.get("stages") or {})
+        ]
+        median = statistics.median(earlier) if earlier else None
+        trends[path] = {
+            "latestWallSeconds": metrics.get("wallSeconds"),
+            "medianWallSeconds": round(median, 4) if median is not None else None,
+            "ratio": round(metrics["wallSeconds"] / median, 2) if median else None,
+            "latestRecords": metrics.get("records"),
+        }
+    return trends
+
+
+__all__ = [
+    "SectionMetrics",
+    "SyncRecorder",
+    "add_records",
+    "annotate",
+    "append_history",
+    "attach",
+    "current_recorder",
+    "history_size",
+    "live_progress",
+    "load_history",
+    "measure",
+    "record_graph_request",
+    "record_page",
+    "recording",
+    "stage_trends",
+    "tracemalloc_enabled",
+]
@@ -0,0 +1,345 @@
+"""Run a sync as a dependency graph of named stages on a bounded thread pool.
+
+Each :class:`Stage` names the stages whose results it needs and is started as
+soon as they have succeeded, so independent crawls (employees, sign-ins,
+disabled users) overlap and wall time follows the critical path. Stages retry
+on their own, may carry a timeout, and an optional stage that fails only takes
+its dependents down with it; the datasets they would have written are then
+carried over from the previous generation when it is published.
+
+Timeouts cannot stop a Python thread. A stage that overruns is abandoned and
+its result discarded, so only stages without side effects (crawls that return
+records for a later stage to write) should set one. An abandoned stage is
+never retried, since its first run may still be going; long-running work
+calls :func:`check_abandoned` to stop at the next convenient point. When the
+pipeline ends, early on a cancel or a failed required stage too, every stage
+still running is abandoned the same way and waited for (up to
+:data:`ABANDONED_STAGE_WAIT_SECONDS`), so none outlives the sync that holds
+the sync lock and owns its spools and checkpoint.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from simple_org_chart.sync_metrics import SyncRecorder, annotate, attach, current_recorder, measure
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_CRAWL_TIMEOUT_SECONDS = 3600
+ABANDONED_STAGE_WAIT_SECONDS = 30
+
+_attempt = threading.local()
+
+
+def pipeline_max_workers() -> int:
+    """Size of the stage thread pool (``SYNC_MAX_WORKERS``)."""
+    raw_value = os.environ.get("SYNC_MAX_WORKERS", "")
+    try:
+        return max(1, int(raw_value)) if raw_value.strip() else DEFAULT_MAX_WORKERS
+    except ValueError:
+        logger.warning("Invalid SYNC_MAX_WORKERS '%s'; using %s", raw_value, DEFAULT_MAX_WORKERS)
+        return DEFAULT_MAX_WORKERS
+
+
+def crawl_timeout_seconds() -> Optional[float]:
+    """Timeout for crawl stages (``SYNC_CRAWL_TIMEOUT_SECONDS``); None when disabled."""
+    raw_value = os.environ.get("SYNC_CRAWL_TIMEOUT_SECONDS", "")
+    try:
+        value = float(raw_value) if raw_value.strip() else DEFAULT_CRAWL_TIMEOUT_SECONDS
+    except ValueError:
+        logger.warning("Invalid SYNC_CRAWL_TIMEOUT_SECONDS '%s'; using %s", raw_value, DEFAULT_CRAWL_TIMEOUT_SECONDS)
+        value = DEFAULT_CRAWL_TIMEOUT_SECONDS
+    return value if value > 0 else None
+
+
+class PipelineError(RuntimeError):
+    """A required stage failed, so the sync cannot be published."""
+
+    def __init__(self, stage: str, error: BaseException) -> None:
+        super().__init__(f"Sync stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class StageTimeout(TimeoutError):
+    """A stage ran longer than its timeout."""
+
+
+class Stage:
+    """One named step of a sync.
+
+    ``func`` is called with the results of ``requires`` as positional
+    arguments, in that order. A failing ``required`` stage aborts the
+    pipeline; any other failure skips only the stages depending on it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        *,
+        requires: Sequence[str] = (),
+        required: bool = False,
+        retries: int = 0,
+        retry_delay: float = 5.0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.required = required
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self.timeout = timeout or None
+
+
+class StageOutcome:
+    """How a stage ended: ``succeeded``, ``failed``, ``timed_out`` or ``skipped``."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = "pending"
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round(self.finished_at - self.started_at, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "attempts": self.attempts,
+            "seconds": self.seconds,
+            "error": self.error,
+        }
+
+
+class PipelineResult:
+    """Results of the stages that succeeded plus every stage's outcome."""
+
+    def __init__(self, outcomes: Dict[str, StageOutcome]) -> None:
+        self.outcomes = outcomes
+        self.results: Dict[str, Any] = {}
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+    def succeeded(self, name: str) -> bool:
+        return name in self.results
+
+
+def _validate(stages: Sequence[Stage]) -> Dict[str, Stage]:
+    by_name: Dict[str, Stage] = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate sync stage '{stage.name}'")
+        by_name[stage.name] = stage
+    for stage in stages:
+        for dependency in stage.requires:
+            if dependency not in by_name:
+                raise ValueError(f"Sync stage '{stage.name}' requires unknown stage '{dependency}'")
+
+    # Kahn's algorithm, only to reject cycles up front.
+    remaining = {stage.name: len(stage.requires) for stage in stages}
+    ready = [name for name, count in remaining.items() if count == 0]
+    seen = 0
+    while ready:
+        name = ready.pop()
+        seen += 1
+        for stage in stages:
+            if name in stage.requires:
+                remaining[stage.name] -= 1
+                if remaining[stage.name] == 0:
+                    ready.append(stage.name)
+    if seen != len(stages):
+        raise ValueError("Sync stages contain a dependency cycle")
+    return by_name
+
+
+def check_abandoned() -> None:
+    """Raise :class:`StageTimeout` if the stage running on this thread was abandoned."""
+    abandoned = getattr(_attempt, "abandoned", None)
+    if abandoned is not None and abandoned.is_set():
+        raise StageTimeout("stage was abandoned")
+
+
+def _run_stage(stage: Stage, args: List[Any], abandoned: threading.Event, recorder: Optional[SyncRecorder]) -> Any:
+    _attempt.abandoned = abandoned
+    try:
+        with attach(recorder), measure(stage.name):
+            return stage.func(*args)
+    finally:
+        _attempt.abandoned = None
+
+
+def _wait_for_abandoned(abandoned_stages: Dict[Future, Stage]) -> None:
+    if not abandoned_stages:
+        return
+    _, still_running = wait(list(abandoned_stages), timeout=ABANDONED_STAGE_WAIT_SECONDS)
+    if still_running:
+        logger.warning(
+            "Abandoned sync stage(s) %s still running after %ss",
+            ", ".join(sorted(abandoned_stages[future].name for future in still_running)),
+            ABANDONED_STAGE_WAIT_SECONDS,
+        )
+
+
+def run_pipeline(
+    stages: Iterable[Stage],
+    *,
+    max_workers: Optional[int] = None,
+    on_start: Optional[Callable[[str], None]] = None,
+    on_finish: Optional[Callable[[str, StageOutcome], None]] = None,
+) -> PipelineResult:
+    """Run ``stages`` in dependency order with up to ``max_workers`` at once.
+
+    ``on_start`` and ``on_finish`` are called from the calling thread, so an
+    exception they raise (e.g. a cancelled sync) aborts the pipeline: stages
+    not yet started are dropped and running ones are abandoned. Either way
+    this returns only once abandoned stages have stopped or
+    :data:`ABANDONED_STAGE_WAIT_SECONDS` have passed.
+    Raises :class:`PipelineError` when a required stage fails.
+    """
+    stages = list(stages)
+    _validate(stages)
+    outcomes = {stage.name: StageOutcome(stage.name) for stage in stages}
+    result = PipelineResult(outcomes)
+    running: Dict[Future, tuple] = {}
+    abandoned_stages: Dict[Future, Stage] = {}
+    retrying: List[tuple] = []  # (monotonic time the retry is due, stage)
+    # Stage threads record into the calling sync's metrics, and only they do.
+    recorder = current_recorder()
+    executor = ThreadPoolExecutor(max_workers=max_workers or pipeline_max_workers(), thread_name_prefix="sync-stage")
+
+    def submit(stage: Stage) -> None:
+        outcome = outcomes[stage.name]
+        outcome.attempts += 1
+        if outcome.started_at is None:
+            outcome.started_at = time.time()
+            outcome.state = "running"
+            if on_start is not None:
+                on_start(stage.name)
+        args = [result.results[name] for name in stage.requires]
+        deadline = time.monotonic() + stage.timeout if stage.timeout else None
+        abandoned = threading.Event()
+        running[executor.submit(_run_stage, stage, args, abandoned, recorder)] = (stage, deadline, abandoned)
+
+    def finish(stage: Stage, state: str, error: Optional[BaseException] = None) -> None:
+        outcome = outcomes[stage.name]
+        outcome.state = state
+        outcome.finished_at = time.time()
+        if error is not None:
+            outcome.error = str(error) or type(error).__name__
+        if state == "succeeded":
+            logger.info("Sync stage %s finished in %.2fs", stage.name, outcome.seconds)
+        elif state != "skipped":
+            logger.error("Sync stage %s %s after %s attempt(s): %s", stage.name, state.replace("_", " "), outcome.attempts, outcome.error)
+        annotate(stage.name, outcome.to_dict())
+        if on_finish is not None:
+            on_finish(stage.name, outcome)
+        if state != "succeeded" and stage.required:
+            raise PipelineError(stage.name, error or RuntimeError(state))
+
+    def skip_dependents() -> None:
+        changed = True
+        while changed:
+            changed = False
+            for stage in stages:
+                if outcomes[stage.name].state != "pending":
+                    continue
+                failed = [name for name in stage.requires if outcomes[name].state in {"failed", "timed_out", "skipped"}]
+                if failed:
+                    outcomes[stage.name].error = f"requires {', '.join(failed)}"
+                    logger.warning("Skipping sync stage %s; it requires %s", stage.name, ", ".join(failed))
+                    finish(stage, "skipped")
+                    changed = True
+
+    try:
+        while True:
+            skip_dependents()
+            for stage in stages:
+                if outcomes[stage.name].state == "pending" and all(
+                    outcomes[name].state == "succeeded" for name in stage.requires
+                ):
+                    submit(stage)
+            now = time.monotonic()
+            for due, stage in list(retrying):
+                if now >= due:
+                    retrying.remove((due, stage))
+                    submit(stage)
+            if not running and not retrying:
+                break
+
+            # Wake for the first result, the next deadline or the next retry, whichever comes first.
+            wakeups = [deadline for _, deadline, _ in running.values() if deadline is not None]
+            wakeups.extend(due for due, _ in retrying)
+            timeout = max(0.0, min(wakeups) - time.monotonic()) if wakeups else None
+            if running:
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(timeout or 0)
+
+            for future in done:
+                stage, _, _ = running.pop(future)
+                try:
+                    result.results[stage.name] = future.result()
+                except Exception as error:  # noqa: BLE001 - isolated per stage
+                    if outcomes[stage.name].attempts <= stage.retries:
+                        logger.warning(
+                            "Sync stage %s failed (attempt %s of %s): %s; retrying",
+                            stage.name, outcomes[stage.name].attempts, stage.retries + 1, error,
+                        )
+                        retrying.append((time.monotonic() + stage.retry_delay * outcomes[stage.name].attempts, stage))
+                    else:
+                        finish(stage, "failed", error)
+                    continue
+                finish(stage, "succeeded")
+
+            now = time.monotonic()
+            for future, (stage, deadline, abandoned) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    # The thread cannot be stopped; it is asked to stop at its next
+                    # check_abandoned() and its eventual result is ignored. Not
+                    # retried, which would run a second copy alongside it.
+                    running.pop(future)
+                    abandoned.set()
+                    if not future.cancel():
+                        abandoned_stages[future] = stage
+                    finish(stage, "timed_out", StageTimeout(f"exceeded {stage.timeout:g}s"))
+    finally:
+        for future, (stage, _, abandoned) in running.items():
+            abandoned.set()
+            abandoned_stages[future] = stage
+        executor.shutdown(wait=False, cancel_futures=True)
+        _wait_for_abandoned(abandoned_stages)
+
+    return result
+
+
+__all__ = [
+    "ABANDONED_STAGE_WAIT_SECONDS",
+    "DEFAULT_CRAWL_TIMEOUT_SECONDS",
+    "DEFAULT_MAX_WORKERS",
+    "PipelineError",
+    "PipelineResult",
+    "Stage",
+    "StageOutcome",
+    "StageTimeout",
+    "check_abandoned",
+    "crawl_timeout_seconds",
+    "pipeline_max_workers",
+    "run_pipeline",
+]
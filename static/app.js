@@ -2,6 +2,8 @@ let currentData = null;
 let allEmployees = [];
 const employeeById = new Map();
 let root = null;
+let hierarchyNodeById = new Map();
+let orgDataPartial = false;
 let svg = null;
 let g = null;
 let linkLayer = null;
@@ -863,7 +865,7 @@ function getDirectReportCount(node) {
     if (!node) {
         return 0;
     }
-    const directReports = node._children?.length || node.children?.length || 0;
+    const directReports = node._children?.length || node.children?.length || node.data?.directReportCount || 0;
     return directReports;
 }
 
@@ -1514,7 +1516,7 @@ async function init() {
         await updateAuthDependentUI();
         await loadSettings();
 
-        const response = await fetch(`${API_BASE_URL}/api/employees`);
+        const response = await fetchEmployees(getEmployeesUrl());
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -1524,12 +1526,17 @@ async function init() {
         if (currentData) {
             employeeById.clear();
             allEmployees = flattenTree(currentData);
-            const validIds = allEmployees.map(emp => emp.id).filter(Boolean);
-            pruneTitleOverrides(validIds);
-            pruneDepartmentOverrides(validIds);
+            orgDataPartial = allEmployees.some(emp => emp.childrenLoaded === false);
+            if (!orgDataPartial) {
+                const validIds = allEmployees.map(emp => emp.id).filter(Boolean);
+                pruneTitleOverrides(validIds);
+                pruneDepartmentOverrides(validIds);
+            }
             initializeTopUserSearch();
             preloadEmployeeImages(allEmployees);
             renderOrgChart(currentData);
+            initializeClientSearch();
+            watchDataGeneration();
         } else {
             throw new Error('No data received from server');
         }
@@ -1941,6 +1948,108 @@ function preloadEmployeeImages(employees) {
     }
 }
 
+// Large orgs are paged by the server: ask only for the levels the chart shows
+// initially (plus one so collapsed nodes know their reports). Deeper levels
+// are fetched from /api/employees/subtree/<id> on expand.
+function getEmployeesUrl({ full = false } = {}) {
+    const collapseLevel = appSettings.collapseLevel || '2';
+    if (full || collapseLevel === 'all') {
+        return `${API_BASE_URL}/api/employees`;
+    }
+    const depth = Math.max(parseInt(collapseLevel, 10) || 2, 1);
+    return `${API_BASE_URL}/api/employees?depth=${depth}`;
+}
+
+// /api/employees answers 202 while the sync that creates the data is still
+// running; wait as long as Retry-After asks and try again.
+async function fetchEmployees(url) {
+    for (;;) {
+        const response = await fetch(url);
+        if (response.status !== 202) {
+            return response;
+        }
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 5;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+    }
+}
+
+function hasUnloadedChildren(node) {
+    return !!(node && node.data && node.data.childrenLoaded === false && node.data.directReportCount > 0);
+}
+
+function hasExpandableChildren(node) {
+    return !!(node._children?.length || node.children?.length || hasUnloadedChildren(node));
+}
+
+function isCollapsedNode(node) {
+    return !!(node._children?.length || hasUnloadedChildren(node));
+}
+
+// Graft a paged subtree payload under an existing hierarchy node.
+function attachLoadedChildren(node, payload) {
+    const childrenData = Array.isArray(payload && payload.children) ? payload.children : [];
+    node.data.children = childrenData;
+    node.data.childrenLoaded = true;
+
+    const loadedEmployees = [];
+    childrenData.forEach(child => flattenTree(child, loadedEmployees));
+    allEmployees.push(...loadedEmployees);
+
+    const childNodes = childrenData.map(childData => {
+        const childNode = d3.hierarchy(childData);
+        childNode.each(descendant => {
+            descendant.depth += node.depth + 1;
+        });
+        childNode.parent = node;
+        return childNode;
+    });
+    node.children = childNodes.length ? childNodes : null;
+    node._children = null;
+
+    indexHierarchy(root);
+    orgDataPartial = allEmployees.some(emp => emp.childrenLoaded === false);
+    preloadEmployeeImages(loadedEmployees);
+}
+
+function loadEmployeeChildren(node, { expandTo = null } = {}) {
+    if (node._loadingChildren) {
+        return node._loadingChildren;
+    }
+    const params = new URLSearchParams({ depth: expandTo ? '0' : '1' });
+    if (expandTo) {
+        params.set('expandTo', expandTo);
+    }
+    node._loadingChildren = fetch(`${API_BASE_URL}/api/employees/subtree/${encodeURIComponent(node.data.id)}?${params}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(payload => attachLoadedChildren(node, payload))
+        .finally(() => {
+            node._loadingChildren = null;
+        });
+    return node._loadingChildren;
+}
+
+// Make sure an employee that may sit below the paged part of the chart is loaded.
+async function ensureEmployeeLoaded(employeeId) {
+    if (hierarchyNodeById.has(employeeId) || !orgDataPartial) {
+        return hierarchyNodeById.get(employeeId) || null;
+    }
+    const response = await fetch(`${API_BASE_URL}/api/employee/${encodeURIComponent(employeeId)}/chain`);
+    if (!response.ok) {
+        return null;
+    }
+    const { chain = [] } = await response.json();
+    const anchor = chain.map(item => hierarchyNodeById.get(item.id)).filter(Boolean).pop();
+    if (anchor && hasUnloadedChildren(anchor)) {
+        await loadEmployeeChildren(anchor, { expandTo: employeeId });
+    }
+    return hierarchyNodeById.get(employeeId) || null;
+}
+
 function flattenTree(node, list = []) {
     if (!node) return list;
     list.push(node);
@@ -1982,6 +2091,17 @@ function initializeTopUserSearch() {
             return;
         }
         
+        if (orgDataPartial) {
+            fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(results => {
+                    const matches = (Array.isArray(results) ? results : []).filter(employee => employee.name && employee.email);
+                    displayTopUserResults(matches, resultsContainer, searchInput);
+                })
+                .catch(error => console.error('Error searching employees:', error));
+            return;
+        }
+
         const matches = allEmployees.filter(employee => {
             if (!employee.name || !employee.email) return false;
             
@@ -2231,8 +2351,70 @@ async function resetTopUser() {
     }
 }
 
+// Refetch data only when a sync published something different. The server
+// announces each generation with a fingerprint per dataset the page uses.
+let dataGenerationVersions = null;
+let pendingDataRefresh = null;
+let lastEmployeeLoadOptions = {};
+let dataGenerationSource = null;
+
+function runDataRefresh(refresh) {
+    if (refresh.hierarchy) {
+        // Reloading the chart also reloads the search index.
+        reloadEmployeeData(lastEmployeeLoadOptions);
+    } else if (refresh.searchIndex) {
+        initializeClientSearch();
+    }
+}
+
+function applyDataGeneration(state) {
+    const previous = dataGenerationVersions;
+    dataGenerationVersions = state.versions || {};
+    if (!previous) {
+        return;
+    }
+    const refresh = {
+        hierarchy: previous.hierarchy !== dataGenerationVersions.hierarchy,
+        searchIndex: previous.searchIndex !== dataGenerationVersions.searchIndex
+    };
+    if (!refresh.hierarchy && !refresh.searchIndex) {
+        return;
+    }
+    if (document.hidden) {
+        // Background tabs catch up when they are shown again.
+        pendingDataRefresh = {
+            hierarchy: refresh.hierarchy || !!(pendingDataRefresh && pendingDataRefresh.hierarchy),
+            searchIndex: refresh.searchIndex || !!(pendingDataRefresh && pendingDataRefresh.searchIndex)
+        };
+        return;
+    }
+    runDataRefresh(refresh);
+}
+
+function watchDataGeneration() {
+    if (dataGenerationSource || typeof window.EventSource !== 'function') {
+        return;
+    }
+    dataGenerationSource = new EventSource(`${API_BASE_URL}/api/data/events`);
+    dataGenerationSource.addEventListener('generation', event => {
+        try {
+            applyDataGeneration(JSON.parse(event.data));
+        } catch (error) {
+            console.warn('Ignoring malformed data generation event', error);
+        }
+    });
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden && pendingDataRefresh) {
+            const refresh = pendingDataRefresh;
+            pendingDataRefresh = null;
+            runDataRefresh(refresh);
+        }
+    });
+}
+
 // Reload employee data and re-render chart
-async function reloadEmployeeData() {
+async function reloadEmployeeData(options = {}) {
+    lastEmployeeLoadOptions = options;
     await waitForTranslations();
     try {
         // Show loading state
@@ -2259,7 +2441,7 @@ async function reloadEmployeeData() {
             }
         }
         
-        const response = await fetch(`${API_BASE_URL}/api/employees`);
+        const response = await fetchEmployees(getEmployeesUrl(options));
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -2269,11 +2451,15 @@ async function reloadEmployeeData() {
         if (currentData) {
             employeeById.clear();
             allEmployees = flattenTree(currentData);
-            const validIds = allEmployees.map(emp => emp.id).filter(Boolean);
-            pruneTitleOverrides(validIds);
-            pruneDepartmentOverrides(validIds);
+            orgDataPartial = allEmployees.some(emp => emp.childrenLoaded === false);
+            if (!orgDataPartial) {
+                const validIds = allEmployees.map(emp => emp.id).filter(Boolean);
+                pruneTitleOverrides(validIds);
+                pruneDepartmentOverrides(validIds);
+            }
             preloadEmployeeImages(allEmployees);
             renderOrgChart(currentData);
+            initializeClientSearch();
         } else {
             throw new Error('No data received from server');
         }
@@ -2337,6 +2523,7 @@ function renderOrgChart(data) {
     applyZoomTransform(initialTransform, { duration: 0, resetUser: true });
 
     root = d3.hierarchy(data);
+    indexHierarchy(root);
 
     root.x0 = 0;
     root.y0 = 0;
@@ -2606,7 +2793,7 @@ function update(source) {
 
     const expandBtn = nodeEnter.append('g')
         .attr('class', 'expand-group')
-        .style('display', d => (d._children?.length || d.children?.length) ? 'block' : 'none')
+        .style('display', d => hasExpandableChildren(d) ? 'block' : 'none')
         .on('click', (event, d) => {
             event.stopPropagation();
             toggle(d);
@@ -2623,7 +2810,7 @@ function update(source) {
         .attr('y', currentLayout === 'vertical' ? nodeHeight/2 + 15 : 4)
         .attr('x', currentLayout === 'horizontal' ? nodeWidth/2 + 10 : 0)
         .attr('text-anchor', 'middle')
-        .text(d => d._children?.length ? '+' : '-');
+        .text(d => isCollapsedNode(d) ? '+' : '-');
 
     // Eye icon toggle (placed top-right inside node)
     nodeEnter.append('text')
@@ -2708,7 +2895,7 @@ function update(source) {
         });
 
     nodeUpdate.select('.expand-text')
-        .text(d => d._children?.length ? '+' : '-')
+        .text(d => isCollapsedNode(d) ? '+' : '-')
         .attr('y', currentLayout === 'vertical' ? nodeHeight/2 + 15 : 4)
         .attr('x', currentLayout === 'horizontal' ? nodeWidth/2 + 10 : 0);
 
@@ -2717,7 +2904,7 @@ function update(source) {
         .attr('cx', currentLayout === 'horizontal' ? nodeWidth/2 + 10 : 0);
 
     nodeUpdate.select('.expand-group')
-        .style('display', d => (d._children?.length || d.children?.length) ? 'block' : 'none');
+        .style('display', d => hasExpandableChildren(d) ? 'block' : 'none');
 
     nodeMerge.selectAll('.count-badge')
         .style('display', d => shouldShowCountBadge(d) ? 'block' : 'none');
@@ -2820,26 +3007,16 @@ function applyMultiLineChildrenLayout(nodes) {
     function shiftSubtree(rootNode, dx, dy) {
         if ((dx === 0 && dy === 0) || !rootNode) return;
         nodes.forEach(n => {
-            let cur = n;
-            while (cur) {
-                if (cur === rootNode) {
-                    n.x += dx;
-                    n.y += dy;
-                    break;
-                }
-                cur = cur.parent;
+            if (isDescendantNode(rootNode, n)) {
+                n.x += dx;
+                n.y += dy;
             }
         });
     }
 
-    // Helper: check if anc is an ancestor of node
+    // Helper: check if anc is an ancestor of node (or the node itself)
     function isAncestor(anc, node) {
-        let cur = node;
-        while (cur) {
-            if (cur === anc) return true;
-            cur = cur.parent;
-        }
-        return false;
+        return isDescendantNode(anc, node);
     }
 
     // Helper: compute subtree bounds for a node across provided nodes
@@ -3000,6 +3177,12 @@ function diagonal(s, d) {
 }
 
 function toggle(d) {
+    if (hasUnloadedChildren(d)) {
+        loadEmployeeChildren(d)
+            .then(() => update(d))
+            .catch(error => console.error('Error loading direct reports:', error));
+        return;
+    }
     if (d.children) {
         d._children = d.children;
         d.children = null;
@@ -3020,6 +3203,12 @@ function toggle(d) {
 }
 
 function expandAll() {
+    if (orgDataPartial) {
+        reloadEmployeeData({ full: true }).then(() => {
+            if (!orgDataPartial) expandAll();
+        });
+        return;
+    }
     root.each(d => {
         if (d._children) {
             d.children = d._children;
@@ -4379,16 +4568,45 @@ function closeEmployeeDetail() {
     currentDetailEmployeeId = null;
 }
 
-function findNodeById(node, targetId) {
-    if (node.data.id === targetId) {
-        return node;
-    }
-    if (node.children || node._children) {
-        const children = node.children || node._children;
-        for (let child of children) {
-            const result = findNodeById(child, targetId);
-            if (result) return result;
+// Number every node in pre-order before anything is collapsed. A node's subtree
+// then occupies the contiguous range [orgEnter, orgExit], so ancestor checks and
+// subtree sizes need no tree walk.
+function indexHierarchy(rootNode) {
+    hierarchyNodeById = new Map();
+    const order = [];
+    const stack = rootNode ? [rootNode] : [];
+    while (stack.length) {
+        const node = stack.pop();
+        node.orgEnter = order.length;
+        order.push(node);
+        if (node.data && node.data.id != null && !hierarchyNodeById.has(node.data.id)) {
+            hierarchyNodeById.set(node.data.id, node);
         }
+        const kids = node.children || node._children;
+        if (kids) {
+            for (let i = kids.length - 1; i >= 0; i--) stack.push(kids[i]);
+        }
+    }
+    for (let i = order.length - 1; i >= 0; i--) {
+        const node = order[i];
+        const kids = node.children || node._children;
+        node.orgExit = kids && kids.length ? kids[kids.length - 1].orgExit : node.orgEnter;
+    }
+}
+
+function isDescendantNode(ancestor, node) {
+    if (!ancestor || !node) return false;
+    return ancestor.orgEnter <= node.orgEnter && node.orgEnter <= ancestor.orgExit;
+}
+
+function getSubtreeSize(node) {
+    return node ? node.orgExit - node.orgEnter + 1 : 0;
+}
+
+function findNodeById(node, targetId) {
+    const indexed = hierarchyNodeById.get(targetId);
+    if (indexed && (node === root || isDescendantNode(node, indexed))) {
+        return indexed;
     }
     return null;
 }
@@ -4426,6 +4644,86 @@ function clearHighlights() {
 let searchTimeout;
 const searchInput = document.getElementById('searchInput');
 const searchResults = document.getElementById('searchResults');
+const SEARCH_WORKER_URL = '/static/search-worker.js';
+const LOCAL_SEARCH_DEBOUNCE_MS = 80;
+const SERVER_SEARCH_DEBOUNCE_MS = 300;
+let searchWorker = null;
+let searchWorkerReady = false;
+let searchIndexGeneration = null;
+let searchRequestCounter = 0;
+const pendingSearchRequests = new Map();
+
+function disableClientSearch() {
+    searchWorkerReady = false;
+    pendingSearchRequests.forEach(({ reject }) => reject(new Error('Client-side search unavailable')));
+    pendingSearchRequests.clear();
+}
+
+function handleSearchWorkerMessage(event) {
+    const message = event.data || {};
+    if (message.type === 'loaded') {
+        searchWorkerReady = !!message.ready;
+        searchIndexGeneration = message.generation || null;
+    } else if (message.type === 'results') {
+        const pending = pendingSearchRequests.get(message.requestId);
+        if (pending) {
+            pendingSearchRequests.delete(message.requestId);
+            pending.resolve(message.results || []);
+        }
+    }
+}
+
+// Load the compact search payload into a worker; large tenants keep using /api/search.
+async function initializeClientSearch() {
+    if (typeof Worker === 'undefined') return;
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/search-index`);
+        if (!response.ok) return;
+        const payload = await response.json();
+        if (!payload.clientSearch) {
+            disableClientSearch();
+            searchIndexGeneration = payload.generation || null;
+            return;
+        }
+        if (searchWorkerReady && payload.generation && payload.generation === searchIndexGeneration) {
+            return;
+        }
+        if (!searchWorker) {
+            searchWorker = new Worker(SEARCH_WORKER_URL);
+            searchWorker.addEventListener('message', handleSearchWorkerMessage);
+            searchWorker.addEventListener('error', error => {
+                console.warn('Search worker failed; falling back to server search', error);
+                disableClientSearch();
+            });
+        }
+        searchWorkerReady = false;
+        searchWorker.postMessage({ type: 'load', payload });
+    } catch (error) {
+        console.warn('Client-side search unavailable; using server search', error);
+        disableClientSearch();
+    }
+}
+
+function searchLocally(query) {
+    return new Promise((resolve, reject) => {
+        const requestId = ++searchRequestCounter;
+        pendingSearchRequests.set(requestId, { resolve, reject });
+        searchWorker.postMessage({ type: 'search', requestId, query, limit: 10 });
+    });
+}
+
+async function fetchSearchResults(query) {
+    if (searchWorkerReady) {
+        try {
+            const matches = await searchLocally(query);
+            return matches.map(match => employeeById.get(match.id) || match);
+        } catch (error) {
+            console.warn('Local search failed; retrying on server', error);
+        }
+    }
+    const response = await fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}`);
+    return response.json();
+}
 
 searchInput.addEventListener('input', function(e) {
     clearTimeout(searchTimeout);
@@ -4440,7 +4738,7 @@ searchInput.addEventListener('input', function(e) {
     
     searchTimeout = setTimeout(() => {
         performSearch(query);
-    }, 300);
+    }, searchWorkerReady ? LOCAL_SEARCH_DEBOUNCE_MS : SERVER_SEARCH_DEBOUNCE_MS);
 });
 
 searchInput.addEventListener('focus', function(e) {
@@ -4457,8 +4755,7 @@ document.addEventListener('click', function(e) {
 
 async function performSearch(query) {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}`);
-        const results = await response.json();
+        const results = await fetchSearchResults(query);
         
         if (results.length > 0) {
             displaySearchResults(results);
@@ -4552,7 +4849,14 @@ function refreshSearchResultsPresentation() {
     }
 }
 
-function selectSearchResult(employeeId) {
+async function selectSearchResult(employeeId) {
+    if (!employeeById.has(employeeId)) {
+        try {
+            await ensureEmployeeLoaded(employeeId);
+        } catch (error) {
+            console.error('Error loading employee path:', error);
+        }
+    }
     const employee = employeeById.get(employeeId);
     if (employee) {
         showEmployeeDetail(employee);
@@ -4573,29 +4877,8 @@ function expandToEmployee(employeeId) {
         return;
     }
     
-    const path = [];
-    
-    function findPath(node, targetId, currentPath) {
-        currentPath.push(node);
-        
-        if (node.data.id === targetId) {
-            path.push(...currentPath);
-            return true;
-        }
-        
-        if (node.children || node._children) {
-            const children = node.children || node._children;
-            for (let child of children) {
-                if (findPath(child, targetId, [...currentPath])) {
-                    return true;
-                }
-            }
-        }
-        
-        return false;
-    }
-    
-    findPath(root, employeeId, []);
+    const targetInTree = findNodeById(root, employeeId);
+    const path = targetInTree ? targetInTree.ancestors().reverse() : [];
     
     path.forEach(node => {
         if (node._children) {
@@ -4633,7 +4916,8 @@ async function exportToXLSX() {
     try {
         const response = await fetch(`${API_BASE_URL}/api/export-xlsx`);
         
-        if (response.ok) {
+        // 202 means the data is still being synced; its JSON body says so.
+        if (response.status === 200) {
             // Get the blob
             const blob = await response.blob();
             
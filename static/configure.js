@@ -696,12 +696,7 @@ function initTimePicker() {
     syncHidden();
 }
 
-function initTimezonePicker() {
-    const tzSelect = document.getElementById('updateTimezone');
-    if (!tzSelect) {
-        return;
-    }
-
+function getTimezoneNames() {
     let zones = [];
     if (typeof Intl !== 'undefined' && typeof Intl.supportedValuesOf === 'function') {
         try {
@@ -724,7 +719,11 @@ function initTimezonePicker() {
             'Australia/Sydney'
         ];
     }
+    return zones;
+}
 
+function fillTimezoneSelect(tzSelect, desired) {
+    const zones = getTimezoneNames();
     const fragment = document.createDocumentFragment();
     zones.forEach(zone => {
         const option = document.createElement('option');
@@ -736,14 +735,95 @@ function initTimezonePicker() {
     tzSelect.innerHTML = '';
     tzSelect.appendChild(fragment);
 
-    const desired = DEFAULT_UPDATE_TIMEZONE;
-    if (zones.includes(desired)) {
+    if (desired && !zones.includes(desired)) {
+        const option = document.createElement('option');
+        option.value = desired;
+        option.textContent = desired;
+        tzSelect.appendChild(option);
+    }
+    if (desired) {
         tzSelect.value = desired;
     } else if (zones.length) {
         tzSelect.value = zones[0];
     }
 }
 
+function initTimezonePicker() {
+    const tzSelect = document.getElementById('updateTimezone');
+    if (!tzSelect) {
+        return;
+    }
+    fillTimezoneSelect(tzSelect, DEFAULT_UPDATE_TIMEZONE);
+}
+
+function updateScheduledJobMode(row) {
+    const isCron = row.querySelector('.scheduled-job__mode').value === 'cron';
+    row.querySelector('.scheduled-job__interval-field').hidden = isCron;
+    row.querySelector('.scheduled-job__cron').hidden = !isCron;
+    // Intervals run relative to the last run; only cron times need a time zone.
+    row.querySelector('.scheduled-job__timezone-field').hidden = !isCron;
+}
+
+function addScheduledJobRow(job = {}) {
+    const list = document.getElementById('scheduledJobsList');
+    const template = document.getElementById('scheduledJobTemplate');
+    if (!list || !template) {
+        return;
+    }
+
+    const row = template.content.firstElementChild.cloneNode(true);
+    if (window.i18n && typeof window.i18n.applyTranslations === 'function') {
+        window.i18n.applyTranslations(row);
+    }
+
+    row.querySelector('.scheduled-job__enabled').checked = job.enabled !== false;
+    row.querySelector('.scheduled-job__name').value = job.name || '';
+    const scopes = Array.isArray(job.scopes) ? job.scopes : [];
+    row.querySelectorAll('.scheduled-job__scope input').forEach(input => {
+        input.checked = scopes.includes(input.value);
+    });
+    row.querySelector('.scheduled-job__mode').value = job.cron ? 'cron' : 'interval';
+    if (job.intervalMinutes) {
+        row.querySelector('.scheduled-job__interval').value = job.intervalMinutes;
+    }
+    row.querySelector('.scheduled-job__cron').value = job.cron || '';
+    fillTimezoneSelect(row.querySelector('.scheduled-job__timezone'), job.timezone || DEFAULT_UPDATE_TIMEZONE);
+    updateScheduledJobMode(row);
+
+    row.querySelector('.scheduled-job__mode').addEventListener('change', () => updateScheduledJobMode(row));
+    row.querySelector('.scheduled-job__remove').addEventListener('click', () => {
+        row.remove();
+        markUnsavedChange();
+    });
+    list.appendChild(row);
+}
+
+function renderScheduledJobs(jobs) {
+    const list = document.getElementById('scheduledJobsList');
+    if (!list) {
+        return;
+    }
+    list.innerHTML = '';
+    (Array.isArray(jobs) ? jobs : []).forEach(job => addScheduledJobRow(job));
+}
+
+function getScheduledJobsValue() {
+    return Array.from(document.querySelectorAll('#scheduledJobsList .scheduled-job')).map(row => {
+        const job = {
+            name: row.querySelector('.scheduled-job__name').value.trim(),
+            enabled: row.querySelector('.scheduled-job__enabled').checked,
+            scopes: Array.from(row.querySelectorAll('.scheduled-job__scope input:checked')).map(input => input.value)
+        };
+        if (row.querySelector('.scheduled-job__mode').value === 'cron') {
+            job.cron = row.querySelector('.scheduled-job__cron').value.trim();
+            job.timezone = row.querySelector('.scheduled-job__timezone').value;
+        } else {
+            job.intervalMinutes = parseInt(row.querySelector('.scheduled-job__interval').value, 10) || null;
+        }
+        return job;
+    });
+}
+
 function applySettings(settings) {
     document.title = `Configuration - ${settings.chartTitle || 'SimpleOrgChart'}`;
     if (settings.chartTitle) {
@@ -810,6 +890,8 @@ function applySettings(settings) {
         timezoneSelect.value = desiredTimezone;
     }
 
+    renderScheduledJobs(settings.scheduledJobs);
+
     if (settings.collapseLevel) {
         document.getElementById('collapseLevel').value = settings.collapseLevel;
     }
@@ -1330,6 +1412,7 @@ async function saveAllSettings() {
         autoUpdateEnabled: document.getElementById('autoUpdateEnabled').checked,
         updateTime: document.getElementById('updateTime').value,
     updateTimezone: document.getElementById('updateTimezone').value,
+        scheduledJobs: getScheduledJobsValue(),
         collapseLevel: document.getElementById('collapseLevel').value,
         searchAutoExpand: document.getElementById('searchAutoExpand').checked,
         searchHighlight: document.getElementById('searchHighlight').checked,
@@ -1407,23 +1490,115 @@ async function saveAllSettings() {
     }
 }
 
+function formatTranslation(key, fallbackText, params = {}) {
+    const template = getTranslation(key, fallbackText);
+    return template.replace(/\{(\w+)\}/g, (match, name) => (params[name] !== undefined ? params[name] : match));
+}
+
+function renderUpdateProgress(job) {
+    const statusEl = document.getElementById('updateStatus');
+    const progressEl = document.getElementById('updateProgress');
+    const keyBase = 'configure.data.manualUpdate';
+
+    if (job.state === 'running') {
+        statusEl.textContent = formatTranslation(`${keyBase}.running`, 'Step {step}/{steps}: {stage} · {pages} pages · {records} records', {
+            step: job.step,
+            steps: job.steps,
+            stage: (job.running && job.running.length ? job.running.join(', ') : job.stage) || '',
+            pages: (job.graphPages || 0).toLocaleString(),
+            records: (job.records || 0).toLocaleString()
+        });
+    } else if (job.state === 'queued' || job.state === 'waiting') {
+        const fallback = job.state === 'queued' ? 'Update queued...' : 'Waiting for another update to finish...';
+        statusEl.textContent = getTranslation(`${keyBase}.${job.state}`, fallback);
+    }
+    progressEl.hidden = false;
+    progressEl.value = job.progress || 0;
+}
+
+function finishUpdateProgress(job) {
+    const statusEl = document.getElementById('updateStatus');
+    const progressEl = document.getElementById('updateProgress');
+    const keyBase = 'configure.data.manualUpdate';
+    const fallbacks = {
+        succeeded: '✔ Update finished',
+        coalesced: '✔ Data was refreshed by another update',
+        failed: '✗ Update failed: {error}',
+        cancelled: '✗ Update cancelled'
+    };
+    const state = fallbacks[job.state] ? job.state : 'failed';
+    statusEl.textContent = formatTranslation(`${keyBase}.${state}`, fallbacks[state], { error: job.error || job.state });
+    progressEl.hidden = true;
+    if (state === 'succeeded' || state === 'coalesced') {
+        setTimeout(() => {
+            statusEl.textContent = '';
+        }, 5000);
+    }
+}
+
+function pollUpdateProgress(statusUrl) {
+    const poll = async () => {
+        try {
+            const response = await fetch(`${API_BASE_URL}${statusUrl}`);
+            if (response.ok) {
+                const job = await response.json();
+                if (['succeeded', 'failed', 'cancelled', 'coalesced'].includes(job.state)) {
+                    finishUpdateProgress(job);
+                    return;
+                }
+                renderUpdateProgress(job);
+            }
+        } catch (error) {
+            console.warn('Unable to poll update progress', error);
+        }
+        setTimeout(poll, 2000);
+    };
+    poll();
+}
+
+function followUpdateProgress(links) {
+    if (typeof window.EventSource !== 'function') {
+        pollUpdateProgress(links.statusUrl);
+        return;
+    }
+
+    // Each stream is closed by the server after a short while and reopened by
+    // EventSource; fall back to polling if it keeps failing.
+    const source = new EventSource(`${API_BASE_URL}${links.streamUrl}`);
+    let failures = 0;
+    source.addEventListener('progress', event => {
+        failures = 0;
+        renderUpdateProgress(JSON.parse(event.data));
+    });
+    source.addEventListener('done', event => {
+        source.close();
+        finishUpdateProgress(JSON.parse(event.data));
+    });
+    source.addEventListener('error', () => {
+        failures += 1;
+        if (failures >= 3) {
+            source.close();
+            pollUpdateProgress(links.statusUrl);
+        }
+    });
+}
+
 async function triggerUpdate() {
     const statusEl = document.getElementById('updateStatus');
-    statusEl.textContent = 'Updating...';
+    statusEl.textContent = getTranslation('configure.data.manualUpdate.queued', 'Update queued...');
 
     try {
         const response = await fetch(`${API_BASE_URL}/api/update-now`, { method: 'POST' });
 
         if (response.ok) {
-            statusEl.textContent = '✔ Update started';
-            setTimeout(() => {
-                statusEl.textContent = '';
-            }, 3000);
+            followUpdateProgress(await response.json());
+        } else if (response.status === 429) {
+            statusEl.textContent = getTranslation('configure.data.manualUpdate.rateLimited', 'An update was started less than a minute ago');
         } else {
-            statusEl.textContent = '✗ Update failed';
+            statusEl.textContent = getTranslation('configure.data.manualUpdate.requestFailed', '✗ Update failed');
         }
     } catch (error) {
-        statusEl.textContent = '✗ Update failed';
+        statusEl.textContent = getTranslation('configure.data.manualUpdate.requestFailed', '✗ Update failed');
     }
 }
 
@@ -1444,6 +1619,10 @@ function registerConfigActions() {
         'reset-favicon': resetFavicon,
         'reset-node-colors': resetNodeColors,
         'reset-update-time': resetUpdateTime,
+        'add-scheduled-job': () => {
+            addScheduledJobRow();
+            markUnsavedChange();
+        },
         'reset-collapse-level': resetCollapseLevel,
         'reset-ignored-titles': resetIgnoredTitles,
         'reset-ignored-departments': resetIgnoredDepartments,
@@ -1472,6 +1651,12 @@ document.addEventListener('DOMContentLoaded', async () => {
     attachUnsavedListeners();
     registerNavigationGuards();
 
+    const scheduledJobsList = document.getElementById('scheduledJobsList');
+    if (scheduledJobsList) {
+        // Job rows are added after the listeners above are bound.
+        ['input', 'change'].forEach(evt => scheduledJobsList.addEventListener(evt, () => markUnsavedChange()));
+    }
+
     const metadata = await loadFilterMetadata();
     filterMetadata = metadata || { jobTitles: [], departments: [], employees: [] };
     initializeTagPickers(filterMetadata);
@@ -852,6 +852,8 @@ function renderSummary(records, generatedAt, config) {
         }
     }
 
+    renderStaleSummary(records, t);
+
     if (licenseCard && licenseLabel && licenseValue) {
         if (config.showLicenseSummary) {
             const labelKey = config.licenseSummaryLabelKey || 'reports.summary.licensesLabel';
@@ -867,6 +869,31 @@ function renderSummary(records, generatedAt, config) {
     }
 }
 
+// Records a partial Graph crawl did not reach carry the ``syncedAt`` of their cached copy.
+function isStaleRecord(record) {
+    return Boolean(record) && Object.prototype.hasOwnProperty.call(record, 'syncedAt');
+}
+
+function renderStaleSummary(records, t) {
+    const card = qs('staleSummaryCard');
+    const value = qs('staleSummaryValue');
+    const detail = qs('staleSummaryDetail');
+    if (!card || !value || !detail) {
+        return;
+    }
+    const stale = records.filter(isStaleRecord);
+    if (!stale.length) {
+        card.classList.add('is-hidden');
+        return;
+    }
+    const dates = stale.map((record) => record.syncedAt).filter(Boolean).sort();
+    value.textContent = stale.length.toLocaleString();
+    detail.textContent = dates.length
+        ? t('reports.summary.staleDetail', { date: formatDate(dates[0]) })
+        : t('reports.summary.staleDetailUnknown');
+    card.classList.remove('is-hidden');
+}
+
 function defaultCellValue(value) {
     if (Array.isArray(value)) {
         return value.length ? value.join(', ') : '—';
@@ -937,6 +964,12 @@ function renderTable(records, config) {
 
     records.forEach((record) => {
         const row = document.createElement('tr');
+        if (isStaleRecord(record)) {
+            row.classList.add('is-stale');
+            row.title = record.syncedAt
+                ? t('reports.table.staleRow', { date: formatDate(record.syncedAt) })
+                : t('reports.table.staleRowUnknown');
+        }
         config.columns.forEach((column) => {
             const cell = document.createElement('td');
             let value;
@@ -0,0 +1,66 @@
+// Client-side employee search over the compact payload served by /api/search-index.
+// Matching mirrors /api/search: case-insensitive substring on name, title or department,
+// returning the first matches in hierarchy order.
+
+let index = null;
+
+function loadIndex(payload) {
+    if (!payload || !payload.clientSearch || !Array.isArray(payload.ids)) {
+        index = null;
+        return { ready: false, generation: payload ? payload.generation : null };
+    }
+
+    const strings = Array.isArray(payload.strings) ? payload.strings : [];
+    index = {
+        generation: payload.generation || null,
+        count: payload.ids.length,
+        strings,
+        lowered: strings.map(value => (value || '').toLowerCase()),
+        ids: payload.ids,
+        names: payload.names || [],
+        titles: payload.titles || [],
+        departments: payload.departments || [],
+        parents: payload.parents || []
+    };
+    return { ready: true, generation: index.generation, count: index.count };
+}
+
+function search(query, limit) {
+    if (!index) return [];
+    const needle = (query || '').toLowerCase();
+    if (needle.length < 2) return [];
+
+    const { lowered, strings, ids, names, titles, departments, parents } = index;
+    const matchesByString = new Uint8Array(lowered.length);
+    for (let i = 0; i < lowered.length; i++) {
+        matchesByString[i] = lowered[i].includes(needle) ? 1 : 0;
+    }
+
+    const results = [];
+    for (let row = 0; row < index.count && results.length < limit; row++) {
+        if (matchesByString[names[row]] || matchesByString[titles[row]] || matchesByString[departments[row]]) {
+            const parentRow = parents[row];
+            results.push({
+                id: ids[row],
+                name: strings[names[row]],
+                title: strings[titles[row]],
+                department: strings[departments[row]],
+                managerId: parentRow >= 0 ? ids[parentRow] : null
+            });
+        }
+    }
+    return results;
+}
+
+self.addEventListener('message', event => {
+    const message = event.data || {};
+    if (message.type === 'load') {
+        self.postMessage({ type: 'loaded', ...loadIndex(message.payload) });
+    } else if (message.type === 'search') {
+        self.postMessage({
+            type: 'results',
+            requestId: message.requestId,
+            results: search(message.query, message.limit || 10)
+        });
+    }
+});
@@ -51,6 +51,17 @@ async function debugSearch() {
     }
 }
 
+async function waitForSyncJob(statusUrl) {
+    for (;;) {
+        const response = await fetch(`${API_BASE}${statusUrl}`);
+        const job = await response.json();
+        if (!response.ok || ['succeeded', 'failed', 'cancelled', 'coalesced'].includes(job.state)) {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
+
 async function forceUpdate() {
     const resultsDiv = document.getElementById('updateResults');
     resultsDiv.innerHTML = '<span class="info">Forcing update... This may take a moment...</span>';
@@ -62,7 +73,12 @@ async function forceUpdate() {
         const data = await response.json();
 
         if (data.success) {
-            resultsDiv.innerHTML = `<span class="success">✓ ${data.message}</span>`;
+            resultsDiv.innerHTML = `<span class="info">Update queued as job ${data.jobId}...</span>`;
+            const job = await waitForSyncJob(data.statusUrl);
+            const succeeded = job.state === 'succeeded' || job.state === 'coalesced';
+            resultsDiv.innerHTML = succeeded
+                ? `<span class="success">✓ Update ${job.state} in ${job.durationSeconds ?? '?'}s (${job.records || 0} records)</span>`
+                : `<span class="error">✗ Update ${job.state}${job.error ? `: ${job.error}` : ''}</span>`;
         } else {
             resultsDiv.innerHTML = `<span class="error">✗ ${data.message || data.error}</span>`;
             if (data.traceback) {
@@ -0,0 +1,103 @@
+"""Checkpoint and delta round-trips in simple_org_chart.history."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from simple_org_chart.history import HistoryStore, apply_delta, compute_delta
+
+T0 = datetime(2026, 3, 1, 6, 0, tzinfo=timezone.utc)
+
+
+def _employee(employee_id, **fields):
+    record = {"id": employee_id, "name": f"Person {employee_id}", "department": "Eng", "managerId": None}
+    record.update(fields)
+    return record
+
+
+def _snapshots():
+    """Successive employee lists: hires, a departure, a move, a field being cleared."""
+    first = [_employee("1"), _employee("2", managerId="1"), _employee("3", managerId="1", phone="555")]
+    second = first + [_employee("4", managerId="2")]
+    third = [_employee("1"), _employee("2", managerId="1", department="Sales"), _employee("3", managerId="1"),
+             _employee("4", managerId="2")]
+    fourth = [record for record in third if record["id"] != "2"] + [_employee("5", title="Lead")]
+    fifth = [dict(record, name=record["name"].upper()) for record in fourth]
+    return [first, second, third, fourth, fifth]
+
+
+def _records(employees):
+    return {record["id"]: record for record in employees}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_CHECKPOINT_INTERVAL", "2")
+    return HistoryStore(tmp_path / "history")
+
+
+def test_delta_round_trip_covers_added_removed_and_changed():
+    before = _records(_snapshots()[1])
+    after = _records(_snapshots()[3])
+    delta = compute_delta(before, after)
+    assert set(delta["added"]) == {"5"}
+    assert delta["removed"] == ["2"]
+    assert delta["changed"] == {"3": {"unset": ["phone"]}}
+    assert apply_delta(before, delta) == after
+
+
+def test_apply_delta_leaves_input_untouched():
+    before = _records(_snapshots()[0])
+    copy = {key: dict(value) for key, value in before.items()}
+    apply_delta(before, compute_delta(before, _records(_snapshots()[2])))
+    assert before == copy
+
+
+def test_identical_states_produce_an_empty_delta():
+    records = _records(_snapshots()[0])
+    assert compute_delta(records, dict(records)) == {"added": {}, "removed": [], "changed": {}}
+
+
+def test_state_at_reconstructs_every_sync_across_checkpoints(store):
+    snapshots = _snapshots()
+    kinds = []
+    for offset, employees in enumerate(snapshots):
+        kinds.append(store.record(employees, synced_at=T0 + timedelta(days=offset))["kind"])
+    assert kinds == ["checkpoint", "delta", "checkpoint", "delta", "checkpoint"]
+
+    # A fresh store has no cached state, so every lookup replays from disk.
+    reopened = HistoryStore(store.directory)
+    for offset in reversed(range(len(snapshots))):
+        entry, records = reopened.state_at(T0 + timedelta(days=offset, hours=1))
+        assert entry["sequence"] == offset + 1
+        assert records == _records(snapshots[offset])
+    assert reopened.state_at(T0 - timedelta(days=1)) == (None, {})
+    assert reopened.state_at()[1] == _records(snapshots[-1])
+
+
+def test_volatile_fields_do_not_create_entries(store):
+    employees = _snapshots()[0]
+    assert store.record(employees, synced_at=T0) is not None
+    noisy = [dict(record, syncedAt="later", isNewEmployee=True, children=[]) for record in employees]
+    assert store.record(noisy, synced_at=T0 + timedelta(days=1)) is None
+    assert len(store.entries()) == 1
+    assert "syncedAt" not in store.state_at()[1]["1"]
+
+
+def test_changes_and_headcount_follow_the_recorded_syncs(store):
+    snapshots = _snapshots()
+    for offset, employees in enumerate(snapshots[:4]):
+        store.record(employees, synced_at=T0 + timedelta(days=offset))
+
+    feed = store.changes(since=T0)
+    assert [item["sequence"] for item in feed] == [2, 3, 4]
+    assert [record["id"] for record in feed[0]["added"]] == ["4"]
+    assert feed[1]["changed"] == [
+        {"id": "2", "name": "Person 2", "fields": {"department": {"from": "Eng", "to": "Sales"}}},
+        {"id": "3", "name": "Person 3", "fields": {"phone": {"from": "555", "to": None}}},
+    ]
+    assert [record["id"] for record in feed[2]["removed"]] == ["2"]
+
+    series = store.headcount()
+    assert [point["total"] for point in series] == [3, 4, 4, 4]
+    assert series[2]["departments"] == {"Eng": 3, "Sales": 1}
@@ -0,0 +1,111 @@
+"""Cron parsing and next-run planning in simple_org_chart.scheduler."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from simple_org_chart.scheduler import CronExpression, ScheduledJob, validate_scheduled_jobs
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+
+def test_fields_accept_steps_ranges_and_lists():
+    cron = CronExpression("*/15 9-17 1,15 */3 1-5")
+    assert cron.minutes == {0, 15, 30, 45}
+    assert cron.hours == set(range(9, 18))
+    assert cron.days == {1, 15}
+    assert cron.months == {1, 4, 7, 10}
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+
+
+def test_sunday_is_zero_or_seven():
+    assert CronExpression("0 0 * * 7").weekdays == {0}
+    assert CronExpression("0 0 * * 0").weekdays == {0}
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["0 0 * *", "0 0 * * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "*/0 * * * *", "5-1 * * * *", "x * * * *"],
+)
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_next_after_is_strictly_later():
+    cron = CronExpression("30 2 * * *")
+    assert cron.next_after(datetime(2026, 1, 1, 2, 30)) == datetime(2026, 1, 2, 2, 30)
+    assert cron.next_after(datetime(2026, 1, 1, 2, 29, 59)) == datetime(2026, 1, 1, 2, 30)
+
+
+def test_next_after_rolls_over_months_and_years():
+    assert CronExpression("0 0 1 * *").next_after(datetime(2026, 1, 31, 12, 0)) == datetime(2026, 2, 1)
+    assert CronExpression("15 6 * 3 *").next_after(datetime(2026, 4, 1)) == datetime(2027, 3, 1, 6, 15)
+
+
+def test_restricted_day_fields_match_either_day():
+    # 2026-04-10 is a Friday and 2026-04-13 a Monday: "the 13th or any Friday".
+    cron = CronExpression("0 0 13 * 5")
+    assert cron.next_after(datetime(2026, 4, 4)) == datetime(2026, 4, 10)
+    assert cron.next_after(datetime(2026, 4, 10)) == datetime(2026, 4, 13)
+
+
+def test_one_restricted_day_field_must_match():
+    assert CronExpression("0 0 13 * *").next_after(datetime(2026, 4, 1)) == datetime(2026, 4, 13)
+    assert CronExpression("0 0 * * 1").next_after(datetime(2026, 4, 10)) == datetime(2026, 4, 13)
+
+
+def test_impossible_date_never_matches():
+    with pytest.raises(ValueError, match="never matches"):
+        CronExpression("0 0 30 2 *").next_after(datetime(2026, 1, 1))
+    # With a weekday as well, any Monday in February qualifies.
+    assert CronExpression("0 0 30 2 1").next_after(datetime(2026, 1, 1)) == datetime(2026, 2, 2)
+
+
+def test_next_after_keeps_the_timezone():
+    moment = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert CronExpression("0 13 * * *").next_after(moment) == datetime(2026, 1, 1, 13, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.skipif(ZoneInfo is None, reason="zoneinfo unavailable")
+def test_cron_job_runs_in_its_own_timezone():
+    job = ScheduledJob("morning", scopes=["signIns"], cron="0 9 * * *", tz=ZoneInfo("America/New_York"))
+    after = datetime(2026, 1, 5, 15, 0, tzinfo=timezone.utc)  # 10:00 in New York
+    assert job.next_run(after) == datetime(2026, 1, 6, 14, 0, tzinfo=timezone.utc)
+
+
+def test_interval_job_runs_after_its_interval():
+    job = ScheduledJob("often", scopes=["disabled"], interval_minutes=30)
+    after = datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)
+    assert job.next_run(after) == datetime(2026, 1, 1, 8, 30, tzinfo=timezone.utc)
+
+
+def test_job_needs_exactly_one_timing():
+    with pytest.raises(ValueError):
+        ScheduledJob("both", interval_minutes=5, cron="* * * * *")
+    with pytest.raises(ValueError):
+        ScheduledJob("neither")
+
+
+def test_validate_scheduled_jobs():
+    assert validate_scheduled_jobs(None) == []
+    assert validate_scheduled_jobs([{"name": "logins", "scopes": ["signIns"], "cron": "0 */6 * * *"}]) == []
+    assert validate_scheduled_jobs({"name": "x"}) == ["scheduledJobs must be a list"]
+
+    errors = validate_scheduled_jobs([
+        {"name": "daily", "scopes": ["signIns"], "intervalMinutes": 60},
+        {"name": "feb30", "scopes": ["signIns"], "cron": "0 0 30 2 *"},
+        {"name": "twice", "scopes": ["disabled"], "intervalMinutes": 10},
+        {"name": "twice", "scopes": ["disabled"], "intervalMinutes": 20},
+        {"name": "bad-scope", "scopes": ["everything"], "intervalMinutes": 20},
+        {"name": "no-timing", "scopes": ["disabled"]},
+    ])
+    assert len(errors) == 5
+    assert "'daily' is used more than once" in errors[0]
+    assert "never matches" in errors[1]
+    assert "'twice' is used more than once" in errors[2]
+    assert "unknown scopes" in errors[3]
+    assert "no-timing" in errors[4]